@@ -7,6 +7,7 @@ import Queue
 import json
 import traceback
 import time
+from collections import OrderedDict
 
 from django.db import transaction
 from django.http import HttpResponseNotAllowed, HttpResponse, HttpResponseBadRequest
@@ -184,33 +185,59 @@ class MessageView(ValidatedClientView):
                 return HttpResponseBadRequest("Incorrect client name")
 
         log.debug("MessageView.post: %s %s messages: %s" % (fqdn, len(messages), body))
+
+        # Valid DATA messages are forwarded in one batch per plugin, and the session of each
+        # (plugin, session_id) is looked up only once per POST.
+        plugin_messages = OrderedDict()
+        session_valid = {}
+
+        def forward(plugin):
+            plugin_batch = plugin_messages.pop(plugin, None)
+            if plugin_batch:
+                self.queues.receive_many(plugin, plugin_batch)
+
         for message in messages:
             if message["type"] == "DATA":
+                session_key = (message["plugin"], message["session_id"])
                 try:
-                    self.sessions.get(fqdn, message["plugin"], message["session_id"])
+                    valid = session_valid[session_key]
                 except KeyError:
-                    log.warning(
-                        "Terminating session because unknown %s/%s/%s"
-                        % (fqdn, message["plugin"], message["session_id"])
-                    )
-                    self.queues.send(
-                        {
-                            "fqdn": fqdn,
-                            "type": "SESSION_TERMINATE",
-                            "plugin": message["plugin"],
-                            "session_id": None,
-                            "session_seq": None,
-                            "body": None,
-                        }
-                    )
-                else:
+                    try:
+                        self.sessions.get(fqdn, message["plugin"], message["session_id"])
+                    except KeyError:
+                        log.warning(
+                            "Terminating session because unknown %s/%s/%s"
+                            % (fqdn, message["plugin"], message["session_id"])
+                        )
+                        self.queues.send(
+                            {
+                                "fqdn": fqdn,
+                                "type": "SESSION_TERMINATE",
+                                "plugin": message["plugin"],
+                                "session_id": None,
+                                "session_seq": None,
+                                "body": None,
+                            }
+                        )
+                        valid = False
+                    else:
+                        valid = True
+                    session_valid[session_key] = valid
+
+                if valid:
                     log.debug(
                         "Forwarding valid message %s/%s/%s-%s"
                         % (fqdn, message["plugin"], message["session_id"], message["session_seq"])
                     )
-                    self.queues.receive(message)
+                    plugin_messages.setdefault(message["plugin"], []).append(message)
 
             elif message["type"] == "SESSION_CREATE_REQUEST":
+                # Creating a session notifies the plugin that the old one is over, so forward
+                # anything already received for the old one first.
+                forward(message["plugin"])
+                for session_key in [key for key in session_valid if key[0] == message["plugin"]]:
+                    del session_valid[session_key]
+
                 session = self.sessions.create(fqdn, message["plugin"])
                 log.info("Creating session %s/%s/%s" % (fqdn, message["plugin"], session.id))
 
@@ -235,9 +262,16 @@ class MessageView(ValidatedClientView):
                     }
                 )
 
+        for plugin in plugin_messages.keys():
+            forward(plugin)
+
         return HttpResponse()
 
-    def _filter_valid_messages(self, fqdn, messages):
+    def _valid_message_filter(self, fqdn):
+        """
+        :return: A function returning whether a message to `fqdn` belongs to the current session of
+                 its plugin, looking up each plugin's session only once.
+        """
         plugin_to_session_id = {}
 
         def is_valid(message):
@@ -257,13 +291,16 @@ class MessageView(ValidatedClientView):
 
             return True
 
-        return [m for m in messages if is_valid(m)]
+        return is_valid
 
     @log_exception
     def get(self, request):
         """
         Send messages TO the agent.
         Handle a long-polling GET for messages to the agent
+
+        At most settings.AGENT_MESSAGES_PER_RESPONSE messages, and settings.AGENT_BYTES_PER_RESPONSE
+        bytes of them, are sent in one response: any more are left queued for the next GET.
         """
 
         fqdn = self.valid_fqdn(request)
@@ -272,7 +309,10 @@ class MessageView(ValidatedClientView):
         server_boot_time = IMLDateTime.parse(request.GET["server_boot_time"])
         client_start_time = IMLDateTime.parse(request.GET["client_start_time"])
 
-        messages = []
+        # Each message is encoded as it is taken from the queue, so that we know the size of the response
+        encoded_messages = []
+        encoded_size = 0
+        is_valid = self._valid_message_filter(fqdn)
 
         try:
             reset_required = self.hosts.update(fqdn, server_boot_time, client_start_time)
@@ -286,16 +326,17 @@ class MessageView(ValidatedClientView):
             # This is the case where the http_agent service restarts, so
             # we have to let the agent know that all open sessions
             # are now over.
-            messages.append(
-                {
-                    "fqdn": fqdn,
-                    "type": "SESSION_TERMINATE_ALL",
-                    "plugin": None,
-                    "session_id": None,
-                    "session_seq": None,
-                    "body": None,
-                }
-            )
+            message = {
+                "fqdn": fqdn,
+                "type": "SESSION_TERMINATE_ALL",
+                "plugin": None,
+                "session_id": None,
+                "session_seq": None,
+                "body": None,
+            }
+            if is_valid(message):
+                encoded_messages.append(json.dumps(message))
+                encoded_size += len(encoded_messages[-1])
 
         log.debug("MessageView.get: composing messages for %s" % fqdn)
         queues = self.queues.get(fqdn)
@@ -307,39 +348,46 @@ class MessageView(ValidatedClientView):
 
         with queues.tx_lock:
             try:
-                first_message = queues.tx.get(block=True, timeout=self.LONG_POLL_TIMEOUT)
-                if first_message["type"] == "TX_BARRIER":
-                    if first_message["client_start_time"] != request.GET["client_start_time"]:
+                message = queues.get_tx(block=True, timeout=self.LONG_POLL_TIMEOUT)
+            except Queue.Empty:
+                message = None
+
+            while message is not None:
+                if message["type"] == "TX_BARRIER":
+                    if message["client_start_time"] != request.GET["client_start_time"]:
                         log.warning(
                             "Cancelling GET due to barrier %s %s"
-                            % (first_message["client_start_time"], request.GET["client_start_time"])
+                            % (message["client_start_time"], request.GET["client_start_time"])
                         )
                         return HttpResponse(json.dumps({"messages": []}), content_type="application/json")
-                else:
-                    messages.append(first_message)
-            except Queue.Empty:
-                pass
-            else:
-                # TODO: limit number of messages per response
-                while True:
-                    try:
-                        message = queues.tx.get(block=False)
-                        if message["type"] == "TX_BARRIER":
-                            if message["client_start_time"] != request.GET["client_start_time"]:
-                                log.warning(
-                                    "Cancelling GET due to barrier %s %s"
-                                    % (message["client_start_time"], request.GET["client_start_time"])
-                                )
-                                return HttpResponse(json.dumps({"messages": []}), content_type="application/json")
-                        else:
-                            messages.append(message)
-                    except Queue.Empty:
+                elif is_valid(message):
+                    encoded_message = json.dumps(message)
+                    if encoded_messages and (
+                        len(encoded_messages) >= settings.AGENT_MESSAGES_PER_RESPONSE
+                        or encoded_size + len(encoded_message) > settings.AGENT_BYTES_PER_RESPONSE
+                    ):
+                        queues.unget_tx(message)
+                        queues.tx_truncated += 1
+                        log.info(
+                            "MessageView.get: response to %s full, leaving %s messages queued" % (fqdn, queues.tx_depth)
+                        )
                         break
 
-        messages = self._filter_valid_messages(fqdn, messages)
+                    encoded_messages.append(encoded_message)
+                    encoded_size += len(encoded_message)
 
-        log.debug("MessageView.get: responding to %s with %s messages (%s)" % (fqdn, len(messages), client_start_time))
-        return HttpResponse(json.dumps({"messages": messages}), content_type="application/json")
+                try:
+                    message = queues.get_tx(block=False)
+                except Queue.Empty:
+                    message = None
+
+            queues.tx_sent += len(encoded_messages)
+
+        log.debug(
+            "MessageView.get: responding to %s with %s messages, %s bytes (%s)"
+            % (fqdn, len(encoded_messages), encoded_size, client_start_time)
+        )
+        return HttpResponse('{"messages": [%s]}' % ", ".join(encoded_messages), content_type="application/json")
 
 
 def validate_token(key, credits=1):
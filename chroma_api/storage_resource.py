@@ -5,6 +5,7 @@
 
 from collections import defaultdict
 from django.contrib.contenttypes.models import ContentType
+from tastypie.paginator import Paginator
 from tastypie.validation import Validation
 from chroma_core.lib.storage_plugin.api import attributes
 from chroma_core.lib.storage_plugin.base_resource import BaseStorageResource
@@ -57,6 +58,15 @@ class StorageResourceValidation(Validation):
         return errors
 
 
+class StorageResourcePaginator(Paginator):
+    """Hydrate the resources of a page of records together, rather than in each dehydrate method"""
+
+    def get_slice(self, limit, offset):
+        records = list(super(StorageResourcePaginator, self).get_slice(limit, offset))
+        StorageResourceResource.hydrate_resources(records)
+        return records
+
+
 class StorageResourceResource(ChromaModelResource):
     """
     Storage resources are objects within the storage plugin
@@ -122,6 +132,7 @@ class StorageResourceResource(ChromaModelResource):
             record = StorageResourceRecord.objects.get(id=request.GET["ancestor_of"])
             ancestor_records = set(ResourceQuery().record_all_ancestors(record))
 
+            self.hydrate_resources(ancestor_records)
             bundles = [self.build_bundle(obj=obj, request=request) for obj in ancestor_records]
             dicts = [self.full_dehydrate(bundle) for bundle in bundles]
             return self.create_response(request, {"meta": None, "objects": dicts})
@@ -163,21 +174,37 @@ class StorageResourceResource(ChromaModelResource):
         """Pass-through in favour of sorting done in obj_get_list"""
         return obj_list
 
+    @staticmethod
+    def hydrate_resources(records):
+        """Hydrate the resources of `records` in bulk, for use by _to_resource while they are dehydrated"""
+        resources = StorageResourceRecord.to_resources(records)
+        for record in records:
+            record._api_resource = resources[record.id]
+
+    @staticmethod
+    def _to_resource(bundle):
+        """The resource of bundle.obj, hydrated once for the request however many fields use it"""
+        try:
+            return bundle.obj._api_resource
+        except AttributeError:
+            bundle.obj._api_resource = bundle.obj.to_resource()
+            return bundle.obj._api_resource
+
     def dehydrate_propagated_alerts(self, bundle):
-        return [a.to_dict() for a in ResourceQuery().resource_get_propagated_alerts(bundle.obj.to_resource())]
+        return [a.to_dict() for a in ResourceQuery().resource_get_propagated_alerts(self._to_resource(bundle))]
 
     def dehydrate_deletable(self, bundle):
         return bundle.obj.resource_class.user_creatable
 
     def dehydrate_default_alias(self, bundle):
-        return bundle.obj.to_resource().get_label()
+        return self._to_resource(bundle).get_label()
 
     def dehydrate_alias(self, bundle):
-        resource = bundle.obj.to_resource()
+        resource = self._to_resource(bundle)
         return bundle.obj.alias_or_name(resource)
 
     def dehydrate_alerts(self, bundle):
-        return [a.to_dict() for a in ResourceQuery().resource_get_alerts(bundle.obj.to_resource())]
+        return [a.to_dict() for a in ResourceQuery().resource_get_alerts(self._to_resource(bundle))]
 
     def dehydrate_content_type_id(self, bundle):
         return ContentType.objects.get_for_model(bundle.obj.__class__).pk
@@ -185,7 +212,7 @@ class StorageResourceResource(ChromaModelResource):
     def dehydrate_attributes(self, bundle):
         # a list of dicts, one for each attribute.  Excludes hidden attributes.
         result = {}
-        resource = bundle.obj.to_resource()
+        resource = self._to_resource(bundle)
         attr_props = resource.get_all_attribute_properties()
         for name, props in attr_props:
             # Exclude password hashes
@@ -197,7 +224,7 @@ class StorageResourceResource(ChromaModelResource):
                 if val._handle:
                     from chroma_api.urls import api
 
-                    raw = api.get_resource_uri(StorageResourceRecord.objects.get(pk=val._handle))
+                    raw = api.get_resource_uri(StorageResourceRecord(pk=val._handle))
                 else:
                     raw = None
             else:
@@ -211,8 +238,11 @@ class StorageResourceResource(ChromaModelResource):
         return result
 
     class Meta:
-        queryset = StorageResourceRecord.objects.filter(resource_class__id__in=filter_class_ids())
+        queryset = StorageResourceRecord.objects.filter(resource_class__id__in=filter_class_ids()).select_related(
+            "resource_class__storage_plugin"
+        )
         resource_name = "storage_resource"
+        paginator_class = StorageResourcePaginator
         filtering = {"class_name": ["exact"], "plugin_name": ["exact"]}
         authorization = PatchedDjangoAuthorization()
         authentication = AnonymousAuthentication()
@@ -17,3 +17,7 @@ class ChromaCoreAppConfig(AppConfig):
 
         post_migrate.connect(setup_groups, sender=self)
         post_migrate.connect(cb, sender=self)
+
+        from chroma_core.models.jobs import StatefulObject
+
+        StatefulObject.build_all_maps()
@@ -3,7 +3,12 @@
 # license that can be found in the LICENSE file.
 
 
+import operator
+import threading
 from collections import defaultdict
+
+from django.db.models import Q
+
 from chroma_core.services import log_register
 
 
@@ -11,6 +16,21 @@ log = log_register(__name__)
 
 
 class ObjectCache(object):
+    """
+    In-memory cache of the StatefulObjects (and related configuration) which the job scheduler
+    plans jobs over.
+
+    Each model is loaded with a single query at startup (following `select_related` so that
+    the related objects used during planning come along with it), and `indexes` declares the
+    secondary indexes maintained over the cached instances, so that common lookups such as
+    "the LNet configuration of this host" or "the targets in this filesystem" don't require
+    a scan of every cached instance.
+
+    Each cached row also records its version (the PostgreSQL xmin of the row as loaded), so
+    that `refresh` can bring a class up to date by re-reading only the rows which have changed
+    since they were cached, rather than throwing the whole cache away with `clear`.
+    """
+
     instance = None
 
     def __init__(self):
@@ -21,11 +41,47 @@ class ObjectCache(object):
         from chroma_core.models.target import ManagedTarget
         from chroma_core.models.copytool import Copytool
 
+        self._lock = threading.RLock()
+
         self.objects = defaultdict(dict)
+        # Map of klass to pk to the version of the row that the cached instance was loaded from
+        self._versions = defaultdict(dict)
+        # Map of class name to counter name to count, see ObjectCache.stats
+        self._stats = defaultdict(lambda: defaultdict(int))
         self.filter_args = {
             LNetConfiguration: {"host__not_deleted": True},
         }
 
+        self.select_related = {
+            Copytool: ["host", "filesystem", "client_mount"],
+            LNetConfiguration: ["host"],
+            LustreClientMount: ["host"],
+            PacemakerConfiguration: ["host"],
+            StratagemConfiguration: ["filesystem"],
+        }
+
+        # Map of target ID to the (MDT filesystem ID, OST filesystem ID) of the target: ManagedTarget
+        # instances are cached as the base class, which doesn't know its filesystem
+        self._target_filesystems = {}
+
+        host_id = operator.attrgetter("host_id")
+        self.indexes = {
+            Copytool: {"host_id": host_id},
+            LNetConfiguration: {"host_id": host_id},
+            LustreClientMount: {"host_id": host_id},
+            PacemakerConfiguration: {"host_id": host_id},
+            ManagedFilesystem: {"mgs_id": operator.attrgetter("mgs_id")},
+            StratagemConfiguration: {"filesystem_id": operator.attrgetter("filesystem_id")},
+            ManagedTarget: {
+                "mdt_filesystem_id": lambda t: self._get_target_filesystems(t.id)[0],
+                "ost_filesystem_id": lambda t: self._get_target_filesystems(t.id)[1],
+            },
+        }
+        # Map of (klass, index name) to index value to set of pks
+        self._index = defaultdict(lambda: defaultdict(set))
+        # Map of (klass, pk) to the (index name, value) pairs it is indexed under
+        self._indexed = {}
+
         self._cached_models = [
             Copytool,
             Corosync2Configuration,
@@ -42,21 +98,95 @@ class ObjectCache(object):
             Ticket,
         ]
 
+        self._load_target_filesystems()
+
         for klass in self._cached_models:
             self._add_to_cache(klass)
 
+    def _load_target_filesystems(self, **filter_args):
+        from chroma_core.models.target import ManagedTarget
+
+        for target_id, mdt_filesystem_id, ost_filesystem_id in ManagedTarget.objects.filter(**filter_args).values_list(
+            "id", "managedmdt__filesystem_id", "managedost__filesystem_id"
+        ):
+            self._target_filesystems[target_id] = (mdt_filesystem_id, ost_filesystem_id)
+
+    def _get_target_filesystems(self, target_id):
+        try:
+            return self._target_filesystems[target_id]
+        except KeyError:
+            # A target created since we loaded membership
+            self._load_target_filesystems(id=target_id)
+            return self._target_filesystems.setdefault(target_id, (None, None))
+
     def _add(self, klass, instance):
         assert instance.__class__ in self._cached_models
 
         log.debug("_add %s %s %s" % (instance.__class__, instance.id, id(instance)))
 
-        self.objects[klass][instance.pk] = instance
+        with self._lock:
+            self._unindex(klass, instance.pk)
+            self.objects[klass][instance.pk] = instance
+            # Instances which weren't loaded by us (see _query) have no version, so will always
+            # be re-read by the next refresh
+            self._versions[klass][instance.pk] = getattr(instance, "_cache_version", None)
+            self._index_instance(klass, instance)
+
+    def _remove(self, klass, pk):
+        with self._lock:
+            self._unindex(klass, pk)
+            del self.objects[klass][pk]
+            self._versions[klass].pop(pk, None)
+
+    def _count(self, klass, counter, n=1):
+        self._stats[klass.__name__][counter] += n
+
+    def _query(self, klass, **filter_args):
+        """A queryset for instances of `klass` as we cache them: with their related objects,
+        and with their row version as `_cache_version`"""
+        args = self.filter_args.get(klass, {}).copy()
+        args.update(filter_args)
+
+        return (
+            klass.objects.filter(**args)
+            .select_related(*self.select_related.get(klass, []))
+            .extra(select={"_cache_version": self._version_sql(klass)})
+        )
 
-    def _add_to_cache(self, klass, args={}):
-        filter_args = self.filter_args.get(klass, {}).copy()
-        filter_args.update(args)
+    @staticmethod
+    def _version_sql(klass):
+        """SQL for the row version of an instance of `klass`: the xmin of its own table's row and of
+        those of any multi-table-inheritance parents, as inherited fields (e.g. `state`) are stored in the
+        parent's row and updating only them leaves the child's row untouched."""
+        table = klass._meta.db_table
+        versions = ['"%s".xmin::text' % table]
+        for parent in klass._meta.get_parent_list():
+            parent_table = parent._meta.db_table
+            if parent_table == table:
+                continue
+            # A subquery rather than the parent's alias, which is not joined when only the pk is selected
+            versions.append(
+                '(SELECT "_version".xmin::text FROM "%s" AS "_version" WHERE "_version"."%s" = "%s"."%s")'
+                % (parent_table, parent._meta.pk.column, table, klass._meta.pk.column)
+            )
+
+        return " || ':' || ".join(versions)
 
-        for obj in klass.objects.filter(**args):
+    def _index_instance(self, klass, instance):
+        indexed = []
+        for name, key_fn in self.indexes.get(klass, {}).items():
+            value = key_fn(instance)
+            if value is not None:
+                self._index[(klass, name)][value].add(instance.pk)
+                indexed.append((name, value))
+        self._indexed[(klass, instance.pk)] = indexed
+
+    def _unindex(self, klass, pk):
+        for name, value in self._indexed.pop((klass, pk), []):
+            self._index[(klass, name)][value].discard(pk)
+
+    def _add_to_cache(self, klass, args={}):
+        for obj in self._query(klass, **args):
             self._add(klass, obj)
 
     @classmethod
@@ -68,18 +198,46 @@ class ObjectCache(object):
         assert klass in cls.getInstance()._cached_models
         return [o for o in cls.getInstance().objects[klass].values() if not filter or filter(o)]
 
+    @classmethod
+    def get_by_index(cls, klass, index, value):
+        """Get the cached instances of `klass` whose index `index` (see ObjectCache.indexes) has `value`
+
+        :return: A list of instances, ordered by pk
+        """
+        self = cls.getInstance()
+        assert index in self.indexes[klass]
+        with self._lock:
+            return [self.objects[klass][pk] for pk in sorted(self._index[(klass, index)].get(value, []))]
+
+    @classmethod
+    def get_one_by_index(cls, klass, index, value):
+        r = cls.get_by_index(klass, index, value)
+        if len(r) > 1:
+            raise klass.MultipleObjectsReturned
+        elif not r:
+            raise klass.DoesNotExist
+        else:
+            return r[0]
+
     @classmethod
     def get_by_id(cls, klass, instance_id, fill_on_miss=False):
-        assert klass in cls.getInstance()._cached_models
+        self = cls.getInstance()
+        assert klass in self._cached_models
 
         try:
-            return cls.getInstance().objects[klass][instance_id]
+            instance = self.objects[klass][instance_id]
+            self._count(klass, "hits")
+            return instance
         except KeyError:
+            self._count(klass, "misses")
             if not fill_on_miss:
                 raise klass.DoesNotExist()
             else:
-                cls.getInstance()._add_to_cache(klass, {"id": instance_id})
-                return cls.getInstance().objects[klass][instance_id]
+                cls.getInstance()._add_to_cache(klass, {"pk": instance_id})
+                try:
+                    return cls.getInstance().objects[klass][instance_id]
+                except KeyError:
+                    raise klass.DoesNotExist()
 
     @classmethod
     def get_targets_by_filesystem(cls, filesystem_id):
@@ -87,49 +245,48 @@ class ObjectCache(object):
 
     @classmethod
     def fs_targets(cls, fs_id):
-        from chroma_core.models import ManagedMgs
-
-        targets = cls.getInstance()._get_targets_by_filesystem(fs_id)
-        targets = [t for t in targets if not issubclass(t.downcast_class, ManagedMgs)]
-        # log.debug("fs_targets: %s" % targets)
-        return targets
+        return cls.getInstance()._get_targets_by_filesystem(fs_id, include_mgs=False)
+
+    def _get_targets_by_filesystem(self, filesystem_id, include_mgs=True):
+        from chroma_core.models import ManagedTarget, ManagedFilesystem
+
+        # Targets are created outside of the job scheduler, so check with one query for any which
+        # we haven't seen yet, and load them all with a second query.
+        member_ids = ManagedTarget.objects.filter(
+            Q(managedmdt__filesystem_id=filesystem_id) | Q(managedost__filesystem_id=filesystem_id)
+        ).values_list("id", flat=True)
+        missing_ids = [target_id for target_id in member_ids if target_id not in self.objects[ManagedTarget]]
+        if missing_ids:
+            self._count(ManagedTarget, "misses", len(missing_ids))
+            self._load_target_filesystems(id__in=missing_ids)
+            self._add_to_cache(ManagedTarget, {"id__in": missing_ids})
 
-    def _get_targets_by_filesystem(self, filesystem_id):
-        from chroma_core.models import ManagedTarget, ManagedMdt, ManagedOst, ManagedFilesystem
-
-        # FIXME: This is reasonably efficient but could be improved further by caching the filesystem membership of targets.
         targets = []
-        mgs_id = self.get_by_id(ManagedFilesystem, filesystem_id, fill_on_miss=True).mgs_id
-        targets.append(self.objects[ManagedTarget][mgs_id])
+        if include_mgs:
+            mgs_id = self.get_by_id(ManagedFilesystem, filesystem_id, fill_on_miss=True).mgs_id
+            targets.append(self.objects[ManagedTarget][mgs_id])
 
-        targets.extend(
-            [
-                self.get_by_id(ManagedTarget, mdt["id"], fill_on_miss=True)
-                for mdt in ManagedMdt.objects.filter(filesystem=filesystem_id).values("id")
-            ]
-        )
-        targets.extend(
-            [
-                self.get_by_id(ManagedTarget, ost["id"], fill_on_miss=True)
-                for ost in ManagedOst.objects.filter(filesystem=filesystem_id).values("id")
-            ]
-        )
+        targets.extend(self.get_by_index(ManagedTarget, "mdt_filesystem_id", filesystem_id))
+        targets.extend(self.get_by_index(ManagedTarget, "ost_filesystem_id", filesystem_id))
 
         return targets
 
     @classmethod
     def get_one(cls, klass, filter=None, fill_on_miss=False):
-        assert klass in cls.getInstance()._cached_models
-        r = [o for o in cls.getInstance().objects[klass].values() if not filter or filter(o)]
+        self = cls.getInstance()
+        assert klass in self._cached_models
+        r = [o for o in self.objects[klass].values() if not filter or filter(o)]
         if len(r) > 1:
             raise klass.MultipleObjectsReturned
         elif not r:
+            self._count(klass, "misses")
             if not fill_on_miss:
                 raise klass.DoesNotExist
             else:
-                cls.getInstance()._add_to_cache(klass)
+                self._refresh(klass)
                 return cls.get_one(klass, filter)
         else:
+            self._count(klass, "hits")
             return r[0]
 
     @classmethod
@@ -149,18 +306,21 @@ class ObjectCache(object):
         from chroma_core.models.copytool import Copytool
 
         try:
-            client_mount = cls.get_one(LustreClientMount, lambda ccm: ccm.id == cm_id)
-            return cls.get(
-                Copytool, lambda ct: (client_mount.host_id == ct.host_id and ct.mountpoint in client_mount.mountpoints)
-            )
+            client_mount = cls.get_by_id(LustreClientMount, cm_id)
+            return [
+                ct
+                for ct in cls.get_by_index(Copytool, "host_id", client_mount.host_id)
+                if ct.mountpoint in client_mount.mountpoints
+            ]
         except LustreClientMount.DoesNotExist:
             return []
 
     @classmethod
     def purge(cls, klass, filter):
-        cls.getInstance().objects[klass] = dict(
-            [(o.pk, o) for o in cls.getInstance().objects[klass].values() if not filter(o)]
-        )
+        self = cls.getInstance()
+        for o in self.objects[klass].values():
+            if filter(o):
+                self._remove(klass, o.pk)
 
     def _update(self, obj):
         log.debug("update: %s %s" % (obj.__class__, obj.id))
@@ -168,13 +328,81 @@ class ObjectCache(object):
         class_collection = self.objects[obj.__class__]
         if obj.pk in class_collection:
             try:
-                fresh_instance = obj.__class__.objects.get(pk=obj.pk)
+                fresh_instance = self._query(obj.__class__).get(pk=obj.pk)
             except obj.__class__.DoesNotExist:
                 return None
             else:
-                class_collection[obj.pk] = fresh_instance
+                self._add(obj.__class__, fresh_instance)
+                self._count(obj.__class__, "refreshed")
             return fresh_instance
 
     @classmethod
     def update(cls, obj):
         return cls.getInstance()._update(obj)
+
+    def _update_many(self, klass, pks):
+        log.debug("update_many: %s %s" % (klass, pks))
+        assert klass in self._cached_models
+        class_collection = self.objects[klass]
+        fresh_instances = {}
+        for fresh_instance in self._query(klass, pk__in=[pk for pk in pks if pk in class_collection]):
+            self._add(klass, fresh_instance)
+            fresh_instances[fresh_instance.pk] = fresh_instance
+        self._count(klass, "refreshed", len(fresh_instances))
+        return fresh_instances
+
+    @classmethod
+    def update_many(cls, klass, pks):
+        """Refresh several cached instances of one class with a single query
+
+        :return: Dict of pk to fresh instance, for those instances which are cached and still exist
+        """
+        return cls.getInstance()._update_many(klass, pks)
+
+    def _refresh(self, klass):
+        from chroma_core.models.target import ManagedTarget
+
+        log.debug("refresh: %s" % klass)
+        assert klass in self._cached_models
+
+        versions = dict(self._query(klass).values_list("pk", "_cache_version"))
+
+        with self._lock:
+            cached_versions = self._versions[klass]
+            changed = [pk for pk, version in versions.items() if cached_versions.get(pk) != version]
+            removed = [pk for pk in self.objects[klass].keys() if pk not in versions]
+
+            for pk in removed:
+                self._remove(klass, pk)
+
+            if changed:
+                if klass is ManagedTarget:
+                    self._load_target_filesystems(id__in=changed)
+                self._add_to_cache(klass, {"pk__in": changed})
+
+        self._count(klass, "refreshed", len(changed))
+        self._count(klass, "unchanged", len(versions) - len(changed))
+
+        return len(changed) + len(removed)
+
+    @classmethod
+    def refresh(cls, klass=None):
+        """Bring the cache up to date with the database, re-reading only the rows which have been
+        created or modified since they were cached (and dropping those which have been deleted).
+
+        Costs one query per class to read the current row versions, plus one to load any
+        changed rows.
+
+        :param klass: The class to refresh, or None to refresh all cached classes
+        :return: The number of instances added, updated or removed
+        """
+        self = cls.getInstance()
+        return sum(self._refresh(k) for k in ([klass] if klass else self._cached_models))
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: Dict of class name to counters: `hits` and `misses` of lookups, `refreshed` rows
+                 re-read from the database and `unchanged` rows skipped by refresh
+        """
+        return dict((name, dict(counters)) for name, counters in cls.getInstance()._stats.items())
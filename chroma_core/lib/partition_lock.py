@@ -0,0 +1,125 @@
+# Copyright (c) 2020 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+
+class PartitionLock(object):
+    """
+    A lock which may be held either globally (exclusive of everything) or for a single
+    partition (exclusive only of the same partition and of global holders).
+
+    Using the object as a context manager takes the global lock, so that it can stand in
+    for an RLock serializing a whole service (e.g. JobScheduler, ResourceManager).  Both modes are re-entrant for
+    the holding thread, and a thread holding the global lock may enter any partition.
+
+    Waiting global acquirers block new partition entries so that a steady stream
+    of partitioned operations cannot starve them.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._partition_locks = defaultdict(threading.RLock)
+        self._active = 0
+        self._global_owner = None
+        self._global_depth = 0
+        self._global_waiters = 0
+        self._local = threading.local()
+
+    def _held_partitions(self):
+        try:
+            return self._local.partitions
+        except AttributeError:
+            self._local.partitions = []
+            return self._local.partitions
+
+    def _acquire_global_locked(self):
+        # Caller holds self._cond
+        me = threading.current_thread()
+        if self._global_owner is me:
+            self._global_depth += 1
+            return
+
+        if self._held_partitions():
+            raise RuntimeError("Cannot take the global lock while holding partition %s" % self._held_partitions()[-1])
+
+        self._global_waiters += 1
+        try:
+            while self._global_owner is not None or self._active:
+                self._cond.wait()
+        finally:
+            self._global_waiters -= 1
+        self._global_owner = me
+        self._global_depth = 1
+
+    def acquire(self):
+        with self._cond:
+            self._acquire_global_locked()
+
+    def release(self):
+        with self._cond:
+            assert self._global_owner is threading.current_thread()
+            self._global_depth -= 1
+            if self._global_depth == 0:
+                self._global_owner = None
+                self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @contextmanager
+    def partition(self, key_fn):
+        """
+        Hold the partition named by key_fn(), falling back to the global lock if it returns None.
+
+        key_fn is evaluated once no global holder is active, so that it sees a partitioning which
+        cannot change until this partition is released.
+
+        :return: A context manager yielding the partition key, or None if the global lock was taken.
+        """
+        held = self._held_partitions()
+
+        with self._cond:
+            if self._global_owner is threading.current_thread():
+                key = None
+                self._global_depth += 1
+            else:
+                if not held:
+                    while self._global_owner is not None or self._global_waiters:
+                        self._cond.wait()
+
+                key = key_fn()
+                if key is None:
+                    self._acquire_global_locked()
+                elif held and held[-1] != key:
+                    raise RuntimeError("Cannot enter partition %s while holding partition %s" % (key, held[-1]))
+                else:
+                    self._active += 1
+                    partition_lock = self._partition_locks[key]
+
+        if key is None:
+            try:
+                yield None
+            finally:
+                self.release()
+            return
+
+        partition_lock.acquire()
+        held.append(key)
+        try:
+            yield key
+        finally:
+            held.pop()
+            partition_lock.release()
+            with self._cond:
+                self._active -= 1
+                if not self._active:
+                    self._cond.notify_all()
@@ -4,9 +4,12 @@
 
 
 import os
+import json
+import hashlib
 import logging
 import settings
 import threading
+from collections import defaultdict
 
 from chroma_core.lib.storage_plugin.base_resource import BaseStorageResource
 from chroma_core.lib.storage_plugin.api import identifiers
@@ -16,6 +19,60 @@ class ResourceNotFound(Exception):
     pass
 
 
+def report_digest(data):
+    """
+    :return: A digest of JSON-serializable agent data which is equal for equal data, regardless of key order.
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True)).hexdigest()
+
+
+def report_section_digests(report):
+    """
+    Digest each entry of a report made up of named sections, where a section is usually a dict
+    of items keyed by some identifier (e.g. the device scanner's "devs" keyed by major:minor).
+
+    Keeping these rather than the report itself lets a later report be diffed against this one
+    without holding on to (or copying) the whole thing.
+
+    :return: {section: {key: digest}} for dict sections, {section: digest} otherwise.
+    """
+    digests = {}
+    for section, value in report.items():
+        if isinstance(value, dict):
+            digests[section] = dict((key, report_digest(item)) for key, item in value.items())
+        else:
+            digests[section] = report_digest(value)
+    return digests
+
+
+def diff_report_digests(old, new):
+    """
+    Structurally diff two results of report_section_digests.
+
+    :return: {section: (added_keys, removed_keys, changed_keys)} for each section which differs, where
+             a section which is not a dict in both reports is reported as changed with no keys.
+    """
+    changes = {}
+    for section in set(old) | set(new):
+        old_value = old.get(section, {})
+        new_value = new.get(section, {})
+        if old_value == new_value:
+            continue
+
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            old_keys = set(old_value)
+            new_keys = set(new_value)
+            changes[section] = (
+                new_keys - old_keys,
+                old_keys - new_keys,
+                set(key for key in old_keys & new_keys if old_value[key] != new_value[key]),
+            )
+        else:
+            changes[section] = (set(), set(), set())
+
+    return changes
+
+
 class ResourceIndex(object):
     def __init__(self):
         # Map (local_id) to resource
@@ -24,26 +81,82 @@ class ResourceIndex(object):
         # Map (id_tuple, klass) to resource
         self._resource_id_to_resource = {}
 
-    def add(self, resource):
-        self._local_id_to_resource[resource._handle] = resource
+        # Map klass to {id_tuple: resource}
+        self._class_to_resources = defaultdict(dict)
+
+        # Map (klass, positions) to ({values: set of id_tuples}, set of id_tuples with None at any position),
+        # where positions are the indices in the id_tuple of the identifier attributes searched on.  Built
+        # the first time a class is searched on those attributes, and maintained from then on.
+        self._attr_indexes = {}
+
+    @staticmethod
+    def _index_key(id_tuple, positions):
+        values = tuple(id_tuple[position] for position in positions)
+        # A resource with an unset identifier attribute matches any search value for it
+        return None if None in values else values
+
+    def _index_insert(self, klass, positions, id_tuple):
+        by_values, unset = self._attr_indexes[(klass, positions)]
+        values = self._index_key(id_tuple, positions)
+        if values is None:
+            unset.add(id_tuple)
+        else:
+            by_values.setdefault(values, set()).add(id_tuple)
+
+    def _index_discard(self, klass, positions, id_tuple):
+        by_values, unset = self._attr_indexes[(klass, positions)]
+        values = self._index_key(id_tuple, positions)
+        if values is None:
+            unset.discard(id_tuple)
+        else:
+            id_tuples = by_values[values]
+            id_tuples.discard(id_tuple)
+            if not id_tuples:
+                del by_values[values]
+
+    def _attr_index(self, klass, positions):
+        try:
+            return self._attr_indexes[(klass, positions)]
+        except KeyError:
+            self._attr_indexes[(klass, positions)] = ({}, set())
+            for id_tuple in self._class_to_resources[klass]:
+                self._index_insert(klass, positions, id_tuple)
+            return self._attr_indexes[(klass, positions)]
 
+    def add(self, resource):
         # Why don't we need a scope resource in here?
         # Because if it's a ScopedId then only items for that
         # scannable will be in this ResourceIndex (index is per
         # plugin instance), and if it's a GlobalId then it doesn't
         # have a scope.
-        resource_id = (resource.id_tuple(), resource.__class__)
+        klass = resource.__class__
+        id_tuple = resource.id_tuple()
+        resource_id = (id_tuple, klass)
         if resource_id in self._resource_id_to_resource:
             raise RuntimeError("Duplicate resource added to index")
+
+        self._local_id_to_resource[resource._handle] = resource
         self._resource_id_to_resource[resource_id] = resource
+        self._class_to_resources[klass][id_tuple] = resource
+
+        for index_klass, positions in self._attr_indexes:
+            if index_klass == klass:
+                self._index_insert(klass, positions, id_tuple)
 
     def remove(self, resource):
-        resource_id = (resource.id_tuple(), resource.__class__)
+        klass = resource.__class__
+        id_tuple = resource.id_tuple()
+        resource_id = (id_tuple, klass)
         if not resource_id in self._resource_id_to_resource:
             raise RuntimeError("Remove non-existent resource")
 
         del self._local_id_to_resource[resource._handle]
         del self._resource_id_to_resource[resource_id]
+        del self._class_to_resources[klass][id_tuple]
+
+        for index_klass, positions in self._attr_indexes:
+            if index_klass == klass:
+                self._index_discard(klass, positions, id_tuple)
 
     def get(self, klass, **attrs):
         id_tuple = klass(**attrs).id_tuple()
@@ -53,12 +166,26 @@ class ResourceIndex(object):
             raise ResourceNotFound()
 
     def find_by_attr(self, klass, **attrs):
-        for resource_tuple in self._resource_id_to_resource:
-            # Must compare klass before values, because values will only be valid for that klass.
-            if resource_tuple[1] == klass and klass.compare_id_tuple(
-                resource_tuple[0], klass.attrs_to_id_tuple(attrs, True), True
-            ):
-                yield self._resource_id_to_resource[resource_tuple]
+        resources = self._class_to_resources[klass]
+        search_tuple = klass.attrs_to_id_tuple(attrs, True)
+        positions = tuple(position for position, value in enumerate(search_tuple) if value is not None)
+
+        if not positions:
+            candidates = list(resources)
+        else:
+            # Stored id tuples are always hashable (they key _resource_id_to_resource), search values may not be
+            by_values, unset = self._attr_index(klass, positions)
+            try:
+                candidates = list(by_values.get(tuple(search_tuple[position] for position in positions), ()))
+            except TypeError:
+                candidates = list(resources)
+            else:
+                # Resources with unset identifier attributes still have to be compared value by value
+                candidates.extend(unset)
+
+        for id_tuple in candidates:
+            if klass.compare_id_tuple(id_tuple, search_tuple, True):
+                yield resources[id_tuple]
 
     def all(self):
         return self._local_id_to_resource.values()
@@ -68,6 +195,10 @@ class BaseStoragePlugin(object):
     #: Set to true for plugins which should not be shown in the user interface
     internal = False
 
+    #: Set to true for plugins whose agent_session_continue derives their resources solely from
+    #: the agent data, so that a report identical to the last one applied can be skipped
+    skip_unchanged_agent_reports = False
+
     _log = None
     _log_format = None
 
@@ -101,6 +232,11 @@ class BaseStoragePlugin(object):
 
         self._session_open = False
 
+        # Digest of the last agent data applied, so that unchanged reports can be skipped.
+        self._agent_data_digest = None
+        self.agent_updates_applied = 0
+        self.agent_updates_skipped = 0
+
         self._update_period = settings.PLUGIN_DEFAULT_UPDATE_PERIOD
 
         from chroma_core.lib.storage_plugin.query import ResourceQuery
@@ -121,6 +257,7 @@ class BaseStoragePlugin(object):
         :return No return value
         """
         self._initial_populate(self.agent_session_start, self._root_resource.host_id, data)
+        self._agent_data_digest = self._agent_report_digest(data)
 
     def do_agent_session_continue(self, data):
         """
@@ -129,12 +266,23 @@ class BaseStoragePlugin(object):
         This will only ever be called on Plugin instances where `agent_session_start` has
         already been called.
 
+        Agents resend their full report every cycle, so for plugins which set
+        `skip_unchanged_agent_reports`, a report identical to the last one applied is skipped
+        without calling `agent_session_continue`.
+
         :param data: Arbitrary JSON-serializable data sent by plugin.
         :return No return value
         """
+        digest = self._agent_report_digest(data)
+        if digest is not None and digest == self._agent_data_digest:
+            self._count_agent_update(False)
+            return
 
         self._update(self.agent_session_continue, self._root_resource.host_id, data)
 
+        self._agent_data_digest = digest
+        self._count_agent_update(True)
+
     def do_initial_scan(self):
         """
         Identify all resources present at this time and call register_resource on them.
@@ -196,6 +344,21 @@ class BaseStoragePlugin(object):
         self._check_alert_conditions()
         self._commit_alerts()
 
+    def _agent_report_digest(self, data):
+        """
+        :return: A digest of `data` to compare with the next report, or None if reports are never skipped
+        """
+        if not self.skip_unchanged_agent_reports:
+            return None
+
+        return report_digest(data)
+
+    def _count_agent_update(self, applied):
+        if applied:
+            self.agent_updates_applied += 1
+        else:
+            self.agent_updates_skipped += 1
+
     def _generate_handle(self):
         with self._handle_lock:
             self._handle_counter += 1
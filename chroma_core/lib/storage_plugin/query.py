@@ -18,14 +18,13 @@ class ResourceQuery(object):
         self._errored_plugins = set()
 
     def record_all_ancestors(self, record):
-        """Find an ancestor of type parent_klass, search depth first"""
+        """Find a record and all of its ancestors, nearest first"""
         if not isinstance(record, StorageResourceRecord):
             record = StorageResourceRecord.objects.get(pk=record)
 
-        result = [record]
-        for p in record.parents.all():
-            result.extend(self.record_all_ancestors(p))
-        return result
+        depths = StorageResourceRecord.ancestry([record.id])
+        ancestors = sorted(StorageResourceRecord.objects.filter(id__in=depths.keys()), key=lambda a: depths[a.id])
+        return [record] + ancestors
 
     def record_all_alerts(self, record_id):
         if isinstance(record_id, StorageResourceRecord):
@@ -10,8 +10,12 @@ import time
 import settings
 import re
 import uuid
+import bisect
+import heapq
+import threading
 import requests_unixsocket
 import requests
+from collections import defaultdict
 from threading import Thread
 from threading import Event
 
@@ -226,6 +230,107 @@ def normalize_nid(string):
     return string
 
 
+class LatencyHistogram(object):
+    """Counts of how long something took, in power of two buckets of milliseconds"""
+
+    BUCKETS_MS = [2**n for n in range(15)]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self._total = 0.0
+        self._max = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        bucket = bisect.bisect_left(self.BUCKETS_MS, ms)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._total += ms
+            self._max = max(self._max, ms)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "count": sum(self._counts),
+                "total_ms": self._total,
+                "max_ms": self._max,
+                "buckets": zip([str(b) for b in self.BUCKETS_MS] + ["+Inf"], self._counts),
+            }
+
+
+class ObservableEvent(object):
+    """
+    A threading.Event which calls subscribers when it is set, so that a thread can wait
+    for either it or something else (see wait_for_event) without waking up to poll it.
+
+    Subscribers are called on the thread calling set(), and so must not block.
+    """
+
+    def __init__(self):
+        self._event = Event()
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def is_set(self):
+        return self._event.is_set()
+
+    isSet = is_set
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            subscriber()
+
+    def clear(self):
+        self._event.clear()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def subscribe(self, subscriber):
+        """Call subscriber() when the event is set, or now if it already is"""
+        with self._lock:
+            self._subscribers.append(subscriber)
+            already_set = self._event.is_set()
+
+        if already_set:
+            subscriber()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            try:
+                self._subscribers.remove(subscriber)
+            except ValueError:
+                pass
+
+
+def wait_for_event(event, cancel_event):
+    """
+    Wait until `event` or `cancel_event` is set.  If both are ObservableEvents this blocks without
+    polling, otherwise it wakes up every second to check cancel_event.
+
+    :return: True if `event` is set.
+    """
+    if isinstance(event, ObservableEvent) and isinstance(cancel_event, ObservableEvent):
+        wake = Event()
+        event.subscribe(wake.set)
+        cancel_event.subscribe(wake.set)
+        try:
+            wake.wait()
+        finally:
+            event.unsubscribe(wake.set)
+            cancel_event.unsubscribe(wake.set)
+    else:
+        while not event.is_set() and not cancel_event.is_set():
+            event.wait(timeout=1.0)
+
+    return event.is_set()
+
+
 def runningInDocker():
     with open("/proc/self/cgroup", "r") as procfile:
         for line in procfile:
@@ -235,12 +340,22 @@ def runningInDocker():
     return False
 
 
+# One session for every request to iml-action-runner, so that connections to it are pooled
+# rather than opened for each action.  It mounts adapters for both http and http+unix URLs.
+ACTION_RUNNER_POOL_SIZE = 64
+
+_action_runner_session = requests_unixsocket.Session()
+_action_runner_session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=ACTION_RUNNER_POOL_SIZE))
+
+
 def post_data_to_tcp_or_socket(post_data):
     if runningInDocker():
-        return requests.post("http://{}:{}".format(settings.PROXY_HOST, settings.ACTION_RUNNER_PORT), json=post_data)
+        return _action_runner_session.post(
+            "http://{}:{}".format(settings.PROXY_HOST, settings.ACTION_RUNNER_PORT), json=post_data
+        )
 
     SOCKET_PATH = "http+unix://%2Fvar%2Frun%2Fiml-action-runner.sock/"
-    return requests_unixsocket.post(SOCKET_PATH, json=post_data)
+    return _action_runner_session.post(SOCKET_PATH, json=post_data)
 
 
 def start_action_local_with_tcp_or_socket(command, args, request_id):
@@ -267,13 +382,112 @@ class RustAgentCancellation(Exception):
     pass
 
 
-def invoke_rust_local_action(command, args={}, cancel_event=Event()):
+class ActionCanceller(Thread):
     """
-    Talks to the iml-action-runner service
+    Sends the cancellations of iml-action-runner actions, on behalf of the threads waiting for them.
+
+    A cancelled action completes the request which started it, so that thread is woken without
+    polling.  In case the cancellation overtook the start of the action and so was ignored, it is
+    resent every RETRY_INTERVAL seconds until the action is done.
     """
 
-    request_id = uuid.uuid4()
+    RETRY_INTERVAL = 5.0
+
+    def __init__(self):
+        super(ActionCanceller, self).__init__(name="ActionCanceller")
+        self.daemon = True
+        self._cond = threading.Condition(threading.Lock())
+        # Heap of (due time, sequence, cancel function, done event)
+        self._pending = []
+        self._seq = 0
+
+    def cancel(self, cancel_fn, done):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._pending, (time.time(), self._seq, cancel_fn, done))
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending or self._pending[0][0] > time.time():
+                    if self._pending:
+                        self._cond.wait(self._pending[0][0] - time.time())
+                    else:
+                        self._cond.wait()
+                _, seq, cancel_fn, done = heapq.heappop(self._pending)
+
+            if done.is_set():
+                continue
+
+            try:
+                cancel_fn()
+            except Exception as e:
+                logging.getLogger(__name__).warning("Failed to cancel action: %s" % e)
+
+            with self._cond:
+                heapq.heappush(self._pending, (time.time() + self.RETRY_INTERVAL, seq, cancel_fn, done))
+
+
+_action_canceller = None
+_action_canceller_lock = threading.Lock()
+
+_action_latencies = defaultdict(LatencyHistogram)
+
+
+def action_latency_stats():
+    """
+    :return: {action: LatencyHistogram.to_dict()} for the actions run through iml-action-runner
+    """
+    return dict((action, histogram.to_dict()) for action, histogram in _action_latencies.items())
 
+
+def _cancel_action(cancel_fn, done):
+    global _action_canceller
+
+    with _action_canceller_lock:
+        if _action_canceller is None:
+            _action_canceller = ActionCanceller()
+            _action_canceller.start()
+
+    _action_canceller.cancel(cancel_fn, done)
+
+
+def _invoke_action(command, start_fn, cancel_fn, cancel_event):
+    """
+    Run an action through iml-action-runner on this thread, having cancel_event
+    (see ObservableEvent) cancel it from the ActionCanceller.
+    """
+    if cancel_event.is_set():
+        raise RustAgentCancellation()
+
+    done = Event()
+    cancelled = []
+
+    def on_cancel():
+        cancelled.append(True)
+        _cancel_action(cancel_fn, done)
+
+    cancel_event.subscribe(on_cancel)
+    started = time.time()
+    try:
+        result = start_fn().content
+    finally:
+        done.set()
+        cancel_event.unsubscribe(on_cancel)
+        _action_latencies[command].record(time.time() - started)
+
+    if cancelled:
+        raise RustAgentCancellation()
+
+    return result
+
+
+def _invoke_action_polling(command, start_fn, cancel_fn, cancel_event):
+    """
+    As _invoke_action, for a cancel_event which is a plain threading.Event: the action runs
+    on a helper thread while this one wakes up every second to check cancel_event.
+    """
     trigger = Event()
 
     class ActionResult:
@@ -281,11 +495,13 @@ def invoke_rust_local_action(command, args={}, cancel_event=Event()):
         error = None
 
     def start_action(ActionResult, trigger):
+        started = time.time()
         try:
-            ActionResult.ok = start_action_local_with_tcp_or_socket(command, args, request_id).content
+            ActionResult.ok = start_fn().content
         except Exception as e:
             ActionResult.error = e
         finally:
+            _action_latencies[command].record(time.time() - started)
             trigger.set()
 
     t = Thread(target=start_action, args=(ActionResult, trigger))
@@ -296,7 +512,7 @@ def invoke_rust_local_action(command, args={}, cancel_event=Event()):
     # check cancel_event
     while True:
         if cancel_event.is_set():
-            cancel_action_local_with_tcp_or_socket(request_id).content
+            cancel_fn().content
             raise RustAgentCancellation()
         else:
             trigger.wait(timeout=1.0)
@@ -309,43 +525,39 @@ def invoke_rust_local_action(command, args={}, cancel_event=Event()):
         return ActionResult.ok
 
 
-def invoke_rust_agent(host, command, args={}, cancel_event=Event()):
+def invoke_rust_local_action(command, args={}, cancel_event=Event()):
     """
     Talks to the iml-action-runner service
     """
 
     request_id = uuid.uuid4()
 
-    trigger = Event()
+    def start_fn():
+        return start_action_local_with_tcp_or_socket(command, args, request_id)
 
-    class ActionResult:
-        ok = None
-        error = None
+    def cancel_fn():
+        return cancel_action_local_with_tcp_or_socket(request_id)
 
-    def start_action(ActionResult, trigger):
-        try:
-            ActionResult.ok = start_action_with_tcp_or_socket(host, command, args, request_id).content
-        except Exception as e:
-            ActionResult.error = e
-        finally:
-            trigger.set()
+    if isinstance(cancel_event, ObservableEvent):
+        return _invoke_action(command, start_fn, cancel_fn, cancel_event)
+    else:
+        return _invoke_action_polling(command, start_fn, cancel_fn, cancel_event)
 
-    t = Thread(target=start_action, args=(ActionResult, trigger))
 
-    t.start()
+def invoke_rust_agent(host, command, args={}, cancel_event=Event()):
+    """
+    Talks to the iml-action-runner service
+    """
 
-    # Wait for action completion, waking up every second to
-    # check cancel_event
-    while True:
-        if cancel_event.is_set():
-            cancel_action_with_tcp_or_socket(host, request_id).content
-            raise RustAgentCancellation()
-        else:
-            trigger.wait(timeout=1.0)
-            if trigger.is_set():
-                break
+    request_id = uuid.uuid4()
 
-    if ActionResult.error is not None:
-        raise ActionResult.error
+    def start_fn():
+        return start_action_with_tcp_or_socket(host, command, args, request_id)
+
+    def cancel_fn():
+        return cancel_action_with_tcp_or_socket(host, request_id)
+
+    if isinstance(cancel_event, ObservableEvent):
+        return _invoke_action(command, start_fn, cancel_fn, cancel_event)
     else:
-        return ActionResult.ok
+        return _invoke_action_polling(command, start_fn, cancel_fn, cancel_event)
@@ -4,8 +4,11 @@
 
 
 import logging
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
 from django.db.models import CASCADE
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
@@ -268,6 +271,162 @@ class AlertStateBase(SparseModel):
 
         return alert_state
 
+    @classmethod
+    def _item_key(cls, alert_item):
+        if hasattr(alert_item, "content_type"):
+            return alert_item.content_type_id, alert_item.id
+        else:
+            return ContentType.objects.get_for_model(alert_item, for_concrete_model=False).id, alert_item.pk
+
+    @classmethod
+    def notify_many(cls, notifications):
+        """
+        Raise and lower many alerts of this class at once, with the same outcome as calling
+        notify(alert_item, active, **kwargs) for each of `notifications` in turn.
+
+        The active alerts of all the items are fetched in one query, new alerts are inserted
+        with one bulk insert, and lowered alerts are ended with one update (per distinct end_time)
+        and one bulk insert of their end events.
+
+        :param notifications: An iterable of (alert_item, active, kwargs) tuples
+        :return: A list of the raised or lowered alert states (None where there was nothing to do),
+                 in the order of `notifications`
+        """
+        now = timezone.now()
+
+        requests = []
+        for alert_item, active, kwargs in notifications:
+            if hasattr(alert_item, "content_type"):
+                alert_item = alert_item.downcast()
+            kwargs = dict(kwargs)
+            end_time = None if active else kwargs.pop("end_time", now)
+            attrs_to_save = cls._get_attrs_to_save(kwargs)
+            requests.append((alert_item, cls._item_key(alert_item), active, kwargs, attrs_to_save, end_time))
+
+        if not requests:
+            return []
+
+        item_ids = defaultdict(set)
+        for _, (type_id, item_id), _, _, _, _ in requests:
+            item_ids[type_id].add(item_id)
+        item_filter = Q()
+        for type_id, ids in item_ids.items():
+            item_filter |= Q(alert_item_type_id=type_id, alert_item_id__in=ids)
+
+        active_alerts = defaultdict(list)
+        for alert_state in cls.objects.filter(item_filter, active=True):
+            active_alerts[(alert_state.alert_item_type_id, alert_state.alert_item_id)].append(alert_state)
+
+        # The caller already has the items, so prime each alert's alert_item rather than
+        # have end_event() and the like fetch them again one by one
+        item_cache_attr = cls._meta.get_field("alert_item").cache_attr
+
+        def find_active(key, kwargs):
+            for alert_state in active_alerts[key]:
+                if all(getattr(alert_state, attr) == value for attr, value in kwargs.items()):
+                    return alert_state
+            return None
+
+        results = []
+        raised = []
+        lowered = []
+        for alert_item, key, active, kwargs, attrs_to_save, end_time in requests:
+            alert_state = find_active(key, kwargs)
+            if alert_state is not None and alert_state.id is not None:
+                setattr(alert_state, item_cache_attr, alert_item)
+
+            if active:
+                if hasattr(alert_item, "not_deleted") and alert_item.not_deleted != True:
+                    alert_state = None
+                elif alert_state is None:
+                    kwargs.update(attrs_to_save)
+                    kwargs.setdefault("alert_type", cls.__name__)
+                    kwargs.setdefault("severity", cls.default_severity)
+
+                    alert_state = cls(
+                        active=True, dismissed=False, alert_item=alert_item, **kwargs  # Users dismiss, not the software
+                    )
+                    alert_state._message = alert_state.alert_message()
+                    active_alerts[key].append(alert_state)
+                    raised.append(alert_state)
+            elif alert_state is not None:
+                active_alerts[key].remove(alert_state)
+                alert_state.end = end_time
+                alert_state.active = None
+                lowered.append(alert_state)
+
+            results.append(alert_state)
+
+        if raised:
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(raised)
+            except IntegrityError as e:
+                # Colliding with a concurrent creator, fall back to inserting one by one so that
+                # only the colliding alerts are dropped, as high() does.
+                job_log.warning(
+                    "AlertState: IntegrityError %s bulk saving %s, retrying individually" % (e, cls.__name__)
+                )
+                for alert_state in raised:
+                    try:
+                        with transaction.atomic():
+                            alert_state.save()
+                    except IntegrityError:
+                        job_log.warning(
+                            "AlertState: IntegrityError saving %s : %s" % (cls.__name__, alert_state.alert_item)
+                        )
+                        results = [None if result is alert_state else result for result in results]
+                        if alert_state in lowered:
+                            lowered.remove(alert_state)
+
+            for alert_state in raised:
+                if alert_state.id is not None:
+                    job_log.info(
+                        "AlertState: Raised %s on %s "
+                        "at severity %s" % (cls, alert_state.alert_item, alert_state.severity)
+                    )
+
+        if lowered:
+            # Alerts raised and lowered within this call were inserted above in their ended state
+            ended_ids = defaultdict(list)
+            for alert_state in lowered:
+                if alert_state not in raised:
+                    ended_ids[alert_state.end].append(alert_state.id)
+            for end_time, ids in ended_ids.items():
+                AlertStateBase._base_manager.filter(id__in=ids).update(end=end_time, active=None)
+
+            # As register_event() would, but without the intermediate active state
+            end_events = defaultdict(list)
+            for alert_state in lowered:
+                end_event = alert_state.end_event()
+                if end_event:
+                    end_event.alert_type = end_event.__class__.__name__
+                    end_event.active = None
+                    end_event.dismissed = False
+                    end_event.end = end_event.begin
+                    end_event._message = end_event.alert_message()
+                    end_events[end_event.__class__].append(end_event)
+            for event_class, events in end_events.items():
+                event_class.objects.bulk_create(events)
+                raised.extend(events)
+
+        # bulk_create() and update() don't send the signals that save() would, which listeners
+        # such as MailAlerts rely on to learn of alert changes
+        changed = [(alert_state, True) for alert_state in raised]
+        changed += [(alert_state, False) for alert_state in lowered if alert_state not in raised]
+        for alert_state, created in changed:
+            if alert_state.id is not None:
+                post_save.send(
+                    sender=alert_state.__class__,
+                    instance=alert_state,
+                    created=created,
+                    raw=False,
+                    using=alert_state._state.db,
+                    update_fields=None,
+                )
+
+        return results
+
     @classmethod
     def register_event(cls, alert_item, **kwargs):
         # Events are Alerts with no duration, so just go high/low.
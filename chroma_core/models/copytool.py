@@ -221,7 +221,7 @@ class Copytool(StatefulObject):
         if not state:
             state = self.state
 
-        client_mount = ObjectCache.get_one(LustreClientMount, lambda cm: cm.id == self.client_mount_id)
+        client_mount = ObjectCache.get_by_id(LustreClientMount, self.client_mount_id)
 
         deps = []
         if state == "started":
@@ -432,14 +432,12 @@ class RemoveCopytoolJob(StateChangeJob):
         ]
 
     def get_deps(self):
-        search = lambda ct: ct.host == self.copytool.host
-        copytools = ObjectCache.get(Copytool, search)
+        copytools = ObjectCache.get_by_index(Copytool, "host_id", self.copytool.host_id)
 
         # Only force an unmount if this is the only copytool associated
         # with the host.
         if len(copytools) == 1:
-            search = lambda cm: cm.id == self.copytool.client_mount_id
-            client_mount = ObjectCache.get_one(LustreClientMount, search)
+            client_mount = ObjectCache.get_by_id(LustreClientMount, self.copytool.client_mount_id)
             return DependOn(client_mount, "unmounted")
         else:
             return DependAll()
@@ -496,14 +494,12 @@ class RemoveUnconfiguredCopytoolJob(StateChangeJob):
         return [(DeleteCopytoolStep, {"copytool": self.copytool})]
 
     def get_deps(self):
-        search = lambda ct: ct.host == self.copytool.host
-        copytools = ObjectCache.get(Copytool, search)
+        copytools = ObjectCache.get_by_index(Copytool, "host_id", self.copytool.host_id)
 
         # Only force an unmount if this is the only copytool associated
         # with the host.
         if len(copytools) == 1:
-            search = lambda cm: cm.id == self.copytool.client_mount_id
-            client_mount = ObjectCache.get_one(LustreClientMount, search)
+            client_mount = ObjectCache.get_by_id(LustreClientMount, self.copytool.client_mount_id)
             return DependOn(client_mount, "unmounted")
         else:
             return DependAll()
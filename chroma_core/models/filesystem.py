@@ -124,7 +124,7 @@ class ManagedFilesystem(StatefulObject):
 
         deps = []
 
-        mgs = ObjectCache.get_one(ManagedTarget, lambda t: t.id == self.mgs_id, fill_on_miss=True)
+        mgs = ObjectCache.get_by_id(ManagedTarget, self.mgs_id, fill_on_miss=True)
 
         remove_state = "forgotten" if self.immutable_state else "removed"
 
@@ -140,7 +140,7 @@ class ManagedFilesystem(StatefulObject):
     @classmethod
     def filter_by_target(cls, target):
         if issubclass(target.downcast_class, ManagedMgs):
-            result = ObjectCache.get(ManagedFilesystem, lambda mfs: mfs.mgs_id == target.id)
+            result = ObjectCache.get_by_index(ManagedFilesystem, "mgs_id", target.id)
             return result
         elif issubclass(target.downcast_class, FilesystemMember):
             return ObjectCache.get(ManagedFilesystem, lambda mfs: mfs.id == target.downcast().filesystem_id)
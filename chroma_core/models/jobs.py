@@ -5,7 +5,7 @@
 
 import uuid
 
-from collections import defaultdict, namedtuple
+from collections import defaultdict, deque, namedtuple
 
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
@@ -130,52 +130,37 @@ class StatefulObject(models.Model):
         transition_map = defaultdict(list)
         route_map = {}
         for begin_state in cls_.states:
-            all_routes = set()
-
-            # Enumerate all possible routes from this state
-            def get_routes(stack, explore_state):
-                if explore_state in stack:
-                    all_routes.add(tuple(stack))
-                    return
-
-                stack = stack + [explore_state]
-
-                if len(transition_options[explore_state]) == 0:
-                    if len(stack) > 1:
-                        all_routes.add(tuple(stack))
-                    return
-
+            # Breadth first search gives the shortest route to each state reachable from this one
+            routes = {begin_state: (begin_state,)}
+            explore_states = deque([begin_state])
+            while explore_states:
+                explore_state = explore_states.popleft()
                 for next_state in transition_options[explore_state]:
-                    get_routes(stack, next_state)
-
-            get_routes([], begin_state)
+                    if next_state not in routes:
+                        routes[next_state] = routes[explore_state] + (next_state,)
+                        explore_states.append(next_state)
 
-            # For all valid routes with more than 2 states,
-            # all truncations of 2 or more states are also valid routes.
-            truncations = set()
-            for r in all_routes:
-                for i in range(2, len(r)):
-                    truncations.add(tuple(r[0:i]))
-            all_routes = all_routes | truncations
-
-            routes = defaultdict(list)
-            # Build a map of end state to list of ways of getting there
-            for route in all_routes:
-                routes[route[-1]].append(route)
-
-            # Pick the shortest route to each end state
-            for (end_state, possible_routes) in routes.items():
-                possible_routes.sort(lambda a, b: cmp(len(a), len(b)))
-                shortest_route = possible_routes[0]
+            # The begin state is only reachable from itself with a transition to itself
+            if begin_state not in transition_options[begin_state]:
+                del routes[begin_state]
 
+            for end_state, route in routes.items():
                 transition_map[begin_state].append(end_state)
-                route_map[(begin_state, end_state)] = shortest_route
+                route_map[(begin_state, end_state)] = route
 
         cls_.route_map = route_map
         cls_.transition_map = transition_map
 
         cls_.job_class_map = job_class_map
 
+    @staticmethod
+    def build_all_maps():
+        """Populate the maps of every StatefulObject class, so that the first use of
+        each in a process doesn't have to."""
+        for klass in all_subclasses(StatefulObject):
+            if klass.states is not None and not klass._meta.abstract:
+                klass._build_maps()
+
     @classmethod
     def get_route(cls, begin_state, end_state):
         """Return an iterable of state strings, which is navigable using StateChangeJobs"""
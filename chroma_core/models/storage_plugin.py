@@ -6,7 +6,7 @@ from collections import defaultdict
 import json
 import logging
 
-from django.db import models
+from django.db import connection, models
 from django.db.models import Q, CASCADE
 
 from chroma_core.models import AlertEvent
@@ -159,22 +159,91 @@ class StorageResourceRecord(models.Model):
         for i in self.storageresourceattribute_set.all():
             yield (i.key, i.value)
 
+    # Bound on the length of parent chains followed by ancestry, in case of a cycle
+    MAX_ANCESTRY_DEPTH = 32
+
+    @classmethod
+    def ancestry(cls, record_ids):
+        """
+        Find all the ancestors of `record_ids` by following `parents`, in a single query.
+
+        :return: A dict of the ID of each ancestor to its distance from the nearest of `record_ids`
+        """
+        field = cls.parents.field
+        child_column, parent_column = field.m2m_column_name(), field.m2m_reverse_name()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH RECURSIVE ancestry(id, depth) AS (
+                    SELECT {parent}, 1 FROM {table} WHERE {child} = ANY(%s)
+                    UNION
+                    SELECT edge.{parent}, ancestry.depth + 1 FROM {table} edge
+                    JOIN ancestry ON edge.{child} = ancestry.id
+                    WHERE ancestry.depth < %s
+                )
+                SELECT id, MIN(depth) FROM ancestry GROUP BY id
+                """.format(table=field.m2m_db_table(), child=child_column, parent=parent_column),
+                [list(record_ids), cls.MAX_ANCESTRY_DEPTH],
+            )
+            depths = dict(cursor.fetchall())
+
+        if depths and max(depths.values()) >= cls.MAX_ANCESTRY_DEPTH:
+            log.warning(
+                "Ancestry of %s reached the depth limit of %s, ignoring any further ancestors"
+                % (list(record_ids), cls.MAX_ANCESTRY_DEPTH)
+            )
+
+        return depths
+
     def to_resource(self):
+        return StorageResourceRecord.to_resources([self])[self.id]
+
+    @classmethod
+    def to_resources(cls, records):
+        """
+        The equivalent of to_resource for each of `records`, loading their attributes with one
+        query per attribute model class, and resolving ResourceReference attributes in bulk too.
+
+        :return: A dict of record ID to resource
+        """
         from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
 
-        klass = storage_plugin_manager.get_resource_class_by_id(self.resource_class_id)
-        attr_model_to_keys = defaultdict(list)
-        for attr, attr_props in klass._meta.storage_attributes.items():
-            attr_model_to_keys[attr_props.model_class].append(attr)
-        storage_dict = {}
-        for attr_model, keys in attr_model_to_keys.items():
-            for attr in attr_model.objects.filter(resource=self, key__in=keys):
-                storage_dict[attr.key] = attr_model.decode(attr.value)
-
-        resource = klass(**storage_dict)
-        resource._handle = self.id
-        resource._handle_global = True
-        return resource
+        klasses = {}
+        attr_model_to_keys = defaultdict(lambda: defaultdict(set))
+        for record in records:
+            klass = klasses[record.id] = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
+            for attr, attr_props in klass._meta.storage_attributes.items():
+                attr_model_to_keys[attr_props.model_class][record.id].add(attr)
+
+        storage_dicts = defaultdict(dict)
+        for attr_model, keys_by_record in attr_model_to_keys.items():
+            attrs = attr_model.objects.filter(
+                resource_id__in=keys_by_record.keys(), key__in=set.union(*keys_by_record.values())
+            )
+
+            if issubclass(attr_model, StorageResourceAttributeReference):
+                attrs = list(attrs.values_list("resource_id", "key", "value_id"))
+                referenced = cls.to_resources(
+                    StorageResourceRecord.objects.filter(id__in=set(value_id for _, _, value_id in attrs if value_id))
+                )
+                decode = lambda value_id: referenced[value_id] if value_id else None
+            else:
+                attrs = attrs.values_list("resource_id", "key", "value")
+                decode = attr_model.decode
+
+            for resource_id, key, value in attrs:
+                if key in keys_by_record[resource_id]:
+                    storage_dicts[resource_id][key] = decode(value)
+
+        resources = {}
+        for record_id, klass in klasses.items():
+            resource = klass(**storage_dicts[record_id])
+            resource._handle = record_id
+            resource._handle_global = True
+            resources[record_id] = resource
+
+        return resources
 
     def alias_or_name(self, resource=None):
         if self.alias:
@@ -65,7 +65,7 @@ class StratagemConfiguration(StatefulObject):
         return DependAll(deps)
 
     def filter_by_fs(fs):
-        return ObjectCache.get(StratagemConfiguration, lambda sc, fs=fs: sc.filesystem.id == fs.id)
+        return ObjectCache.get_by_index(StratagemConfiguration, "filesystem_id", fs.id)
 
     reverse_deps = {"ManagedFilesystem": filter_by_fs}
 
@@ -209,7 +209,7 @@ class ManagedTarget(StatefulObject):
 
             # Depend on the active mount's host having LNet up, so that if
             # LNet is stopped on that host this target will be stopped first.
-            host = ObjectCache.get_one(ManagedHost, lambda mh: mh.id == active_host_id, fill_on_miss=True)
+            host = ObjectCache.get_by_id(ManagedHost, active_host_id, fill_on_miss=True)
 
             lnet_configuration = ObjectCache.get_by_id(LNetConfiguration, host.lnet_configuration.id)
             deps.append(DependOn(lnet_configuration, "lnet_up", fix_state="unmounted"))
@@ -549,11 +549,11 @@ class StartTargetJob(StateChangeJob):
         for host in self.target.hosts:
             from chroma_core.models import LNetConfiguration
 
-            lnet_configuration = ObjectCache.get_one(LNetConfiguration, lambda l: l.host_id == host.id)
+            lnet_configuration = ObjectCache.get_one_by_index(LNetConfiguration, "host_id", host.id)
             deps.append(DependOn(lnet_configuration, "lnet_up", fix_state="unmounted"))
 
             try:
-                pacemaker_configuration = ObjectCache.get_one(PacemakerConfiguration, lambda pm: pm.host_id == host.id)
+                pacemaker_configuration = ObjectCache.get_one_by_index(PacemakerConfiguration, "host_id", host.id)
                 deps.append(DependOn(pacemaker_configuration, "started", fix_state="unmounted"))
             except PacemakerConfiguration.DoesNotExist:
                 pass
@@ -1,7 +1,7 @@
 # Copyright (c) 2020 DDN. All rights reserved.
 # Use of this source code is governed by a MIT-style
 # license that can be found in the LICENSE file.
-import json
+from collections import defaultdict
 from logging import DEBUG
 
 from toolz import merge
@@ -12,6 +12,7 @@ from chroma_core.lib.storage_plugin.api import attributes
 from chroma_core.lib.storage_plugin.api.identifiers import GlobalId, ScopedId
 from chroma_core.lib.storage_plugin.api import resources
 from chroma_core.lib.storage_plugin.api.plugin import Plugin
+from chroma_core.lib.storage_plugin.base_plugin import report_section_digests, diff_report_digests
 from chroma_core.models import HaCluster
 from chroma_core.plugins.block_devices import get_devices
 from chroma_core.services import log_register
@@ -197,7 +198,7 @@ class Linux(Plugin):
         super(Linux, self).__init__(resource_manager, scannable_id)
 
         self.major_minor_to_node_resource = {}
-        self.current_devices = "{}"
+        self.current_report_digests = {}
 
     def teardown(self):
         log.debug("Linux.teardown")
@@ -209,7 +210,7 @@ class Linux(Plugin):
     def agent_session_start(self, host_id, data, initial_scan=True):
         with transaction.atomic():
             initiate_device_poll = False
-            reported_device_node_paths = []
+            reported_device_node_paths = set()
 
             host = ManagedHost.objects.get(id=host_id)
             fqdn = host.fqdn
@@ -232,22 +233,23 @@ class Linux(Plugin):
                 if expected_item not in devices.keys():
                     devices[expected_item] = {}
 
-            dev_json = json.dumps(devices["devs"], sort_keys=True)
+            # Compare every section, not just devs: a change to e.g. an LV or a multipath
+            # alters the resource graph without necessarily touching any block device.
+            report_digests = report_section_digests(devices)
+            changes = diff_report_digests(self.current_report_digests, report_digests)
 
-            if dev_json == self.current_devices:
+            if not changes:
+                self._count_agent_update(False)
                 return None
 
             log.debug("Linux.devices changed on {}".format(fqdn))
 
-            log.debug(
-                "old devices {}".format(set(json.loads(self.current_devices).keys()) - set(devices["devs"].keys()))
-            )
-
-            log.debug(
-                "new devices {}".format(set(devices["devs"].keys()) - set(json.loads(self.current_devices).keys()))
-            )
-
-            self.current_devices = dev_json
+            for section, (added, removed, changed) in sorted(changes.items()):
+                log.debug(
+                    "{} {}: added {} removed {} changed {}".format(
+                        fqdn, section, sorted(added), sorted(removed), sorted(changed)
+                    )
+                )
 
             lv_block_devices = set()
             for vg, lv_list in devices["lvs"].items():
@@ -306,7 +308,7 @@ class Linux(Plugin):
 
             # Create ScsiDevices
             res_by_serial = {}
-            scsi_device_identifiers = []
+            scsi_device_identifiers = set()
 
             for bdev in devices["devs"].values():
                 serial = preferred_serial(bdev)
@@ -318,7 +320,7 @@ class Linux(Plugin):
                             ScsiDevice, serial=serial, size=bdev["size"], filesystem_type=bdev["filesystem_type"]
                         )
                         res_by_serial[serial] = node
-                        scsi_device_identifiers.append(node.id_tuple())
+                        scsi_device_identifiers.add(node.id_tuple())
 
             # Map major:minor string to LinuxDeviceNode
             self.major_minor_to_node_resource = {}
@@ -346,7 +348,7 @@ class Linux(Plugin):
                         path=bdev["path"],
                     )
                     self.major_minor_to_node_resource[bdev["major_minor"]] = node
-                    reported_device_node_paths.append(bdev["path"])
+                    reported_device_node_paths.add(bdev["path"])
                 else:
                     # Serial is not set, so create an UnsharedDevice
                     device, created = self.update_or_create(
@@ -356,7 +358,7 @@ class Linux(Plugin):
                         LinuxDeviceNode, parents=[device], logical_drive=device, host_id=host_id, path=bdev["path"]
                     )
                     self.major_minor_to_node_resource[bdev["major_minor"]] = node
-                    reported_device_node_paths.append(bdev["path"])
+                    reported_device_node_paths.add(bdev["path"])
 
             # Okay, now we've got ScsiDeviceNodes, time to build the devicemapper ones
             # on top of them.  These can come in any order and be nested to any depth.
@@ -372,7 +374,7 @@ class Linux(Plugin):
                     continue
 
                 self.major_minor_to_node_resource[bdev["major_minor"]] = node
-                reported_device_node_paths.append(bdev["path"])
+                reported_device_node_paths.add(bdev["path"])
 
             # Finally remove any of the scsi devs that are no longer present.
             initiate_device_poll |= self.remove_missing_devices(host_id, ScsiDevice, scsi_device_identifiers)
@@ -448,7 +450,7 @@ class Linux(Plugin):
                     self.update_or_create(LocalMount, parents=[bdev_resource], mount_point=mntpnt, fstype=fstype)
 
             # Create Partitions (devices that have 'parent' set)
-            partition_identifiers = []
+            partition_identifiers = set()
 
             for bdev in [x for x in devices["devs"].values() if x["parent"]]:
                 this_node = self.major_minor_to_node_resource[bdev["major_minor"]]
@@ -470,7 +472,7 @@ class Linux(Plugin):
                 )
 
                 this_node.add_parent(partition)
-                partition_identifiers.append(partition.id_tuple())
+                partition_identifiers.add(partition.id_tuple())
 
             # Finally remove any of the partitions that are no longer present.
             initiate_device_poll |= self.remove_missing_devices(host_id, Partition, partition_identifiers)
@@ -479,6 +481,10 @@ class Linux(Plugin):
 
             initiate_device_poll |= self.remove_missing_devicenodes(reported_device_node_paths)
 
+            # Only remember the report once it has been applied, so that a failed pass is retried
+            self.current_report_digests = report_digests
+            self._count_agent_update(True)
+
         # If we see a device change and the data was sent by the agent poll rather than initial start up
         # then we need to cause all of the ha peer agents and any other nodes that we share VolumeNodes with
         # re-poll themselves.
@@ -501,7 +507,7 @@ class Linux(Plugin):
         self, devices, host_id, device_type, klass, attributes_list, reported_device_node_paths
     ):
         resources_changed = False
-        device_identifiers = []
+        device_identifiers = set()
 
         for device_uuid, device_info in devices[device_type].items():
             block_device = devices["devs"][device_info["block_device"]]
@@ -525,8 +531,8 @@ class Linux(Plugin):
                 path=device_info["path"],
             )
 
-            reported_device_node_paths.append(device_info["path"])
-            device_identifiers.append(device_res.id_tuple())
+            reported_device_node_paths.add(device_info["path"])
+            device_identifiers.add(device_res.id_tuple())
 
             for drive_bd in device_info["drives"]:
                 drive_res = self.major_minor_to_node_resource[drive_bd]
@@ -546,21 +552,33 @@ class Linux(Plugin):
 
         resources_changed = False
 
-        for device_resource in self.find_by_attr(klass):
-            if device_resource.id_tuple() not in device_identifiers:
-                device_node_exists = False
+        missing = [
+            device_resource
+            for device_resource in self.find_by_attr(klass)
+            if device_resource.id_tuple() not in device_identifiers
+        ]
 
-                for resource_node in self.find_by_attr(LinuxDeviceNode):
-                    if resource_node.logical_drive == device_resource:
-                        if resource_node.host_id == host_id:
-                            self.remove(resource_node)
-                            resources_changed |= True
-                        else:
-                            device_node_exists = True
+        if not missing:
+            return resources_changed
 
-                if device_node_exists is False:
-                    self.remove(device_resource)
+        # Group the nodes by drive once rather than scanning every node for each missing drive
+        nodes_by_drive = defaultdict(list)
+        for resource_node in self.find_by_attr(LinuxDeviceNode):
+            nodes_by_drive[resource_node.logical_drive].append(resource_node)
+
+        for device_resource in missing:
+            device_node_exists = False
+
+            for resource_node in nodes_by_drive[device_resource]:
+                if resource_node.host_id == host_id:
+                    self.remove(resource_node)
                     resources_changed |= True
+                else:
+                    device_node_exists = True
+
+            if device_node_exists is False:
+                self.remove(device_resource)
+                resources_changed |= True
 
         return resources_changed
 
@@ -568,7 +586,7 @@ class Linux(Plugin):
         """
         Remove any LinuxDeviceNode paths that were not reported at all this iteration
 
-        :param reported_paths: list of LinuxDeviceNode path's report on this iteration
+        :param reported_paths: set of LinuxDeviceNode path's report on this iteration
 
         :return True if any resources were removed.
         """
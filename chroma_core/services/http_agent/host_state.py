@@ -3,9 +3,14 @@
 # license that can be found in the LICENSE file.
 
 
+import heapq
+import itertools
 import logging
 import threading
-import datetime
+import time
+import traceback
+
+from django.db import transaction
 
 from chroma_agent_comms.views import MessageView
 from chroma_core.models import ManagedHost, HostContactAlert, HostRebootEvent
@@ -36,16 +41,30 @@ class HostState(object):
         self._boot_time = boot_time
         self._client_start_time = client_start_time
 
+        # The time.time() by which we must hear from the host again for it to remain healthy,
+        # and whether HostStateCollection has it scheduled.
+        self.contact_deadline = None
+        self.deadline_scheduled = False
+
     def update_health(self, healthy):
         HostContactAlert.notify(self._host, not healthy)
         self._healthy = healthy
 
+    @staticmethod
+    def update_health_many(host_states, healthy):
+        """As update_health for each of `host_states`, raising or lowering their alerts together"""
+        with transaction.atomic():
+            HostContactAlert.notify_many([(host_state._host, not healthy, {}) for host_state in host_states])
+        for host_state in host_states:
+            host_state._healthy = healthy
+
     def update(self, boot_time, client_start_time):
         """
         :return A boolean, true if the agent should be sent a SESSION_TERMINATE_ALL: indicates
                 whether a fresh client run (different start time) is seen.
         """
         self.last_contact = IMLDateTime.utcnow()
+        self.contact_deadline = time.time() + self.CONTACT_TIMEOUT
         if boot_time is not None and boot_time != self._boot_time:
             if self._boot_time is not None:
                 HostRebootEvent.register_event(alert_item=self._host, boot_time=boot_time, severity=logging.WARNING)
@@ -66,11 +85,8 @@ class HostState(object):
 
         return require_reset
 
-    def poll(self):
-        if self._healthy:
-            time_since_contact = IMLDateTime.utcnow() - self.last_contact
-            if time_since_contact > datetime.timedelta(seconds=self.CONTACT_TIMEOUT):
-                self.update_health(False)
+    @property
+    def healthy(self):
         return self._healthy
 
 
@@ -78,11 +94,20 @@ class HostStateCollection(object):
     """
     Store some per-host state, things we will check and update
     without polling/continuously updating the database.
+
+    The contact deadlines of hosts are kept in a heap, so that finding the hosts
+    which have lost contact doesn't require visiting every host.
     """
 
     def __init__(self):
         self._hosts = {}
 
+        # Heap of (contact deadline, sequence, HostState), with at most one entry per host: a host
+        # contacting us again before its scheduled deadline is rescheduled when that entry expires.
+        self._deadlines = []
+        self._sequence = itertools.count()
+        self._deadlines_changed = threading.Condition(threading.Lock())
+
         for mh in ManagedHost.objects.all().values("fqdn", "boot_time"):
             self._hosts[mh["fqdn"]] = HostState(mh["fqdn"], mh["boot_time"], None)
 
@@ -95,19 +120,74 @@ class HostStateCollection(object):
         except KeyError:
             state = self._hosts[fqdn] = HostState(fqdn, None, None)
 
-        return state.update(boot_time, client_start_time)
+        require_reset = state.update(boot_time, client_start_time)
+        self._schedule(state)
+
+        return require_reset
 
     def items(self):
         return self._hosts.items()
 
+    def _schedule(self, state):
+        with self._deadlines_changed:
+            if not state.deadline_scheduled:
+                heapq.heappush(self._deadlines, (state.contact_deadline, next(self._sequence), state))
+                state.deadline_scheduled = True
+
+                # Wake the poller if this is now the earliest deadline
+                if self._deadlines[0][2] is state:
+                    self._deadlines_changed.notify_all()
+
+    def time_to_next_deadline(self):
+        """
+        :return: Seconds until the earliest scheduled contact deadline, or None if none are scheduled
+        """
+        with self._deadlines_changed:
+            if self._deadlines:
+                return self._deadlines[0][0] - time.time()
+            else:
+                return None
+
+    def wait(self, timeout=None):
+        """Wait for up to `timeout` seconds, or until an earlier deadline is scheduled or `wake` is called"""
+        with self._deadlines_changed:
+            self._deadlines_changed.wait(timeout)
+
+    def wake(self):
+        with self._deadlines_changed:
+            self._deadlines_changed.notify_all()
+
+    def pop_expired(self):
+        """Remove the hosts whose contact deadlines have passed from the schedule.
+
+        :return: List of the HostStates of hosts which have not been heard from by their deadline
+        """
+        now = time.time()
+        expired = []
+
+        with self._deadlines_changed:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, _, state = heapq.heappop(self._deadlines)
+                if self._hosts.get(state.fqdn) is not state:
+                    # Removed since it was scheduled
+                    continue
+                elif state.contact_deadline > now:
+                    heapq.heappush(self._deadlines, (state.contact_deadline, next(self._sequence), state))
+                else:
+                    state.deadline_scheduled = False
+                    expired.append(state)
+
+        return expired
+
 
 class HostStatePoller(object):
     """
-    This thread periodically calls the .poll method of all the
-    hosts in a collection, in order to generate timeouts.
+    This thread sleeps until the earliest contact deadline of the hosts in
+    a collection, in order to generate timeouts.
     """
 
-    # How often to wake up and update alerts
+    # How long to wait after the first deadline expires before updating alerts, so
+    # that hosts which lose contact together are handled together.
     POLL_INTERVAL = 10
 
     # How long to wait at startup (to avoid immediately generating offline
@@ -123,12 +203,39 @@ class HostStatePoller(object):
         self._stopping.wait(self.STARTUP_DELAY)
 
         while not self._stopping.is_set():
-            for fqdn, host_state in self._hosts.items():
-                healthy = host_state.poll()
-                if not healthy:
-                    self._sessions.reset_fqdn_sessions(host_state.fqdn)
+            timeout = self._hosts.time_to_next_deadline()
+            if timeout is None or timeout > 0:
+                self._hosts.wait(timeout)
+            else:
+                self._stopping.wait(self.POLL_INTERVAL)
+                self._expire(self._hosts.pop_expired())
+
+    def _expire(self, host_states):
+        host_states = [
+            host_state
+            for host_state in host_states
+            if host_state.healthy and host_state.contact_deadline <= time.time()
+        ]
+        if not host_states:
+            return
+
+        log.info("Lost contact with %s hosts" % len(host_states))
 
-            self._stopping.wait(self.POLL_INTERVAL)
+        try:
+            HostState.update_health_many(host_states, False)
+        except Exception:
+            # Fall back to one host at a time, so that one failing doesn't affect the others
+            log.warning("Failed to update health of %s hosts together: %s" % (len(host_states), traceback.format_exc()))
+            for host_state in host_states:
+                try:
+                    with transaction.atomic():
+                        host_state.update_health(False)
+                except Exception:
+                    log.error("Failed to update health of %s: %s" % (host_state.fqdn, traceback.format_exc()))
+
+        for host_state in host_states:
+            self._sessions.reset_fqdn_sessions(host_state.fqdn)
 
     def stop(self):
         self._stopping.set()
+        self._hosts.wake()
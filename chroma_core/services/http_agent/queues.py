@@ -5,8 +5,9 @@
 
 import Queue
 import threading
-from chroma_core.services import _amqp_connection, log_register
-from chroma_core.services.queue import ServiceQueue
+from collections import defaultdict, deque
+from chroma_core.services import log_register
+from chroma_core.services.queue import ServiceQueue, AgentRxQueue
 
 
 class AgentTxQueue(ServiceQueue):
@@ -35,6 +36,17 @@ class HostQueueCollection(object):
                 self._host_queues[fqdn] = queues
                 return queues
 
+    def stats(self):
+        """
+        :return: Dict of fqdn to the counters of its outgoing messages: `tx_depth` messages queued,
+                 `tx_sent` messages sent, and `tx_truncated` responses which were full,
+                 leaving messages queued
+        """
+        with self._lock:
+            host_queues = self._host_queues.values()
+
+        return dict((queues.fqdn, queues.stats()) for queues in host_queues)
+
     def remove_host(self, fqdn):
         with self._lock:
             self._host_queues.pop(fqdn, None)
@@ -46,41 +58,97 @@ class HostQueueCollection(object):
     def receive(self, message):
         self.plugin_rx_queue.put(message)
 
+    def receive_many(self, plugin, messages):
+        """Forward several DATA messages for one plugin, in a single DATA_BATCH envelope
+        which AgentRxQueue unpacks."""
+        if len(messages) == 1:
+            self.receive(messages[0])
+        else:
+            self.plugin_rx_queue.put(
+                {"type": "DATA_BATCH", "fqdn": messages[0]["fqdn"], "plugin": plugin, "messages": messages}
+            )
+
 
 class HostQueues(object):
-    """Outgoing messages for a single host"""
+    """Outgoing messages for a single host.
+
+    Readers of the TX queue hold `tx_lock`, and use get_tx/unget_tx so that a message taken
+    from the queue but not sent can be returned to the head of the queue.
+    """
 
     def __init__(self, fqdn):
         self.fqdn = fqdn
         self.tx = Queue.Queue()
         self.tx_lock = threading.Lock()
+        self._tx_returned = deque()
+
+        self.tx_sent = 0
+        self.tx_truncated = 0
+
+    def get_tx(self, block=True, timeout=None):
+        try:
+            return self._tx_returned.popleft()
+        except IndexError:
+            return self.tx.get(block=block, timeout=timeout)
+
+    def unget_tx(self, message):
+        self._tx_returned.appendleft(message)
+
+    @property
+    def tx_depth(self):
+        return self.tx.qsize() + len(self._tx_returned)
+
+    def stats(self):
+        return {"tx_depth": self.tx_depth, "tx_sent": self.tx_sent, "tx_truncated": self.tx_truncated}
 
 
 class AmqpRxForwarder(object):
+    """Forward messages received from agents to the AMQP queue of their plugin.
+
+    Messages which accumulate while a batch is being sent are forwarded together, with
+    one ServiceQueue.put_many per plugin.
+    """
+
+    MAX_BATCH = 256
+
     def __init__(self, queue_collection):
-        self._stopping = threading.Event()
         self._queue_collection = queue_collection
+        self._plugin_queues = {}
+
+    def _plugin_queue(self, plugin_name):
+        try:
+            return self._plugin_queues[plugin_name]
+        except KeyError:
+            return self._plugin_queues.setdefault(plugin_name, AgentRxQueue(plugin_name))
+
+    def _get_batch(self):
+        rx_queue = self._queue_collection.plugin_rx_queue
+
+        batch = [rx_queue.get(block=True)]
+        while len(batch) < self.MAX_BATCH:
+            try:
+                batch.append(rx_queue.get_nowait())
+            except Queue.Empty:
+                break
+
+        return batch
 
     def run(self):
-        with _amqp_connection() as conn:
-            while not self._stopping.is_set():
-                try:
-                    msg = self._queue_collection.plugin_rx_queue.get(block=True, timeout=1)
-                except Queue.Empty:
-                    pass
+        stopping = False
+        while not stopping:
+            plugin_messages = defaultdict(list)
+            for msg in self._get_batch():
+                # None is put by stop(), after which we finish forwarding what was received before it
+                if msg is None:
+                    stopping = True
                 else:
-                    plugin_name = msg["plugin"]
-                    rx_queue_name = "agent_%s_rx" % plugin_name
-                    q = conn.SimpleQueue(
-                        rx_queue_name,
-                        serializer="json",
-                        exchange_opts={"durable": False},
-                        queue_opts={"durable": False},
-                    )
-                    q.put(msg)
+                    plugin_messages[msg["plugin"]].append(msg)
+
+            for plugin_name, messages in plugin_messages.items():
+                self._plugin_queue(plugin_name).put_many(messages)
 
     def stop(self):
-        self._stopping.set()
+        self._queue_collection.plugin_rx_queue.put(None)
 
 
 class AmqpTxForwarder(object):
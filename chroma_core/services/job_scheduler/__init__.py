@@ -6,6 +6,7 @@
 import threading
 import traceback
 
+import django.db
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import DateTimeField
 from django.db.models.query_utils import Q
@@ -23,44 +24,88 @@ log = log_register(__name__)
 
 
 class QueueHandler(object):
-    """Service ModificationNotificationQueue and call into JobScheduler on message"""
+    """Service ModificationNotificationQueue and call into JobScheduler on message
+
+    If settings.NOTIFICATION_BATCH_WINDOW is non-zero, notifications received from the queue are
+    coalesced in a NotificationBatch and applied with JobScheduler.notify_many once per window,
+    rather than one at a time.
+    """
+
+    def __init__(self, job_scheduler, batch_window=None):
+        from chroma_core.services.job_scheduler.job_scheduler import NotificationBatch
 
-    def __init__(self, job_scheduler):
         self._queue = job_scheduler_notify.NotificationQueue()
         self._queue.purge()
         self._job_scheduler = job_scheduler
 
+        self._batch_window = settings.NOTIFICATION_BATCH_WINDOW if batch_window is None else batch_window
+        self._batch = NotificationBatch()
+        self._stopping = threading.Event()
+
     def stop(self):
+        self._stopping.set()
         self._queue.stop()
 
     def run(self):
         # Disregard any old messages
-        self._queue.serve(self.on_message)
+        if self._batch_window:
+            flush_thread = threading.Thread(target=self._flush_batches)
+            flush_thread.start()
+            self._queue.serve(self.on_message_batched)
+            self._stopping.set()
+            flush_thread.join()
+        else:
+            self._queue.serve(self.on_message)
+
+    def _flush_batches(self):
+        while not self._stopping.is_set():
+            self._stopping.wait(self._batch_window)
+            self.flush_batch()
+
+        django.db.connection.close()
+
+    def flush_batch(self):
+        notifications = self._batch.drain()
+        if not notifications:
+            return
 
-    def on_message(self, message):
         try:
-            # Deserialize any datetimes which were serialized for JSON
-            deserialized_update_attrs = {}
-            model_klass = ContentType.objects.get_by_natural_key(*message["instance_natural_key"]).model_class()
-            for attr, value in message["update_attrs"].items():
-                try:
-                    field = [f for f in model_klass._meta.fields if f.name == attr][0]
-                except IndexError:
-                    # e.g. _id names, they aren't datetimes so ignore them
-                    deserialized_update_attrs[attr] = value
+            self._batch.applied += self._job_scheduler.notify_many(notifications)
+        except Exception:
+            log.error("flush_batch: error applying %s notifications: %s" % (len(notifications), traceback.format_exc()))
+
+        log.debug(
+            "flush_batch: %s notifications received, %s coalesced, %s applied"
+            % (self._batch.received, self._batch.coalesced, self._batch.applied)
+        )
+
+    def _deserialize(self, message):
+        # Deserialize any datetimes which were serialized for JSON
+        deserialized_update_attrs = {}
+        model_klass = ContentType.objects.get_by_natural_key(*message["instance_natural_key"]).model_class()
+        for attr, value in message["update_attrs"].items():
+            try:
+                field = [f for f in model_klass._meta.fields if f.name == attr][0]
+            except IndexError:
+                # e.g. _id names, they aren't datetimes so ignore them
+                deserialized_update_attrs[attr] = value
+            else:
+                if isinstance(field, DateTimeField):
+                    deserialized_update_attrs[attr] = IMLDateTime.parse(value)
                 else:
-                    if isinstance(field, DateTimeField):
-                        deserialized_update_attrs[attr] = IMLDateTime.parse(value)
-                    else:
-                        deserialized_update_attrs[attr] = value
+                    deserialized_update_attrs[attr] = value
 
-            log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
+        log.debug("on_message: %s %s" % (message, deserialized_update_attrs))
 
+        return deserialized_update_attrs
+
+    def on_message(self, message):
+        try:
             self._job_scheduler.notify(
                 message["instance_natural_key"],
                 message["instance_id"],
                 message["time"],
-                deserialized_update_attrs,
+                self._deserialize(message),
                 message["from_states"],
             )
         except:
@@ -68,6 +113,18 @@ class QueueHandler(object):
             # bringing down the whole service
             log.warning("on_message: bad message: %s" % traceback.format_exc())
 
+    def on_message_batched(self, message):
+        try:
+            self._batch.add(
+                message["instance_natural_key"],
+                message["instance_id"],
+                IMLDateTime.parse(message["time"]),
+                self._deserialize(message),
+                message["from_states"],
+            )
+        except:
+            log.warning("on_message_batched: bad message: %s" % traceback.format_exc())
+
 
 class Service(ChromaService):
     def __init__(self):
@@ -11,6 +11,7 @@ import json
 import threading
 import time
 import uuid
+from chroma_core.lib.util import LatencyHistogram, ObservableEvent, wait_for_event
 from chroma_core.services import log_register, ServiceThread
 from chroma_core.services.http_agent import HttpAgentRpc
 from chroma_core.services.http_agent.queues import AgentTxQueue
@@ -32,7 +33,7 @@ class ActionInFlight(object):
         self.action = action
         self.args = args
 
-        self.complete = threading.Event()
+        self.complete = ObservableEvent()
         self.exception = None
         self.result = None
         self.subprocesses = []
@@ -92,6 +93,9 @@ class AgentRpcMessenger(object):
 
         self._lock = threading.Lock()
 
+        # Action name to LatencyHistogram of calls to it
+        self._latencies = defaultdict(LatencyHistogram)
+
     def run(self):
         try:
             HttpAgentRpc().reset_plugin_sessions(AgentRpcMessenger.PLUGIN_NAME)
@@ -289,17 +293,10 @@ class AgentRpcMessenger(object):
     def _complete(self, rpc, cancel_event):
         log.info("AgentRpcMessenger._complete: starting wait for rpc %s" % rpc.id)
 
-        # Wait for rpc.complete, waking up every second to
-        # check cancel_event
-        while True:
-            if cancel_event.is_set():
-                self._send_cancellation(rpc)
-                self._cancelled_rpcs.append(rpc.id)
-                raise AgentCancellation()
-            else:
-                rpc.complete.wait(timeout=1.0)
-                if rpc.complete.is_set():
-                    break
+        if not wait_for_event(rpc.complete, cancel_event):
+            self._send_cancellation(rpc)
+            self._cancelled_rpcs.append(rpc.id)
+            raise AgentCancellation()
 
         log.info("AgentRpcMessenger._complete: completed wait for rpc %s" % rpc.id)
         if rpc.exception:
@@ -309,8 +306,18 @@ class AgentRpcMessenger(object):
 
     def call(self, fqdn, action, args, cancel_event):
         log.debug("AgentRpcMessenger.call: %s %s" % (fqdn, action))
-        rpc = self._send_request(fqdn, action, args)
-        return self._complete(rpc, cancel_event), rpc
+        started = time.time()
+        try:
+            rpc = self._send_request(fqdn, action, args)
+            return self._complete(rpc, cancel_event), rpc
+        finally:
+            self._latencies[action].record(time.time() - started)
+
+    def latency_stats(self):
+        """
+        :return: {action: LatencyHistogram.to_dict()} for the actions called through this messenger
+        """
+        return dict((action, histogram.to_dict()) for action, histogram in self._latencies.items())
 
     def await_session(self, fqdn, timeout):
         """
@@ -360,6 +367,10 @@ class AgentRpc(object):
     def remove(cls, fqdn):
         return cls._messenger.remove(fqdn)
 
+    @classmethod
+    def latency_stats(cls):
+        return cls._messenger.latency_stats() if cls._messenger is not None else {}
+
     @classmethod
     def get_session_id(cls, fqdn):
         return cls._messenger.get_session_id(fqdn)
@@ -13,7 +13,7 @@ from django.core.exceptions import ObjectDoesNotExist
 import os
 import operator
 import itertools
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import Queue
 from copy import deepcopy
 from chroma_core.lib.util import all_subclasses
@@ -22,12 +22,13 @@ from chroma_core.services import dbutils
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction, DEFAULT_DB_ALIAS
-from django.db.models import Q, ManyToManyField
+from django.db.models import Q, ManyToManyField, TextField, Value
+from django.db.models.functions import Concat
 from django.core.exceptions import FieldDoesNotExist
 import django.utils.timezone
 
 from chroma_core.lib.cache import ObjectCache
-from chroma_core.lib.util import target_label_split
+from chroma_core.lib.util import target_label_split, action_latency_stats, ObservableEvent
 from chroma_core.models.server_profile import ServerProfile
 from chroma_core.models import Command
 from chroma_core.models import StateLock
@@ -54,7 +55,10 @@ from chroma_core.models import StratagemConfiguration
 from chroma_core.services.job_scheduler.dep_cache import DepCache
 from chroma_core.services.job_scheduler.lock_cache import LockCache, lock_change_receiver, to_lock_json
 from chroma_core.services.job_scheduler.command_plan import CommandPlan
-from chroma_core.services.job_scheduler.agent_rpc import AgentException
+from chroma_core.lib.partition_lock import PartitionLock
+from chroma_core.services.job_scheduler.partition import PartitionMap
+from chroma_core.services.job_scheduler.step_executor import StepExecutor
+from chroma_core.services.job_scheduler.agent_rpc import AgentException, AgentRpc
 from chroma_core.services.plugin_runner.agent_daemon_interface import AgentDaemonRpcInterface
 from chroma_core.services.queue import ServiceQueue
 from chroma_core.services.rpc import RpcError
@@ -129,6 +133,78 @@ class NotificationBuffer(object):
         return trimmed_notifications
 
 
+class NotificationBatch(object):
+    """
+    Collects notifications arriving within a short window so that they can be applied
+    together with JobScheduler.notify_many.
+
+    Notifications are coalesced per object: a notification at least as new as the
+    latest one for its object, and with the same from_states, is merged into it, its
+    attributes winning and its time being kept.  Notifications with different
+    from_states are kept apart, as JobScheduler._notify checks each one's from_states
+    separately.
+
+    A notification arriving out of order keeps its own time, and only those of its
+    attributes which no newer unconditional notification (one without from_states)
+    sets, so that stale attributes are never stamped with a newer time.  It is applied
+    before the newer notifications.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._notifications = OrderedDict()
+
+        self.received = 0
+        self.coalesced = 0
+        self.applied = 0
+
+    def add(self, content_type, object_id, notification_time, update_attrs, from_states):
+        key = (tuple(content_type), object_id)
+        notification = [content_type, object_id, notification_time, dict(update_attrs), from_states]
+        with self._lock:
+            self.received += 1
+            try:
+                # Notifications for the object, oldest first
+                existing = self._notifications[key]
+            except KeyError:
+                self._notifications[key] = [notification]
+                return
+
+            latest = existing[-1]
+            if notification_time >= latest[2]:
+                if from_states == latest[4]:
+                    self.coalesced += 1
+                    latest[2] = notification_time
+                    latest[3].update(update_attrs)
+                else:
+                    existing.append(notification)
+                return
+
+            index = len(existing)
+            newer_attrs = set()
+            while index > 0 and existing[index - 1][2] > notification_time:
+                index -= 1
+                # A newer notification only supersedes these attrs if it is sure to be applied
+                if not existing[index][4]:
+                    newer_attrs.update(existing[index][3])
+
+            notification[3] = dict((attr, value) for attr, value in update_attrs.items() if attr not in newer_attrs)
+            if notification[3]:
+                existing.insert(index, notification)
+            else:
+                self.coalesced += 1
+
+    def drain(self):
+        """
+        :return: A list of argument lists for use in JobScheduler.notify_many
+        """
+        with self._lock:
+            notifications = [tuple(n) for existing in self._notifications.values() for n in existing]
+            self._notifications = OrderedDict()
+
+        return notifications
+
+
 class SimpleConnectionQuota(object):
     """
     This class provides a way to limit the total number of DB connections
@@ -166,12 +242,54 @@ def _disable_database():
     django.db.connection.connection = DISABLED_CONNECTION
 
 
+class StepOutputBuffer(object):
+    """
+    Log and console output of a step which has not yet been written to its StepResult
+    """
+
+    def __init__(self, result_id):
+        self.result_id = result_id
+        self.buffered_at = None
+        self.size = 0
+        self._chunks = {"log": [], "console": []}
+
+    def append(self, field, text):
+        if self.buffered_at is None:
+            self.buffered_at = time.time()
+        self._chunks[field].append(text)
+        self.size += len(text)
+
+    def flush(self):
+        """
+        Append the buffered output to the StepResult in the database, rather than
+        rewriting the whole (possibly very large) text columns.
+        """
+        updates = dict(
+            (field, Concat(field, Value("".join(chunks)), output_field=TextField()))
+            for field, chunks in self._chunks.items()
+            if chunks
+        )
+        if updates:
+            StepResult.objects.filter(id=self.result_id).update(modified_at=django.utils.timezone.now(), **updates)
+
+        self.buffered_at = None
+        self.size = 0
+        self._chunks = {"log": [], "console": []}
+
+
 class JobProgress(threading.Thread, Queue.Queue):
     """
     A thread and a queue for handling progress/completion information
     from RunJobThread
+
+    Step log and console output is buffered per job and appended to the StepResult once
+    FLUSH_SIZE characters are pending or the oldest is FLUSH_INTERVAL seconds old, and before
+    anything else is recorded for the job.
     """
 
+    FLUSH_SIZE = 256 * 1024
+    FLUSH_INTERVAL = 1.0
+
     def __init__(self, job_scheduler):
         threading.Thread.__init__(self)
         Queue.Queue.__init__(self)
@@ -180,16 +298,19 @@ class JobProgress(threading.Thread, Queue.Queue):
 
         self._stopping = threading.Event()
         self._job_to_result = {}
+        self._job_to_output = {}
 
     def run(self):
         while not self._stopping.is_set():
             try:
-                self._handle(self.get(block=True, timeout=1))
+                self._handle(self.get(block=True, timeout=self.FLUSH_INTERVAL))
             except Queue.Empty:
                 pass
+            self._flush_output(expired_only=True)
 
         for msg in self.queue:
             self._handle(msg)
+        self._flush_output()
 
     def _handle(self, msg):
         fn = getattr(self, "_%s" % msg[0])
@@ -216,46 +337,77 @@ class JobProgress(threading.Thread, Queue.Queue):
 
             return getter
 
+    def _flush_output(self, job_id=None, expired_only=False):
+        if job_id is not None:
+            outputs = [self._job_to_output[job_id]] if job_id in self._job_to_output else []
+        else:
+            outputs = self._job_to_output.values()
+
+        now = time.time()
+        for output in outputs:
+            if output.buffered_at is None:
+                continue
+            if expired_only and now - output.buffered_at < self.FLUSH_INTERVAL:
+                continue
+            output.flush()
+
+    def _buffer_output(self, job_id, field, log_string):
+        output = self._job_to_output[job_id]
+        output.append(field, log_string)
+        if output.size >= self.FLUSH_SIZE:
+            output.flush()
+
     def _complete_job(self, job_id, errored):
+        self._flush_output(job_id)
+        self._job_to_output.pop(job_id, None)
+        self._job_to_result.pop(job_id, None)
+
         self._job_scheduler.complete_job(job_id, errored=errored)
 
-    def _advance(self):
-        self._job_scheduler.advance()
+    def _advance(self, partition=None):
+        self._job_scheduler.advance(partition)
 
     def _start_step(self, job_id, **kwargs):
+        self._flush_output(job_id)
+
         with transaction.atomic():
             result = StepResult(job_id=job_id, **kwargs)
             result.save()
         self._job_to_result[job_id] = result
+        self._job_to_output[job_id] = StepOutputBuffer(result.id)
 
     def _log(self, job_id, log_string):
-        result = self._job_to_result[job_id]
-        with transaction.atomic():
-            result.log += log_string
-            result.save()
+        self._buffer_output(job_id, "log", log_string)
 
     def _console(self, job_id, log_string):
-        result = self._job_to_result[job_id]
-        with transaction.atomic():
-            result.console += log_string
-            result.save()
+        self._buffer_output(job_id, "console", log_string)
 
     def _step_failure(self, job_id, backtrace):
+        self._flush_output(job_id)
+
+        # Only save the fields changed here, the in memory log and console are not kept up to date
         result = self._job_to_result[job_id]
         with transaction.atomic():
             result.state = "failed"
             result.backtrace = backtrace
-            result.save()
+            result.save(update_fields=["state", "backtrace", "modified_at"])
 
     def _step_success(self, job_id, step_result):
+        self._flush_output(job_id)
+
         result = self._job_to_result[job_id]
         with transaction.atomic():
             result.state = "success"
             result.result = json.dumps(step_result)
-            result.save()
+            result.save(update_fields=["state", "result", "modified_at"])
 
 
 class RunJobThread(threading.Thread):
+    """
+    Runs the steps of a job, either all at once as a thread, or one at a time
+    from a StepExecutor worker via run_next_step.
+    """
+
     CANCEL_TIMEOUT = 30
 
     def __init__(self, job_progress, connection_quota, job, steps):
@@ -263,9 +415,14 @@ class RunJobThread(threading.Thread):
         self.job = job
         self._job_progress = job_progress
         self._connection_quota = connection_quota
-        self._cancel = threading.Event()
+        # Observable so that agent and action-runner calls can wait for completion or cancellation without polling
+        self._cancel = ObservableEvent()
         self._complete = threading.Event()
         self.steps = steps
+        self.command_id = None
+
+        self._step_index = 0
+        self._prev_result = None
 
     def cancel(self):
         log.info("Job %s: cancelling" % self.job.id)
@@ -280,6 +437,17 @@ class RunJobThread(threading.Thread):
             # HYD-1485: Get a mechanism to interject when the thread is blocked on an agent call
             log.error("Job %s: cancel timed out, will continue as zombie thread!" % self.job.id)
 
+    def discard(self):
+        """Mark a cancelled run which will not run any more steps as complete"""
+        self._complete.set()
+
+    @property
+    def next_step(self):
+        """(klass, args) of the step to run next, or None if no more steps will run"""
+        if self._step_index < len(self.steps) and not self._cancel.is_set():
+            return self.steps[self._step_index]
+        return None
+
     def run(self):
         if django.db.connection.connection:
             log.error("RunJobThread started with a DB connection!")
@@ -297,79 +465,121 @@ class RunJobThread(threading.Thread):
         if django.db.connection.connection and django.db.connection.connection != DISABLED_CONNECTION:
             django.db.connection.close()
 
+    def run_next_step(self):
+        """
+        Run the next step of the job, handling errors and the database connection as run() does.
+
+        :return: True if there are more steps to run.
+        """
+        try:
+            more = self._run_step()
+        except Exception:
+            log.critical("Unhandled exception in RunJobThread: %s" % traceback.format_exc())
+            os._exit(-1)
+
+        if not more:
+            self._complete.set()
+
+        if django.db.connection.connection and django.db.connection.connection != DISABLED_CONNECTION:
+            django.db.connection.close()
+
+        return more
+
     def _run(self):
-        log.info("Job %d: %s.run" % (self.job.id, self.__class__.__name__))
+        while self._run_step():
+            pass
 
-        step_index = 0
-        finish_step = -1
-        prev_result = None
+    def _finish(self):
+        if not self._cancel.is_set():
+            log.info("Job %d finished %d steps successfully" % (self.job.id, self._step_index))
 
-        while step_index < len(self.steps) and not self._cancel.is_set():
-            klass, args = self.steps[step_index]
-            args["prev_result"] = prev_result
+            self._job_progress.complete_job(self.job.id, errored=False)
 
-            # Do not persist any sensitive arguments (prefixed with __)
-            clean_args = dict([(k, v) for k, v in args.items() if not k.startswith("__")])
+        return False
 
-            self._job_progress.start_step(
-                self.job.id, step_klass=klass, args=clean_args, step_index=step_index, step_count=len(self.steps)
-            )
+    def _run_step(self):
+        """
+        :return: True if there are more steps to run.
+        """
+        if self._step_index == 0:
+            log.info("Job %d: %s.run" % (self.job.id, self.__class__.__name__))
 
-            step = klass(
-                self.job,
-                args,
-                lambda l: self._job_progress.log(self.job.id, l),
-                lambda c: self._job_progress.console(self.job.id, c),
-                self._cancel,
-            )
+        if self._step_index >= len(self.steps) or self._cancel.is_set():
+            return self._finish()
 
-            try:
-                if step.database:
-                    # Get a token entitling code running in this thread
-                    # to open a database connection when it chooses to
-                    self._connection_quota.acquire()
-                else:
-                    _disable_database()
+        step_index = self._step_index
+        klass, args = self.steps[step_index]
+        args["prev_result"] = self._prev_result
 
-                log.debug("Job %d running step %d" % (self.job.id, step_index))
-                result = step.run(args)
-                prev_result = result
-                log.debug("Job %d step %d successful result %s" % (self.job.id, step_index, result))
+        # Do not persist any sensitive arguments (prefixed with __)
+        clean_args = dict([(k, v) for k, v in args.items() if not k.startswith("__")])
 
-                self._job_progress.step_success(self.job.id, result)
-            except AgentException as e:
-                log.error("Job %d step %d encountered an agent error: %s" % (self.job.id, step_index, e.backtrace))
+        self._job_progress.start_step(
+            self.job.id, step_klass=klass, args=clean_args, step_index=step_index, step_count=len(self.steps)
+        )
 
-                # Don't bother storing the backtrace to invoke_agent, the interesting part
-                # is the backtrace inside the AgentException
-                self._job_progress.step_failure(self.job.id, e.backtrace)
-                self._job_progress.complete_job(self.job.id, errored=True)
-                return
-            except Exception as e:
-                backtrace = traceback.format_exc()
-                log.error("Job %d step %d encountered an error: %s:%s" % (self.job.id, step_index, e, backtrace))
+        step = klass(
+            self.job,
+            args,
+            lambda l: self._job_progress.log(self.job.id, l),
+            lambda c: self._job_progress.console(self.job.id, c),
+            self._cancel,
+        )
 
-                self._job_progress.step_failure(self.job.id, backtrace)
-                self._job_progress.complete_job(self.job.id, errored=True)
-                return
-            finally:
-                if step.database:
-                    log.debug("Job %d releasing database connection" % self.job.id)
-                    self._connection_quota.release(django.db.connection.connection)
+        try:
+            if step.database:
+                # Get a token entitling code running in this thread
+                # to open a database connection when it chooses to
+                self._connection_quota.acquire()
+            else:
+                _disable_database()
+
+            log.debug("Job %d running step %d" % (self.job.id, step_index))
+            result = step.run(args)
+            self._prev_result = result
+            log.debug("Job %d step %d successful result %s" % (self.job.id, step_index, result))
 
-            finish_step = step_index
-            step_index += 1
+            self._job_progress.step_success(self.job.id, result)
+        except AgentException as e:
+            log.error("Job %d step %d encountered an agent error: %s" % (self.job.id, step_index, e.backtrace))
 
-        if self._cancel.is_set():
-            return
+            # Don't bother storing the backtrace to invoke_agent, the interesting part
+            # is the backtrace inside the AgentException
+            self._job_progress.step_failure(self.job.id, e.backtrace)
+            self._job_progress.complete_job(self.job.id, errored=True)
+            return False
+        except Exception as e:
+            backtrace = traceback.format_exc()
+            log.error("Job %d step %d encountered an error: %s:%s" % (self.job.id, step_index, e, backtrace))
 
-        log.info("Job %d finished %d steps successfully" % (self.job.id, finish_step + 1))
+            self._job_progress.step_failure(self.job.id, backtrace)
+            self._job_progress.complete_job(self.job.id, errored=True)
+            return False
+        finally:
+            if step.database:
+                log.debug("Job %d releasing database connection" % self.job.id)
+                self._connection_quota.release(django.db.connection.connection)
 
-        self._job_progress.complete_job(self.job.id, errored=False)
+        self._step_index += 1
+        if self._step_index >= len(self.steps):
+            return self._finish()
+
+        return True
 
 
 class JobCollection(object):
+    """
+    The set of jobs known to the scheduler, indexed by state.
+
+    Readiness is tracked incrementally: each pending job carries a count of the
+    jobs in its wait_for_json that have not completed yet, and a reverse map from
+    job ID to the jobs waiting on it means that completing a job only touches its
+    own dependents, rather than re-evaluating every pending job on every pass.
+    """
+
     def __init__(self):
+        # Scheduler partitions add and complete jobs concurrently
+        self._mutex = threading.RLock()
         self.flush()
 
     def flush(self):
@@ -380,21 +590,66 @@ class JobCollection(object):
         self._command_to_jobs = defaultdict(set)
         self._job_to_commands = defaultdict(set)
 
+        # Map of job ID to the IDs of the jobs which are waiting for it
+        self._waiters = defaultdict(set)
+        # Map of job ID to the number of jobs it is still waiting for
+        self._outstanding = {}
+        # Pending jobs with nothing left to wait for
+        self._ready = {}
+
+    def _index_wait_for(self, job):
+        wait_for_ids = set(json.loads(job.wait_for_json))
+        outstanding = 0
+        for wait_for_id in wait_for_ids:
+            if wait_for_id not in self._state_jobs["complete"]:
+                self._waiters[wait_for_id].add(job.id)
+                outstanding += 1
+        self._outstanding[job.id] = outstanding
+
+    def _state_changed(self, job, initial_state):
+        """Update the readiness index after `job` has moved from `initial_state` to `job.state`"""
+        if job.state == "pending":
+            if self._outstanding.get(job.id) == 0:
+                self._ready[job.id] = job
+        else:
+            self._ready.pop(job.id, None)
+
+        if job.state == "complete" and initial_state != "complete":
+            for waiter_id in self._waiters.pop(job.id, ()):
+                self._outstanding[waiter_id] -= 1
+                if self._outstanding[waiter_id] == 0:
+                    waiter = self._jobs[waiter_id]
+                    if waiter.state == "pending":
+                        self._ready[waiter_id] = waiter
+
     def add(self, job):
-        self._jobs[job.id] = job
-        self._state_jobs[job.state][job.id] = job
+        with self._mutex:
+            try:
+                existing = self._jobs[job.id]
+            except KeyError:
+                initial_state = None
+                self._jobs[job.id] = job
+                self._index_wait_for(job)
+            else:
+                initial_state = existing.state
+                del self._state_jobs[existing.state][job.id]
+                self._jobs[job.id] = job
+
+            self._state_jobs[job.state][job.id] = job
+            self._state_changed(job, initial_state)
 
     def add_command(self, command, jobs):
         """Add command if it doesn't already exist, and ensure that all
         of `jobs` are associated with it
 
         """
-        for job in jobs:
-            self.add(job)
-        self._commands[command.id] = command
-        self._command_to_jobs[command.id] |= set([j.id for j in jobs])
-        for job in jobs:
-            self._job_to_commands[job.id].add(command.id)
+        with self._mutex:
+            for job in jobs:
+                self.add(job)
+            self._commands[command.id] = command
+            self._command_to_jobs[command.id] |= set([j.id for j in jobs])
+            for job in jobs:
+                self._job_to_commands[job.id].add(command.id)
 
     def get(self, job_id):
         return self._jobs[job_id]
@@ -407,12 +662,14 @@ class JobCollection(object):
         for attr, val in kwargs.items():
             setattr(job, attr, val)
 
-        try:
-            del self._state_jobs[initial_state][job.id]
-        except KeyError:
-            log.warning("Cancelling uncached Job %s" % job.id)
-        else:
-            self._state_jobs[job.state][job.id] = job
+        with self._mutex:
+            try:
+                del self._state_jobs[initial_state][job.id]
+            except KeyError:
+                log.warning("Cancelling uncached Job %s" % job.id)
+            else:
+                self._state_jobs[job.state][job.id] = job
+                self._state_changed(job, initial_state)
 
     def update_commands(self, job):
         """
@@ -436,27 +693,26 @@ class JobCollection(object):
                     # Command.objects.filter(pk = command_id).update(errored = errored, cancelled = cancelled, complete = True)
 
     def update_many(self, jobs, new_state):
-        for job in jobs:
-            del self._state_jobs[job.state][job.id]
-            job.state = new_state
-            self._state_jobs[job.state][job.id] = job
+        with self._mutex:
+            for job in jobs:
+                initial_state = job.state
+                del self._state_jobs[job.state][job.id]
+                job.state = new_state
+                self._state_jobs[job.state][job.id] = job
+                self._state_changed(job, initial_state)
 
         Job.objects.filter(id__in=[j.id for j in jobs]).update(state=new_state)
 
     @property
     def ready_jobs(self):
-        result = []
-        for job in self._state_jobs["pending"].values():
-            wait_for_ids = json.loads(job.wait_for_json)
-            complete_job_ids = [j.id for j in self._state_jobs["complete"].values()]
-            if not set(wait_for_ids) - set(complete_job_ids):
-                result.append(job)
-
-        if len(result) == 0 and len(self.pending_jobs) == 0 and len(self.tasked_jobs) == 0:
-            # A quiescent state, flush the collection (avoid building up an indefinitely
-            # large collection of complete jobs)
-            log.debug("%s.flush" % (self.__class__.__name__))
-            self.flush()
+        with self._mutex:
+            result = self._ready.values()
+
+            if len(result) == 0 and len(self.pending_jobs) == 0 and len(self.tasked_jobs) == 0:
+                # A quiescent state, flush the collection (avoid building up an indefinitely
+                # large collection of complete jobs)
+                log.debug("%s.flush" % (self.__class__.__name__))
+                self.flush()
 
         return result
 
@@ -480,13 +736,23 @@ class JobScheduler(object):
 
     MAX_STEP_DB_CONNECTIONS = 10
 
+    # Bounds on the steps run concurrently: in total, against any one host, and of any one Step
+    # class (overridden per class name in STEP_ACTION_LIMITS)
+    STEP_POOL_SIZE = 64
+    STEP_HOST_LIMIT = 4
+    STEP_ACTION_LIMIT = 32
+    STEP_ACTION_LIMITS = {}
+
     def __init__(self):
-        self._lock = threading.RLock()
-        """Globally serialize all scheduling operations: within a given cluster, they all potentially
-        interfere with one another.  In the future, if this class were handling multiple isolated
-        clusters then they could take a lock each and run in parallel
+        self._lock = PartitionLock()
+        """Serialize scheduling operations.  Within a given cluster they all potentially interfere
+        with one another, so by default (`with self._lock`) they are serialized globally.  Operations
+        whose objects all fall within one isolated partition of the system (see PartitionMap) -- state
+        changes, notifications and job completion -- instead take that partition's lock and run in
+        parallel with operations on other partitions.
 
         """
+        self._partitions = PartitionMap()
 
         self._lock_cache = LockCache()
         self._job_collection = JobCollection()
@@ -494,6 +760,9 @@ class JobScheduler(object):
 
         self._db_quota = SimpleConnectionQuota(self.MAX_STEP_DB_CONNECTIONS)
         self._run_threads = {}  # Map of job ID to RunJobThread
+        self._step_executor = StepExecutor(
+            self.STEP_POOL_SIZE, self.STEP_HOST_LIMIT, self.STEP_ACTION_LIMIT, self.STEP_ACTION_LIMITS
+        )
 
         self.progress = JobProgress(self)
 
@@ -502,12 +771,37 @@ class JobScheduler(object):
         self.completion_hooks = []
 
     def join_run_threads(self):
-        for job_id, thread in self._run_threads.items():
-            log.info("Joining thread for job %s" % job_id)
-            thread.join()
+        log.info("Joining step executor with %s jobs in flight" % len(self._run_threads))
+        self._step_executor.shutdown()
 
-    def _run_next(self):
-        ready_jobs = self._job_collection.ready_jobs
+    def _job_partition(self, job):
+        return self._partitions.key_for([lock.locked_item for lock in self._lock_cache.get_by_job(job)])
+
+    def _run_next(self, partition=None):
+        if partition is None:
+            # Fetching the targets is a round-trip to the API, so it is not done under the lock
+            self._partitions.refresh_targets_async()
+            if not self._partitions.valid:
+                try:
+                    self._partitions.rebuild()
+                except Exception:
+                    log.error("Failed to rebuild scheduler partitions: %s" % traceback.format_exc())
+
+            ready_jobs = self._job_collection.ready_jobs
+        else:
+            # Only run jobs within our partition: anything else that has become
+            # ready is handed to a pass for its own partition (or a global pass).
+            ready_jobs = []
+            foreign_partitions = set()
+            for job in self._job_collection.ready_jobs:
+                job_partition = self._job_partition(job)
+                if job_partition == partition:
+                    ready_jobs.append(job)
+                else:
+                    foreign_partitions.add(job_partition)
+
+            for foreign_partition in foreign_partitions:
+                self.progress.advance(foreign_partition)
 
         log.info(
             "run_next: %d runnable jobs of (%d pending, %d tasked)"
@@ -526,7 +820,7 @@ class JobScheduler(object):
 
         if cancel_jobs:
             # Cancellations may have made some jobs ready, run me again
-            self._run_next()
+            self._run_next(partition)
 
     def _check_jobs(self, jobs, dep_cache):
         """Return the list of jobs which pass their checks"""
@@ -570,8 +864,10 @@ class JobScheduler(object):
             assert job.id not in self._run_threads
             self._run_threads[job.id] = thread
 
-            thread.start()
-            log.debug("_spawn_job: %s threads in flight" % len(self._run_threads))
+            # Steps are queued fairly between the commands which jobs belong to
+            command_id = Command.objects.filter(jobs=job, complete=False).values_list("id", flat=True).first()
+            self._step_executor.submit(thread, command_id)
+            log.debug("_spawn_job: %s jobs in flight" % len(self._run_threads))
         else:
             log.debug("_spawn_job: No steps for %s, completing" % job.pk)
             # No steps: skip straight to completion
@@ -583,7 +879,7 @@ class JobScheduler(object):
         except KeyError:
             pass
 
-        log.debug("_complete_job: %s threads in flight" % len(self._run_threads))
+        log.debug("_complete_job: %s jobs in flight" % len(self._run_threads))
 
         log.info("Job %s completing (errored=%s, cancelled=%s)" % (job.id, errored, cancelled))
 
@@ -693,7 +989,7 @@ class JobScheduler(object):
                     command = Command.objects.create(message="Configuring fencing agent on %s" % changed_item)
                 self.CommandPlan.add_jobs([job], command, {})
 
-    def _drain_notification_buffer(self):
+    def _drain_notification_buffer(self, partition=None):
         # Give any buffered notifications a chance to drain out
         for buffer_key in self._notification_buffer.notification_keys:
             content_type, object_id = buffer_key
@@ -708,6 +1004,10 @@ class JobScheduler(object):
                 self._notification_buffer.clear_notifications_for_key(buffer_key)
                 continue
 
+            # Leave notifications for other partitions to be drained by those partitions
+            if partition is not None and self._partitions.key_for([instance]) != partition:
+                continue
+
             # Try again later if the instance is still locked
             if self._lock_cache.get_by_locked_item(instance):
                 continue
@@ -723,43 +1023,58 @@ class JobScheduler(object):
                 self._notify(*notification)
 
     def set_state(self, object_ids, message, run):
-        with self._lock:
+        # Load the objects up front to choose a partition: command_set_state loads them again
+        # inside the lock
+        objects = [
+            ContentType.objects.get_by_natural_key(*ct_nk).model_class().objects.get(pk=o_pk)
+            for ct_nk, o_pk, state in object_ids
+        ]
+
+        with self._lock.partition(lambda: self._partitions.key_for(objects)) as partition:
             with transaction.atomic():
                 command = self.CommandPlan.command_set_state(object_ids, message)
             if run:
-                self.progress.advance()
+                self.progress.advance(partition)
         return command.id
 
-    def advance(self):
-        with self._lock:
-            self._run_next()
+    def advance(self, partition=None):
+        """
+        :param partition: Only run jobs in this partition, if it is still current, else run everything
+        """
+        with self._lock.partition(lambda: partition if self._partitions.is_current(partition) else None) as held:
+            self._run_next(held)
 
-    def _notify(self, content_type, object_id, notification_time, update_attrs, from_states):
+    def _notify(self, content_type, object_id, notification_time, update_attrs, from_states, refresh=True):
+        """
+        :param refresh: If False, leave refreshing the instance in ObjectCache and running completion
+                        hooks to the caller (see notify_many)
+        :return: The updated instance, or None if the notification was dropped or buffered
+        """
         # Get the StatefulObject
         model_klass = ContentType.objects.get_by_natural_key(*content_type).model_class()
         try:
             instance = ObjectCache.get_by_id(model_klass, object_id)
         except model_klass.DoesNotExist:
             log.warning("_notify: Dropping update for not-found object %s/%s" % (content_type, object_id))
-            return
+            return None
 
         # Drop if it's not in an allowed state
         if from_states and instance.state not in from_states:
             log.info("_notify: Dropping update to %s because %s is not in %s" % (instance, instance.state, from_states))
-            return
+            return None
 
         # Drop state-modifying updates if outdated
         modified_at = instance.state_modified_at
         if "state" in update_attrs and notification_time <= modified_at:
             log.info("notify: Dropping update of %s (%s) because it has been updated since" % (instance.id, instance))
-            return
+            return None
 
         # Buffer updates on locked instances, except for state changes. By the
         # time a buffered state change notification would be replayed, the
         # state change would probably not make any sense.
         if self._lock_cache.get_by_locked_item(instance):
             if "state" in update_attrs:
-                return
+                return None
 
             log.info("_notify: Buffering update to %s because of locks" % instance)
             for lock in self._lock_cache.get_by_locked_item(instance):
@@ -769,7 +1084,7 @@ class JobScheduler(object):
             notification = (content_type, object_id, notification_time, update_attrs, from_states)
             self._notification_buffer.add_notification_for_key(buffer_key, notification)
 
-            return
+            return None
 
         def is_real_model_field(inst, name):
             try:
@@ -813,18 +1128,95 @@ class JobScheduler(object):
             # the '7' instance, even after a save().  To be safe against any such strangeness, pull a
             # fresh instance of everything we update (this is safe because earlier we checked that nothing is
             # locking this object.
-            instance = ObjectCache.update(instance)
+            if refresh:
+                instance = ObjectCache.update(instance)
+
+        if "ha_cluster_peers" in update_attrs:
+            # HA peers join hosts into the same partition
+            self._partitions.invalidate()
+
+        if refresh:
+            # FIXME: should check the new state against reverse dependencies
+            # and apply any fix_states
+            self._completion_hooks(instance, updated_attrs=update_attrs.keys())
 
-        # FIXME: should check the new state against reverse dependencies
-        # and apply any fix_states
-        self._completion_hooks(instance, updated_attrs=update_attrs.keys())
+        return instance
 
     def notify(self, content_type, object_id, time_serialized, update_attrs, from_states):
-        with self._lock:
+        model_klass = ContentType.objects.get_by_natural_key(*content_type).model_class()
+        try:
+            objects = [ObjectCache.get_by_id(model_klass, object_id)]
+        except model_klass.DoesNotExist:
+            objects = []
+
+        with self._lock.partition(lambda: self._partitions.key_for(objects)) as partition:
             notification_time = IMLDateTime.parse(time_serialized)
             self._notify(content_type, object_id, notification_time, update_attrs, from_states)
 
-            self._run_next()
+            self._run_next(partition)
+
+    def notify_many(self, notifications):
+        """
+        Apply a batch of notifications, as drained from a NotificationBatch.  Updated instances
+        are refreshed in ObjectCache with one query per model class, and jobs are scheduled once
+        per partition rather than once per notification.
+
+        :param notifications: List of (content_type, object_id, notification_time, update_attrs, from_states)
+        :return: The number of notifications applied
+        """
+        # Group by partition so that each group can be applied under a single lock
+        by_partition = defaultdict(list)
+        for notification in notifications:
+            content_type, object_id = notification[0], notification[1]
+            try:
+                model_klass = ContentType.objects.get_by_natural_key(*content_type).model_class()
+                instance = ObjectCache.get_by_id(model_klass, object_id)
+            except ObjectDoesNotExist:
+                by_partition[None].append((notification, None))
+            except Exception:
+                log.error("notify_many: error looking up %s/%s: %s" % (content_type, object_id, traceback.format_exc()))
+            else:
+                by_partition[self._partitions.key_for([instance])].append((notification, instance))
+
+        # An error in one notification, or in one partition, must not lose the rest of the batch
+        applied = 0
+        for group in by_partition.values():
+            objects = [instance for notification, instance in group if instance is not None]
+            try:
+                with self._lock.partition(
+                    lambda: self._partitions.key_for(objects) if len(objects) == len(group) else None
+                ) as partition:
+                    updated = defaultdict(list)
+                    for notification, _ in group:
+                        try:
+                            instance = self._notify(*notification, refresh=False)
+                        except Exception:
+                            log.error(
+                                "notify_many: error applying notification %s/%s: %s"
+                                % (notification[0], notification[1], traceback.format_exc())
+                            )
+                            continue
+
+                        if instance is not None:
+                            updated[instance.__class__].append((instance, notification[3]))
+
+                    for model_klass, instances in updated.items():
+                        fresh_instances = ObjectCache.update_many(
+                            model_klass, [instance.pk for instance, _ in instances]
+                        )
+                        for instance, update_attrs in instances:
+                            # FIXME: should check the new state against reverse dependencies
+                            # and apply any fix_states
+                            self._completion_hooks(
+                                fresh_instances.get(instance.pk, instance), updated_attrs=update_attrs.keys()
+                            )
+                        applied += len(instances)
+
+                    self._run_next(partition)
+            except Exception:
+                log.error("notify_many: error applying %s notifications: %s" % (len(group), traceback.format_exc()))
+
+        return applied
 
     def run_jobs(self, job_dicts, message):
         with self._lock:
@@ -888,6 +1280,8 @@ class JobScheduler(object):
                 try:
                     cancelled_thread = self._run_threads[job_id]
                     cancelled_thread.cancel()
+                    # If it is still waiting for a step executor worker then it is complete already
+                    self._step_executor.discard(cancelled_thread)
                 except KeyError:
                     pass
                 with transaction.atomic():
@@ -917,7 +1311,7 @@ class JobScheduler(object):
         # held a writelock on them)
 
         job = self._job_collection.get(job_id)
-        with self._lock:
+        with self._lock.partition(lambda: self._job_partition(job)) as partition:
             with transaction.atomic():
                 if not errored and not cancelled:
                     try:
@@ -968,8 +1362,8 @@ class JobScheduler(object):
 
                 self._complete_job(job, errored, cancelled)
 
-            self._drain_notification_buffer()
-            self._run_next()
+            self._drain_notification_buffer(partition)
+            self._run_next(partition)
 
     def test_host_contact(self, address, root_pw=None, pkey=None, pkey_pw=None):
         with self._lock:
@@ -1354,6 +1748,33 @@ class JobScheduler(object):
 
         return stateful_object.downcast()
 
+    @staticmethod
+    def _load_stateful_objects(object_list):
+        """Load the objects of `object_list` with one query per content type, bypassing ObjectCache.
+
+        :param object_list: list of serialized tuples: [(obj_key, obj_id), ...]
+        :return: dict of (obj_key, obj_id) to stateful object, omitting those which don't exist
+        """
+        ids_by_key = defaultdict(set)
+        for obj_key, obj_id in object_list:
+            ids_by_key[obj_key].add(obj_id)
+
+        stateful_objects = {}
+        for obj_key, obj_ids in ids_by_key.items():
+            try:
+                model_klass = ContentType.objects.get_for_id(obj_key).model_class()
+            except ObjectDoesNotExist:
+                continue
+
+            by_pk = dict((o.pk, o) for o in model_klass.objects.filter(pk__in=obj_ids))
+            for obj_id in obj_ids:
+                try:
+                    stateful_objects[(obj_key, obj_id)] = by_pk[int(obj_id)]
+                except KeyError:
+                    pass
+
+        return stateful_objects
+
     def available_transitions(self, object_list):
         """Compute the available transitional states for each stateful object
 
@@ -1365,55 +1786,53 @@ class JobScheduler(object):
         If an object in the list is locked, it will be included in the return
         dict, but it's transitions will be an empty list.
 
+        This only reads the scheduler's state, so runs without self._lock against
+        a snapshot of which objects are locked.
+
         :param object_list: list of serialized tuples: [(obj_key, obj_id), ...]
         :return: dict of list of states {obj_id: ['<state1>','<state2',etc], }
         """
 
-        with self._lock:
-            transitions = defaultdict(list)
-            for obj_key, obj_id in object_list:
-                composite_id = "{}:{}".format(obj_key, obj_id)
+        # Hit the DB for the statefulobjects (ManagedMgs, ManagedMdt, etc., avoiding all caches
+        # Localize fixed for HYD-2714.  May chance again as HYD-3155 is resolved.
+        stateful_objects = self._load_stateful_objects(object_list)
+        locked = self._lock_cache.get_write_locked(stateful_objects.values())
 
-                try:
-                    # Hit the DB for the statefulobject (ManagedMgs, ManagedMdt, etc., avoiding all caches
-                    # Localize fixed for HYD-2714.  May chance again as HYD-3155 is resolved.
-                    model_klass = ContentType.objects.get_for_id(obj_key).model_class()
-                    stateful_object = model_klass.objects.get(pk=obj_id)
-
-                    # Used to leverage the ObjectCache, but this suspect now:  HYD-3155
-                    # stateful_object = JobScheduler._retrieve_stateful_object(obj_key, obj_id)
-
-                    log.debug("available_transitions object: %s, state: %s" % (stateful_object, stateful_object.state))
-                except ObjectDoesNotExist:
-                    # Do not advertise transitions for an object that does not exist
-                    # as can happen if a parallel operation deletes this object
+        transitions = defaultdict(list)
+        for obj_key, obj_id in object_list:
+            composite_id = "{}:{}".format(obj_key, obj_id)
+
+            try:
+                stateful_object = stateful_objects[(obj_key, obj_id)]
+                log.debug("available_transitions object: %s, state: %s" % (stateful_object, stateful_object.state))
+            except KeyError:
+                # Do not advertise transitions for an object that does not exist
+                # as can happen if a parallel operation deletes this object
+                transitions[composite_id] = []
+                log.debug("available_transitions object: {}".format(composite_id))
+            else:
+                # We don't advertise transitions for anything which is currently
+                # locked by an incomplete job.  We could alternatively advertise
+                # which jobs would actually be legal to add by skipping this
+                # check and using get_expected_state in place of .state below.
+                if stateful_object in locked:
                     transitions[composite_id] = []
-                    log.debug("available_transitions object: {}".format(composite_id))
+                    log.debug("available_transitions object is LOCKED: {}".format(composite_id))
                 else:
-                    # We don't advertise transitions for anything which is currently
-                    # locked by an incomplete job.  We could alternatively advertise
-                    # which jobs would actually be legal to add by skipping this
-                    # check and using get_expected_state in place of .state below.
-                    if self._lock_cache.get_latest_write(stateful_object):
-                        transitions[composite_id] = []
-                        log.debug("available_transitions object is LOCKED: {}".format(composite_id))
-                    else:
-                        # XXX: could alternatively use expected_state here if you
-                        # want to advertise
-                        # what jobs can really be added (i.e. advertise transitions
-                        # which will
-                        # be available when current jobs are complete)
-                        #  See method self.get_expected_state(stateful_object)
-                        from_state = stateful_object.state
-                        available_states = stateful_object.get_available_states(from_state)
-                        log.debug(
-                            "available_transitions from_state: {}, states: {}".format(from_state, available_states)
-                        )
-
-                        # Add the job verbs to the possible state transitions for displaying as a choice.
-                        transitions[composite_id] = self._add_verbs(stateful_object, available_states)
+                    # XXX: could alternatively use expected_state here if you
+                    # want to advertise
+                    # what jobs can really be added (i.e. advertise transitions
+                    # which will
+                    # be available when current jobs are complete)
+                    #  See method self.get_expected_state(stateful_object)
+                    from_state = stateful_object.state
+                    available_states = stateful_object.get_available_states(from_state)
+                    log.debug("available_transitions from_state: {}, states: {}".format(from_state, available_states))
+
+                    # Add the job verbs to the possible state transitions for displaying as a choice.
+                    transitions[composite_id] = self._add_verbs(stateful_object, available_states)
 
-            return transitions
+        return transitions
 
     def _add_verbs(self, stateful_object, raw_transitions):
         """Lookup the verb for each available state
@@ -1450,28 +1869,51 @@ class JobScheduler(object):
 
         return transitions
 
-    def _fetch_jobs(self, stateful_object):
+    # List of (model class, AdvertisedJob class) for each of the AdvertisedJob.classes of each non-plural
+    # AdvertisedJob, and a map of model class to the AdvertisedJob classes which apply to it.  Both only
+    # depend on the code, so are built once per process.
+    _advertised_job_classes = None
+    _advertised_jobs = {}
+
+    @classmethod
+    def _advertised_jobs_for(cls, klass):
+        """The AdvertisedJob classes which may apply to instances of `klass`, in the order
+        that they are offered (once for each of their AdvertisedJob.classes that matches)"""
+        try:
+            return cls._advertised_jobs[klass]
+        except KeyError:
+            pass
+
         from chroma_core.models import AdvertisedJob
 
+        if cls._advertised_job_classes is None:
+            cls._advertised_job_classes = [
+                (ContentType.objects.get_by_natural_key("chroma_core", class_name.lower()).model_class(), job_class)
+                for job_class in all_subclasses(AdvertisedJob)
+                if not job_class.plural
+                for class_name in job_class.classes
+            ]
+
+        cls._advertised_jobs[klass] = [
+            job_class for job_klass, job_class in cls._advertised_job_classes if issubclass(klass, job_klass)
+        ]
+        return cls._advertised_jobs[klass]
+
+    def _fetch_jobs(self, stateful_object):
         available_jobs = []
-        for job_class in all_subclasses(AdvertisedJob):
-            if not job_class.plural:
-                for class_name in job_class.classes:
-                    ct = ContentType.objects.get_by_natural_key("chroma_core", class_name.lower())
-                    klass = ct.model_class()
-                    if isinstance(stateful_object, klass):
-                        if job_class.can_run(stateful_object):
-                            available_jobs.append(
-                                {
-                                    "verb": job_class.verb,
-                                    "long_description": job_class.long_description(stateful_object),
-                                    "display_group": job_class.display_group,
-                                    "display_order": job_class.display_order,
-                                    "confirmation": job_class.get_confirmation(stateful_object),
-                                    "class_name": job_class.__name__,
-                                    "args": job_class.get_args(stateful_object),
-                                }
-                            )
+        for job_class in self._advertised_jobs_for(stateful_object.__class__):
+            if job_class.can_run(stateful_object):
+                available_jobs.append(
+                    {
+                        "verb": job_class.verb,
+                        "long_description": job_class.long_description(stateful_object),
+                        "display_group": job_class.display_group,
+                        "display_order": job_class.display_order,
+                        "confirmation": job_class.get_confirmation(stateful_object),
+                        "class_name": job_class.__name__,
+                        "args": job_class.get_args(stateful_object),
+                    }
+                )
         return available_jobs
 
     def available_jobs(self, object_list):
@@ -1484,32 +1926,40 @@ class JobScheduler(object):
         If an object in the list is locked, it will be included in the return
         dict, but it's jobs will be an empty list.
 
+        Like available_transitions, this runs without self._lock.
+
         :param object_list: list of serialized tuples: [(obj_key, obj_id), ...]
         :return: A dict of lists of jobs like {obj1_id: [{'verb': ...,
                         'confirmation': ..., 'class_name': ..., 'args: ...}], ...}
         """
 
-        with self._lock:
+        stateful_objects = {}
+        for obj_key, obj_id in object_list:
+            try:
+                stateful_objects[(obj_key, obj_id)] = JobScheduler._retrieve_stateful_object(obj_key, obj_id)
+            except ObjectDoesNotExist:
+                pass
+        locked = self._lock_cache.get_write_locked(stateful_objects.values())
 
-            jobs = defaultdict(list)
-            for obj_key, obj_id in object_list:
-                composite_id = "{}:{}".format(obj_key, obj_id)
+        jobs = defaultdict(list)
+        for obj_key, obj_id in object_list:
+            composite_id = "{}:{}".format(obj_key, obj_id)
 
-                try:
-                    stateful_object = JobScheduler._retrieve_stateful_object(obj_key, obj_id)
-                except ObjectDoesNotExist:
-                    # Do not advertise jobs for an object that does not exist
-                    # as can happen if a parallel operation deletes this object
+            try:
+                stateful_object = stateful_objects[(obj_key, obj_id)]
+            except KeyError:
+                # Do not advertise jobs for an object that does not exist
+                # as can happen if a parallel operation deletes this object
+                jobs[composite_id] = []
+            else:
+                # If the object is subject to an incomplete Job
+                # then don't offer any actions
+                if stateful_object in locked:
                     jobs[composite_id] = []
                 else:
-                    # If the object is subject to an incomplete Job
-                    # then don't offer any actions
-                    if self._lock_cache.get_latest_write(stateful_object) > 0:
-                        jobs[composite_id] = []
-                    else:
-                        jobs[composite_id] = self._fetch_jobs(stateful_object)
+                    jobs[composite_id] = self._fetch_jobs(stateful_object)
 
-            return jobs
+        return jobs
 
     def get_locks(self):
         all_locks = [to_lock_json(x) for x in self._lock_cache.read_locks + self._lock_cache.write_locks]
@@ -1527,6 +1977,15 @@ class JobScheduler(object):
 
         return reduce(update_locks, all_locks, {})
 
+    def get_cache_stats(self):
+        return ObjectCache.stats()
+
+    def get_step_stats(self):
+        return self._step_executor.stats()
+
+    def get_action_latency_stats(self):
+        return {"agent": AgentRpc.latency_stats(), "action_runner": action_latency_stats()}
+
     def update_nids(self, nid_list):
         # Although this is creating/deleting a NID it actually rewrites the whole NID configuration for the node
         # this is all in here for now, but as we move to dynamic lnet it will probably get it's own file.
@@ -41,12 +41,18 @@ class JobSchedulerRpc(ServiceRpcInterface):
         "available_transitions",
         "available_jobs",
         "get_locks",
+        "get_cache_stats",
+        "get_step_stats",
+        "get_action_latency_stats",
         "update_corosync_configuration",
         "get_transition_consequences",
         "configure_stratagem",
         "update_stratagem",
     ]
 
+    # The GUI polls these for every object it displays, so don't let them occupy every RPC worker
+    method_limits = {"available_transitions": 4, "available_jobs": 4, "get_transition_consequences": 4}
+
 
 class JobSchedulerClient(object):
     """Because there are some tasks which are the domain of the job scheduler but do not need to
@@ -235,6 +241,26 @@ class JobSchedulerClient(object):
     def get_locks(cls):
         return JobSchedulerRpc().get_locks()
 
+    @classmethod
+    def get_cache_stats(cls):
+        """Get the job scheduler's ObjectCache hit/miss/refresh counters, see ObjectCache.stats"""
+        return JobSchedulerRpc().get_cache_stats()
+
+    @classmethod
+    def get_step_stats(cls):
+        """Get the job scheduler's queued and running steps, and step run times, per host, see StepExecutor.stats"""
+        return JobSchedulerRpc().get_step_stats()
+
+    @classmethod
+    def get_action_latency_stats(cls):
+        """Get latency histograms of the actions run by the job scheduler, per action, see LatencyHistogram"""
+        return JobSchedulerRpc().get_action_latency_stats()
+
+    @classmethod
+    def get_rpc_stats(cls):
+        """Get the queue wait and execution times of the RPCs served by the job scheduler, see RpcWorkerPool.stats"""
+        return JobSchedulerRpc().get_rpc_stats()
+
     @classmethod
     def configure_stratagem(cls, stratagem_data):
         return JobSchedulerRpc().configure_stratagem(stratagem_data)
@@ -3,12 +3,60 @@
 # license that can be found in the LICENSE file.
 
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import bisect
 import json
+import threading
 from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 
 
+class JobOrderedLocks(object):
+    """
+    The locks held on one item, kept in order of job ID (and in order of
+    addition for the same job) so that the latest lock and the locks after
+    a given job can be found without sorting.
+    """
+
+    __slots__ = ("_job_ids", "_locks")
+
+    def __init__(self):
+        self._job_ids = []
+        self._locks = []
+
+    def __iter__(self):
+        return iter(self._locks)
+
+    def __len__(self):
+        return len(self._locks)
+
+    def __repr__(self):
+        return repr(self._locks)
+
+    def add(self, lock):
+        i = bisect.bisect_right(self._job_ids, lock.job.id)
+        self._job_ids.insert(i, lock.job.id)
+        self._locks.insert(i, lock)
+
+    def remove(self, lock):
+        i = bisect.bisect_left(self._job_ids, lock.job.id)
+        while self._locks[i] is not lock:
+            i += 1
+        del self._job_ids[i]
+        del self._locks[i]
+
+    def latest(self, not_job=None):
+        for lock in reversed(self._locks):
+            if lock.job != not_job:
+                return lock
+        return None
+
+    def after(self, job_id, not_job=None):
+        """:return: The locks of jobs with IDs of at least job_id"""
+        i = bisect.bisect_left(self._job_ids, job_id)
+        return [lock for lock in self._locks[i:] if lock.job != not_job]
+
+
 class LockCache(object):
 
     # Lock change receivers are called whenever a change occurs to the locks. It allows something to
@@ -21,12 +69,15 @@ class LockCache(object):
     def __init__(self):
         from chroma_core.models import Job, StateLock
 
-        self.write_locks = []
-        self.write_by_item = defaultdict(list)
-        self.read_locks = []
-        self.read_by_item = defaultdict(list)
+        # Ordered for get_locks, keyed by lock for removal
+        self._write_locks = OrderedDict()
+        self._read_locks = OrderedDict()
+        self.write_by_item = defaultdict(JobOrderedLocks)
+        self.read_by_item = defaultdict(JobOrderedLocks)
         self.all_by_job = defaultdict(list)
-        self.all_by_item = defaultdict(list)
+        self.all_by_item = defaultdict(JobOrderedLocks)
+        # Scheduler partitions add and remove locks concurrently
+        self._mutex = threading.RLock()
 
         for job in Job.objects.filter(~Q(state="complete")):
             if job.locks_json:
@@ -38,20 +89,34 @@ class LockCache(object):
         for lock_change_receiver in self.lock_change_receivers:
             lock_change_receiver(lock, add_remove)
 
+    @property
+    def write_locks(self):
+        return self._write_locks.keys()
+
+    @property
+    def read_locks(self):
+        return self._read_locks.keys()
+
+    @staticmethod
+    def _remove_by_item(by_item, lock):
+        locks = by_item[lock.locked_item]
+        locks.remove(lock)
+        if not locks:
+            del by_item[lock.locked_item]
+
     def remove_job(self, job):
-        locks = list(self.all_by_job[job.id])
-        n = len(locks)
-        for lock in locks:
-            if lock.write:
-                self.write_locks.remove(lock)
-                self.write_by_item[lock.locked_item].remove(lock)
-            else:
-                self.read_locks.remove(lock)
-                self.read_by_item[lock.locked_item].remove(lock)
-            self.all_by_job[job.id].remove(lock)
-            self.all_by_item[lock.locked_item].remove(lock)
-            self.call_receivers(lock, self.LOCK_REMOVE)
-        return n
+        with self._mutex:
+            locks = self.all_by_job.pop(job.id, [])
+            for lock in locks:
+                if lock.write:
+                    del self._write_locks[lock]
+                    self._remove_by_item(self.write_by_item, lock)
+                else:
+                    del self._read_locks[lock]
+                    self._remove_by_item(self.read_by_item, lock)
+                self._remove_by_item(self.all_by_item, lock)
+                self.call_receivers(lock, self.LOCK_REMOVE)
+        return len(locks)
 
     def add(self, lock):
         self._add(lock)
@@ -59,50 +124,48 @@ class LockCache(object):
     def _add(self, lock):
         assert lock.job.id is not None
 
-        if lock.write:
-            self.write_locks.append(lock)
-            self.write_by_item[lock.locked_item].append(lock)
-        else:
-            self.read_locks.append(lock)
-            self.read_by_item[lock.locked_item].append(lock)
+        with self._mutex:
+            if lock.write:
+                self._write_locks[lock] = None
+                self.write_by_item[lock.locked_item].add(lock)
+            else:
+                self._read_locks[lock] = None
+                self.read_by_item[lock.locked_item].add(lock)
+
+            self.all_by_job[lock.job.id].append(lock)
+            self.all_by_item[lock.locked_item].add(lock)
+            self.call_receivers(lock, self.LOCK_ADD)
 
-        self.all_by_job[lock.job.id].append(lock)
-        self.all_by_item[lock.locked_item].append(lock)
-        self.call_receivers(lock, self.LOCK_ADD)
+    # The getters below don't index the defaultdicts, so that looking up unlocked items doesn't
+    # leave empty entries behind.
 
     def get_by_job(self, job):
-        return self.all_by_job[job.id]
+        return self.all_by_job.get(job.id, [])
 
     def get_all(self, locked_item):
-        return self.all_by_item[locked_item]
+        return self.all_by_item.get(locked_item, [])
 
     def get_latest_write(self, locked_item, not_job=None):
-        try:
-            if not_job is not None:
-                return sorted(
-                    [l for l in self.write_by_item[locked_item] if l.job != not_job],
-                    lambda a, b: cmp(a.job.id, b.job.id),
-                )[-1]
-
-            return sorted(self.write_by_item[locked_item], lambda a, b: cmp(a.job.id, b.job.id))[-1]
-        except IndexError:
-            return None
+        locks = self.write_by_item.get(locked_item)
+        return locks.latest(not_job) if locks else None
 
     def get_read_locks(self, locked_item, after, not_job):
-        return [x for x in self.read_by_item[locked_item] if after <= x.job.id and x.job != not_job]
+        locks = self.read_by_item.get(locked_item)
+        return locks.after(after, not_job) if locks else []
+
+    def get_write_locked(self, items):
+        """:return: The subset of `items` with a pending write lock, as of one point in time"""
+        with self._mutex:
+            return set(item for item in items if self.write_by_item.get(item))
 
     def get_write(self, locked_item):
-        return self.write_by_item[locked_item]
+        return self.write_by_item.get(locked_item, [])
 
     def get_by_locked_item(self, item):
-        return self.all_by_item[item]
+        return self.all_by_item.get(item, [])
 
     def get_write_by_locked_item(self):
-        result = {}
-        for locked_item, locks in self.write_by_item.items():
-            if locks:
-                result[locked_item] = sorted(locks, lambda a, b: cmp(a.job.id, b.job.id))[-1]
-        return result
+        return dict((locked_item, locks.latest()) for locked_item, locks in self.write_by_item.items() if locks)
 
 
 def lock_change_receiver():
@@ -0,0 +1,208 @@
+# Copyright (c) 2020 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import threading
+import time
+
+import django.db
+
+from chroma_core.lib.cache import ObjectCache
+from chroma_core.services.log import log_register
+
+log = log_register(__name__.split(".")[-1])
+
+
+class PartitionMap(object):
+    """
+    Groups the objects the scheduler locks into independent partitions: the connected
+    components formed by filesystems, the targets in them, the hosts serving those targets
+    (and their HA peers), and the client mounts and copytools attached to hosts.
+
+    Jobs planned for objects within one component can only take locks within that
+    component, so operations on different components may run concurrently.
+
+    The map is rebuilt only while the global scheduler lock is held: invalidating it
+    makes key_for return None (i.e. fall back to the global lock) until the next rebuild,
+    so keys handed out concurrently always come from the same generation.
+
+    Objects created outside the scheduler, or whose host membership changes, are picked
+    up at the latest MAX_AGE seconds later; until then unknown objects use the global lock.
+
+    The targets' hosts are only known to the API, so they are fetched by refresh_targets
+    on a thread of their own rather than while the global lock is held, and rebuild uses
+    the last targets fetched.  Until the targets are first fetched the map is not built.
+    """
+
+    MAX_AGE = 60
+
+    def __init__(self):
+        self._generation = 0
+        self._component = None
+        self._fs_names = {}
+        self._built_at = 0
+
+        self._targets_lock = threading.Lock()
+        # List of (name, host_ids, filesystem names) from the API, or None until first fetched
+        self._targets = None
+        self._targets_fetched_at = 0
+        self._targets_fetching = False
+
+    def invalidate(self):
+        if self._component is not None:
+            log.debug("PartitionMap: invalidated generation %s" % self._generation)
+        self._component = None
+
+    @property
+    def valid(self):
+        return self._component is not None and time.time() - self._built_at < self.MAX_AGE
+
+    def is_current(self, key):
+        return self.valid and key is not None and key[0] == self._generation
+
+    def refresh_targets(self):
+        """
+        Fetch the targets' hosts and filesystems from the API, invalidating the map if they changed.
+
+        This is a round-trip to the API, so don't call it holding the scheduler lock.
+        """
+        from chroma_core.lib.graphql import get_targets
+
+        targets = [
+            (target["name"], target.get("host_ids") or [], target.get("filesystems") or []) for target in get_targets()
+        ]
+
+        with self._targets_lock:
+            changed = targets != self._targets
+            self._targets = targets
+            self._targets_fetched_at = time.time()
+
+        if changed:
+            self.invalidate()
+
+    def refresh_targets_async(self):
+        """
+        Run refresh_targets on a thread of its own if the targets are older than MAX_AGE,
+        unless a refresh is already running.
+        """
+        with self._targets_lock:
+            if self._targets_fetching or time.time() - self._targets_fetched_at < self.MAX_AGE:
+                return
+            self._targets_fetching = True
+
+        def refresh():
+            try:
+                self.refresh_targets()
+            except Exception as e:
+                log.error("PartitionMap: failed to fetch targets: %s" % e)
+            finally:
+                with self._targets_lock:
+                    self._targets_fetching = False
+                django.db.connection.close()
+
+        thread = threading.Thread(target=refresh, name="PartitionMap.refresh_targets")
+        thread.daemon = True
+        thread.start()
+
+    def rebuild(self):
+        from chroma_core.models import ManagedHost, ManagedFilesystem, LustreClientMount, Copytool
+
+        with self._targets_lock:
+            targets = self._targets
+
+        if targets is None:
+            log.debug("PartitionMap: targets not yet fetched, not building")
+            return
+
+        parent = {}
+
+        def find(node):
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(a, b):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+        fs_names = dict((fs.id, fs.name) for fs in ObjectCache.get(ManagedFilesystem))
+        for fs_name in fs_names.values():
+            find(("filesystem", fs_name))
+
+        for host in ObjectCache.get(ManagedHost):
+            find(("host", host.id))
+
+        for from_id, to_id in ManagedHost.ha_cluster_peers.through.objects.values_list(
+            "from_managedhost_id", "to_managedhost_id"
+        ):
+            union(("host", from_id), ("host", to_id))
+
+        # Targets are known to the rest of the system by name, see get_target_by_name
+        for name, host_ids, target_fs_names in targets:
+            node = ("target", name)
+            find(node)
+            for host_id in host_ids:
+                union(node, ("host", host_id))
+            for fs_name in target_fs_names:
+                union(node, ("filesystem", fs_name))
+
+        for client_mount in ObjectCache.get(LustreClientMount):
+            union(("host", client_mount.host_id), ("filesystem", client_mount.filesystem))
+
+        for copytool in ObjectCache.get(Copytool):
+            if copytool.filesystem_id in fs_names:
+                union(("host", copytool.host_id), ("filesystem", fs_names[copytool.filesystem_id]))
+
+        self._generation += 1
+        self._built_at = time.time()
+        self._fs_names = fs_names
+        self._component = dict((node, find(node)) for node in parent.keys())
+
+        log.info("PartitionMap: generation %s, %s partitions" % (self._generation, len(set(self._component.values()))))
+
+    def _node(self, item):
+        from chroma_core.models import ManagedHost, ManagedFilesystem, ManagedTarget, OstPool
+        from chroma_core.models import StratagemConfiguration, Copytool, LustreClientMount
+
+        if isinstance(item, ManagedHost):
+            return ("host", item.id)
+        elif isinstance(item, ManagedTarget):
+            return ("target", item.name) if item.name else None
+        elif isinstance(item, ManagedFilesystem):
+            return ("filesystem", item.name)
+        elif isinstance(item, LustreClientMount):
+            return ("filesystem", item.filesystem)
+        elif isinstance(item, (Copytool, OstPool, StratagemConfiguration)):
+            return ("filesystem", self._fs_names.get(item.filesystem_id))
+        elif getattr(item, "host_id", None) is not None:
+            # LNet, pacemaker, corosync and NTP configurations belong to their host
+            return ("host", item.host_id)
+        else:
+            return None
+
+    def key_for(self, items):
+        """
+        :return: The partition key containing all of `items`, or None if they span partitions,
+                 are not known to the map, or the map needs rebuilding.
+        """
+        component = self._component
+        if not self.valid:
+            return None
+
+        roots = set()
+        for item in items:
+            try:
+                roots.add(component[self._node(item)])
+            except KeyError:
+                return None
+            if len(roots) > 1:
+                return None
+
+        if not roots:
+            return None
+
+        return (self._generation, roots.pop())
@@ -0,0 +1,210 @@
+# Copyright (c) 2020 DDN. All rights reserved.
+# Use of this source code is governed by a MIT-style
+# license that can be found in the LICENSE file.
+
+
+import threading
+import time
+from collections import defaultdict, deque, OrderedDict
+
+
+def step_host(args):
+    """
+    :return: The FQDN of the host a step acts upon, taken from its "host" or "fqdn" argument, or None.
+    """
+    for key in ["host", "fqdn"]:
+        value = args.get(key)
+        if isinstance(value, basestring):
+            return value
+        elif value is not None:
+            fqdn = getattr(value, "fqdn", None)
+            if fqdn:
+                return fqdn
+    return None
+
+
+class HostStepStats(object):
+    __slots__ = ("running", "steps", "run_time", "max_run_time")
+
+    def __init__(self):
+        self.running = 0
+        self.steps = 0
+        self.run_time = 0.0
+        self.max_run_time = 0.0
+
+    def record(self, seconds):
+        self.steps += 1
+        self.run_time += seconds
+        self.max_run_time = max(self.max_run_time, seconds)
+
+
+class StepExecutor(object):
+    """
+    A bounded pool of worker threads running the steps of tasked jobs.
+
+    Runs (RunJobThread instances, which are not started as threads) are queued per command, and
+    workers take one step at a time from the commands in turn, so that a command with hundreds of
+    jobs does not hold up the others.  After each step the run goes to the back of its command's
+    queue until it has no more steps.
+
+    A step only starts if fewer than host_limit steps are running against its host (see step_host)
+    and fewer than the action limit are running of its class; otherwise later runs which fit are
+    started first.  Cancelled runs ignore the limits, as they run no more steps.
+    """
+
+    def __init__(self, size, host_limit, action_limit, action_limits=None):
+        self._size = size
+        self._host_limit = host_limit
+        self._action_limit = action_limit
+        self._action_limits = action_limits or {}
+
+        self._cond = threading.Condition(threading.Lock())
+        # Map of command ID to deque of runs
+        self._queued = OrderedDict()
+        self._workers = []
+        self._running_actions = defaultdict(int)
+        self._host_stats = defaultdict(HostStepStats)
+        self._stopping = False
+
+    def submit(self, run, command_id):
+        with self._cond:
+            assert not self._stopping
+            run.command_id = command_id
+            self._enqueue_locked(run)
+
+            if len(self._workers) < self._size:
+                worker = threading.Thread(target=self._work, name="StepExecutor-%s" % len(self._workers))
+                worker.daemon = True
+                self._workers.append(worker)
+                worker.start()
+
+    def discard(self, run):
+        """
+        Drop a cancelled run which is waiting for a worker, marking it complete (see
+        RunJobThread.cancel_complete) as it will not run any more steps.
+        """
+        with self._cond:
+            for command_id, runs in self._queued.items():
+                if run in runs:
+                    runs.remove(run)
+                    if not runs:
+                        del self._queued[command_id]
+                    run.discard()
+                    return
+
+    def shutdown(self):
+        """
+        Stop once every queued run has finished, and wait for the workers to exit.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+
+        for worker in workers:
+            worker.join()
+
+    def stats(self):
+        """
+        :return: {"queued": n, "running": n, "hosts": {fqdn: {...}}} where each host has the number of
+                 runs queued and steps running against it, and the count, total and maximum run time
+                 of the steps it has run.  Steps without a host are counted under None.
+        """
+        with self._cond:
+            queued = defaultdict(int)
+            for runs in self._queued.values():
+                for run in runs:
+                    queued[self._run_host(run)] += 1
+
+            hosts = {}
+            for host in set(queued) | set(self._host_stats):
+                host_stats = self._host_stats[host]
+                hosts[host] = {
+                    "queued": queued[host],
+                    "running": host_stats.running,
+                    "steps": host_stats.steps,
+                    "run_time": host_stats.run_time,
+                    "max_run_time": host_stats.max_run_time,
+                }
+
+            return {
+                "queued": sum(queued.values()),
+                "running": sum(host_stats.running for host_stats in self._host_stats.values()),
+                "hosts": hosts,
+            }
+
+    def _enqueue_locked(self, run):
+        try:
+            self._queued[run.command_id].append(run)
+        except KeyError:
+            self._queued[run.command_id] = deque([run])
+        self._cond.notify()
+
+    @staticmethod
+    def _run_host(run):
+        next_step = run.next_step
+        return step_host(next_step[1]) if next_step else None
+
+    def _admit_locked(self, run):
+        next_step = run.next_step
+        if next_step is None:
+            return True
+
+        klass = next_step[0]
+        if self._running_actions[klass.__name__] >= self._action_limits.get(klass.__name__, self._action_limit):
+            return False
+
+        host = step_host(next_step[1])
+        if host is not None and self._host_stats[host].running >= self._host_limit:
+            return False
+
+        return True
+
+    def _take_locked(self):
+        for command_id, runs in self._queued.items():
+            for run in runs:
+                if self._admit_locked(run):
+                    runs.remove(run)
+                    # Let the other commands go before this one runs another step
+                    del self._queued[command_id]
+                    if runs:
+                        self._queued[command_id] = runs
+                    return run
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                run = self._take_locked()
+                while run is None:
+                    if (
+                        self._stopping
+                        and not self._queued
+                        and not any(host_stats.running for host_stats in self._host_stats.values())
+                    ):
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait()
+                    run = self._take_locked()
+
+                next_step = run.next_step
+                action = next_step[0].__name__ if next_step else None
+                host = step_host(next_step[1]) if next_step else None
+                self._running_actions[action] += 1
+                self._host_stats[host].running += 1
+
+            started = time.time()
+            more = run.run_next_step()
+            elapsed = time.time() - started
+
+            with self._cond:
+                self._running_actions[action] -= 1
+                self._host_stats[host].running -= 1
+                if next_step:
+                    self._host_stats[host].record(elapsed)
+
+                if more:
+                    self._enqueue_locked(run)
+
+                # Capacity has been released for whichever runs were waiting on this host or action
+                self._cond.notify_all()
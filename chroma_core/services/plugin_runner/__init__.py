@@ -31,6 +31,12 @@ class AgentPluginHandlerCollection(object):
         for handler in self.handlers.values():
             handler.remove_host_resources(host_id)
 
+    def agent_update_counts(self):
+        return dict((plugin_name, handler.update_counts()) for plugin_name, handler in self.handlers.items())
+
+    def lock_wait_stats(self):
+        return self.resource_manager.lock_wait_stats()
+
     @transaction.atomic
     def rebalance_host_volumes(self, host_id):
         from chroma_core.models import Volume
@@ -91,6 +91,18 @@ class AgentPluginHandler(object):
             assert session is not None
             session.plugin.do_agent_session_continue(data)
 
+    def update_counts(self):
+        """
+        :return: The number of agent reports applied and skipped as unchanged, over the current sessions.
+        """
+        with self._processing_lock:
+            plugins = [session.plugin for session in self._sessions.values()]
+
+        return {
+            "applied": sum(plugin.agent_updates_applied for plugin in plugins),
+            "skipped": sum(plugin.agent_updates_skipped for plugin in plugins),
+        }
+
     @transaction.atomic
     def update_host_resources(self, host_id, data):
         with self._processing_lock:
@@ -7,4 +7,11 @@ from chroma_core.services.rpc import ServiceRpcInterface
 
 
 class AgentDaemonRpcInterface(ServiceRpcInterface):
-    methods = ["setup_host", "update_host_resources", "remove_host_resources", "rebalance_host_volumes"]
+    methods = [
+        "setup_host",
+        "update_host_resources",
+        "remove_host_resources",
+        "rebalance_host_volumes",
+        "lock_wait_stats",
+        "agent_update_counts",
+    ]
@@ -12,8 +12,10 @@ WARNING:
 import logging
 import json
 import threading
+import time
 
 from collections import defaultdict
+from contextlib import contextmanager
 
 from massiviu.context import DelayedContextFrom
 from django.db.models.aggregates import Count
@@ -26,6 +28,7 @@ from chroma_core.lib.storage_plugin.base_plugin import BaseStoragePlugin
 from chroma_core.lib.storage_plugin.query import ResourceQuery
 
 from chroma_core.services.job_scheduler.job_scheduler_client import JobSchedulerClient
+from chroma_core.lib.partition_lock import PartitionLock
 from chroma_core.lib.storage_plugin.api import attributes, relations
 
 from chroma_core.lib.storage_plugin.base_resource import (
@@ -37,7 +40,7 @@ from chroma_core.lib.storage_plugin.base_resource import (
 from chroma_core.lib.storage_plugin.base_resource import BaseStorageResource
 
 from chroma_core.lib.storage_plugin.log import storage_plugin_log as log
-from chroma_core.lib.util import all_subclasses
+from chroma_core.lib.util import all_subclasses, LatencyHistogram
 
 from chroma_core.models import ManagedHost, ManagedTarget
 from chroma_core.models import LNetNidsChangedAlert
@@ -66,6 +69,10 @@ class PluginSession(object):
         self.scannable_id = scannable_id
         self.update_period = update_period
 
+        # Totals for the resources this session has culled for not being reported
+        self.culled_count = 0
+        self.cull_time = 0.0
+
 
 class EdgeIndex(object):
     def __init__(self):
@@ -91,6 +98,30 @@ class EdgeIndex(object):
         self._parent_from_edge[child].remove(edge)
         self._parent_to_edge[parent].remove(edge)
 
+    def _walk(self, nodes, next_nodes, expand=None):
+        depths = {}
+        frontier = set(nodes)
+        depth = 0
+        while frontier:
+            if depth and expand:
+                frontier = set(n for n in frontier if expand(n))
+            depth += 1
+            frontier = set(n for node in frontier for n in next_nodes(node) if n not in depths)
+            for n in frontier:
+                depths[n] = depth
+        return depths
+
+    def get_ancestors(self, nodes):
+        """:return: A dict of every ancestor of `nodes` to its distance from the nearest of them"""
+        return self._walk(nodes, self.get_parents)
+
+    def get_descendents(self, nodes, expand=None):
+        """
+        :param expand: If given, the children of a descendent are only followed if expand(descendent) is True
+        :return: A dict of every descendent of `nodes` to its distance from the nearest of them
+        """
+        return self._walk(nodes, self.get_children, expand)
+
     def remove_node(self, node):
         edges = set()
         edges = edges | self._parent_from_edge[node]
@@ -138,6 +169,62 @@ class ClassIndex(object):
             self.add_record(srr["id"], storage_plugin_manager.get_resource_class_by_id(srr["resource_class_id"]))
 
 
+class ScopeIndex(object):
+    """
+    In-memory lookup of the records each scannable resource is answerable for: those
+    scoped to it (ScopedId resources) and those it is one of the reporters of (GlobalId resources).
+    """
+
+    def __init__(self):
+        self._record_id_to_scope = {}
+        self._scope_to_record_ids = defaultdict(set)
+        self._record_id_to_reporters = defaultdict(set)
+        self._reporter_to_record_ids = defaultdict(set)
+
+    def get_scoped(self, scope_id):
+        return set(self._scope_to_record_ids.get(scope_id, ()))
+
+    def get_reported(self, reporter_id):
+        return set(self._reporter_to_record_ids.get(reporter_id, ()))
+
+    def add_scoped(self, record_id, scope_id):
+        self._record_id_to_scope[record_id] = scope_id
+        self._scope_to_record_ids[scope_id].add(record_id)
+
+    def add_reporter(self, record_id, reporter_id):
+        self._record_id_to_reporters[record_id].add(reporter_id)
+        self._reporter_to_record_ids[reporter_id].add(record_id)
+
+    def remove_reporter(self, record_id, reporter_id):
+        self._record_id_to_reporters[record_id].discard(reporter_id)
+        self._reporter_to_record_ids[reporter_id].discard(record_id)
+
+    def remove_record(self, record_id):
+        scope_id = self._record_id_to_scope.pop(record_id, None)
+        if scope_id is not None:
+            self._scope_to_record_ids[scope_id].discard(record_id)
+        for reporter_id in self._record_id_to_reporters.pop(record_id, ()):
+            self._reporter_to_record_ids[reporter_id].discard(record_id)
+
+        # The record may itself be a scope or a reporter
+        for scoped_id in self._scope_to_record_ids.pop(record_id, ()):
+            self._record_id_to_scope.pop(scoped_id, None)
+        for reported_id in self._reporter_to_record_ids.pop(record_id, ()):
+            self._record_id_to_reporters[reported_id].discard(record_id)
+
+    def populate(self):
+        for record_id, scope_id in StorageResourceRecord.objects.filter(storage_id_scope__isnull=False).values_list(
+            "id", "storage_id_scope_id"
+        ):
+            self.add_scoped(record_id, scope_id)
+
+        field = StorageResourceRecord.reported_by.field
+        for record_id, reporter_id in StorageResourceRecord.reported_by.through._default_manager.values_list(
+            field.m2m_column_name(), field.m2m_reverse_name()
+        ):
+            self.add_reporter(record_id, reporter_id)
+
+
 class SubscriberIndex(object):
     def __init__(self):
         log.debug("SubscriberIndex.__init__")
@@ -211,19 +298,28 @@ class SubscriberIndex(object):
         for subscription in resource._meta.subscriptions:
             self.add_subscriber(resource_id, subscription.key, subscription.val(resource))
 
-    def remove_resource(self, resource_id, resource_class):
+    def indexes(self, resource_class):
+        """Whether resources of `resource_class` provide or subscribe to anything"""
+        return bool(resource_class._meta.subscriptions) or any(
+            issubclass(resource_class, subscription.subscribe_to) for subscription in self._all_subscriptions
+        )
+
+    def remove_resource(self, resource_id, resource_class, resource=None):
+        """
+        :param resource: The resource, if the caller already has it loaded
+        """
         log.debug("SubscriberIndex.remove_resource %s %s" % (resource_class, resource_id))
 
+        if resource is None and self.indexes(resource_class):
+            # FIXME: performance: only load the attr we need instead of whole resource
+            resource = StorageResourceRecord.objects.get(pk=resource_id).to_resource()
+
         for subscription in self._all_subscriptions:
             if issubclass(resource_class, subscription.subscribe_to):
-                # FIXME: performance: only load the attr we need instead of whole resource
-                resource = StorageResourceRecord.objects.get(pk=resource_id).to_resource()
                 log.debug("SubscriberIndex.remove provider %s" % subscription.key)
                 self.remove_provider(resource_id, subscription.key, subscription.val(resource))
         log.debug("subscriptions = %s" % resource_class._meta.subscriptions)
         for subscription in resource_class._meta.subscriptions:
-            # FIXME: performance: only load the attr we need instead of whole resource
-            resource = StorageResourceRecord.objects.get(pk=resource_id).to_resource()
             log.debug("SubscriberIndex.remove subscriber %s" % subscription.key)
             self.remove_subscriber(resource_id, subscription.key, subscription.val(resource))
 
@@ -231,18 +327,22 @@ class SubscriberIndex(object):
         from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
 
         for resource_class_id, resource_class in storage_plugin_manager.get_all_resources():
-            for subscription in self._all_subscriptions:
-                if issubclass(resource_class, subscription.subscribe_to):
-                    records = StorageResourceRecord.objects.filter(resource_class=resource_class_id)
-                    for r in records:
-                        resource = r.to_resource()
-                        self.add_provider(r.id, subscription.key, subscription.val(resource))
+            provided = [s for s in self._all_subscriptions if issubclass(resource_class, s.subscribe_to)]
+            subscribed = resource_class._meta.subscriptions
+            if not provided and not subscribed:
+                continue
 
-            for subscription in resource_class._meta.subscriptions:
-                records = StorageResourceRecord.objects.filter(resource_class=resource_class_id)
-                for r in records:
-                    resource = r.to_resource()
-                    self.add_subscriber(r.id, subscription.key, subscription.val(resource))
+            resources = StorageResourceRecord.to_resources(
+                StorageResourceRecord.objects.filter(resource_class=resource_class_id)
+            )
+
+            for subscription in provided:
+                for record_id, resource in resources.items():
+                    self.add_provider(record_id, subscription.key, subscription.val(resource))
+
+            for subscription in subscribed:
+                for record_id, resource in resources.items():
+                    self.add_subscriber(record_id, subscription.key, subscription.val(resource))
 
 
 class ResourceManager(object):
@@ -269,19 +369,29 @@ class ResourceManager(object):
 
     This code is written for multi-threaded use within a single process.
     It is not safe to have multiple processes running plugins at this stage.
-    We serialize operations from different plugins using a big lock, and
-    we use the autocommit decorator on persistence functions because
-    otherwise we would have to explicitly commit at the start of
-    each one to see changes from other threads.
+    Operations which only update a session's existing resources (attributes,
+    parents and alerts) hold the lock for that session's scannable, so that
+    sessions for different scannables proceed concurrently.  Operations which
+    create or delete resources may touch GlobalId resources and relationships
+    shared between scannables, so they hold the lock exclusively, serializing
+    them with everything else.  The in-memory indexes are guarded by a further
+    lock, held only briefly by the per-scannable operations, and alerts are
+    raised and lowered under their own lock.  How long each operation waits
+    for its lock is recorded in lock_wait_stats().
 
     """
 
     def __init__(self):
         self._sessions = {}
-        self._instance_lock = threading.Lock()
+        self._lock = PartitionLock()
+        self._index_lock = threading.Lock()
+        self._lock_waits = defaultdict(LatencyHistogram)
 
         # Map of (resource_global_id, alert_class) to AlertState pk
         self._active_alerts = {}
+        # Serializes raising and lowering alerts: a GlobalId resource may be reported by more than
+        # one scannable, so checking _active_alerts and persisting the alert must not interleave
+        self._alerts_lock = threading.Lock()
 
         # In-memory bidirectional lookup table of resource parent-child relationships
         self._edges = EdgeIndex()
@@ -290,12 +400,52 @@ class ResourceManager(object):
         self._class_index = ClassIndex()
         self._class_index.populate()
 
+        # In-memory lookup table of the resources reported by each scannable
+        self._scope_index = ScopeIndex()
+        self._scope_index.populate()
+
         # In-memory lookup table of 'provide' and 'subscribe' resource attributes
         self._subscriber_index = SubscriberIndex()
         self._subscriber_index.populate()
 
         self._label_cache = {}
 
+    @contextmanager
+    def _exclusive(self, operation):
+        started = time.time()
+        with self._lock:
+            self._lock_waits[operation].record(time.time() - started)
+            yield
+
+    @contextmanager
+    def _scope(self, operation, scannable_id):
+        started = time.time()
+        with self._lock.partition(lambda: scannable_id):
+            self._lock_waits[operation].record(time.time() - started)
+            yield
+
+    @contextmanager
+    def _indexes(self):
+        started = time.time()
+        with self._index_lock:
+            self._lock_waits["indexes"].record(time.time() - started)
+            yield
+
+    @contextmanager
+    def _alerts(self):
+        started = time.time()
+        with self._alerts_lock:
+            self._lock_waits["alerts"].record(time.time() - started)
+            yield
+
+    def lock_wait_stats(self):
+        """
+        :return: A dict of operation name to a histogram of the time spent waiting for the
+                 lock it takes, the "indexes" entry being the lock on the in-memory indexes and the
+                 "alerts" entry the lock serializing alert changes.
+        """
+        return dict((operation, histogram.to_dict()) for operation, histogram in self._lock_waits.items())
+
     def session_open(self, plugin_instance, scannable_id, initial_resources, update_period):
 
         # Assert the types, they are not optional or duckable
@@ -307,7 +457,7 @@ class ResourceManager(object):
         scannable_class = self._class_index.get(scannable_id)
         assert issubclass(scannable_class, BaseScannableResource) or issubclass(scannable_class, HostsideResource)
         log.debug(">> session_open %s (%s resources)" % (scannable_id, len(initial_resources)))
-        with self._instance_lock:
+        with self._exclusive("session_open"):
             if scannable_id in self._sessions:
                 log.warning("Clearing out old session for scannable ID %s" % scannable_id)
                 del self._sessions[scannable_id]
@@ -340,7 +490,7 @@ class ResourceManager(object):
         log.debug("<< session_open %s" % scannable_id)
 
     def session_close(self, scannable_id):
-        with self._instance_lock:
+        with self._scope("session_close", scannable_id), self._indexes():
             try:
                 del self._sessions[scannable_id]
             except KeyError:
@@ -753,7 +903,8 @@ class ResourceManager(object):
 
             for nid_resource in node_resources[LNETInterface]:
                 source_nid = nid_resource.to_resource()
-                parent = self._record_find_ancestor(nid_resource.id, SrcNetworkInterface)
+                with self._indexes():
+                    parent = self._record_find_ancestor(nid_resource.id, SrcNetworkInterface)
 
                 # This is checking if this nid is on this host.
                 if parent in nw_interfaces:
@@ -783,7 +934,7 @@ class ResourceManager(object):
         This implementation is really so sub optimal at the moment it is untrue, because it gets called
         for every field that changes for every record. I may change this comment if I can work out a solution!
         """
-        with self._instance_lock:
+        with self._scope("session_update_resource", scannable_id):
             with transaction.atomic():
                 self._resource_persist_update_attributes(scannable_id, record_id, attrs)
                 # self._persist_lun_updates(scannable_id)
@@ -792,7 +943,7 @@ class ResourceManager(object):
 
     def session_resource_add_parent(self, scannable_id, local_resource_id, local_parent_id):
 
-        with self._instance_lock:
+        with self._scope("session_resource_add_parent", scannable_id):
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[local_resource_id]
 
@@ -810,15 +961,17 @@ class ResourceManager(object):
             except KeyError:
                 return
 
-            self._edges.add_parent(record_pk, parent_pk)
+            with self._indexes():
+                self._edges.add_parent(record_pk, parent_pk)
             self._resource_modify_parent(record_pk, parent_pk, False)
 
     def session_resource_remove_parent(self, scannable_id, local_resource_id, local_parent_id):
-        with self._instance_lock:
+        with self._scope("session_resource_remove_parent", scannable_id):
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[local_resource_id]
             parent_pk = session.local_id_to_global_id[local_parent_id]
-            self._edges.remove_parent(record_pk, parent_pk)
+            with self._indexes():
+                self._edges.remove_parent(record_pk, parent_pk)
             self._resource_modify_parent(record_pk, parent_pk, True)
 
     def _resource_modify_parent(self, record_pk, parent_pk, remove):
@@ -851,7 +1004,7 @@ class ResourceManager(object):
         and if so they must be added in a blob so that we can hook up the
         parent relationships"""
 
-        with self._instance_lock:
+        with self._exclusive("session_add_resources"):
             session = self._sessions[scannable_id]
 
             with transaction.atomic():
@@ -861,21 +1014,24 @@ class ResourceManager(object):
                 self._persist_created_hosts(session, scannable_id, resources)
 
     def session_remove_local_resources(self, scannable_id, resources):
-        with self._instance_lock:
+        with self._exclusive("session_remove_local_resources"):
             session = self._sessions[scannable_id]
 
             with transaction.atomic():
+                victim_ids = []
                 for local_resource in resources:
                     try:
                         resource_global_id = session.local_id_to_global_id[local_resource._handle]
-                        self._delete_nid_resource(scannable_id, resource_global_id)
-                        self._delete_resource(StorageResourceRecord.objects.get(pk=resource_global_id))
                     except KeyError:
-                        pass
+                        continue
+                    self._delete_nid_resource(scannable_id, resource_global_id)
+                    victim_ids.append(resource_global_id)
+                if victim_ids:
+                    self._delete_resources(victim_ids)
                 self._persist_lun_updates(scannable_id)
 
     def session_remove_global_resources(self, scannable_id, resources):
-        with self._instance_lock:
+        with self._exclusive("session_remove_global_resources"):
             session = self._sessions[scannable_id]
             resources = session._plugin_instance._index._local_id_to_resource.values()
 
@@ -884,32 +1040,26 @@ class ResourceManager(object):
                 self._persist_lun_updates(scannable_id)
 
     def session_notify_alert(self, scannable_id, resource_local_id, active, severity, alert_class, attribute):
-        with self._instance_lock:
+        with self._scope("session_notify_alert", scannable_id):
             session = self._sessions[scannable_id]
             record_pk = session.local_id_to_global_id[resource_local_id]
-            if active:
-                if not (record_pk, alert_class) in self._active_alerts:
+            with self._alerts():
+                if active:
+                    if (record_pk, alert_class) in self._active_alerts:
+                        return
                     alert_state = self._persist_alert(record_pk, active, severity, alert_class, attribute)
                     if alert_state:
                         self._persist_alert_propagate(alert_state)
                         self._active_alerts[(record_pk, alert_class)] = alert_state.pk
-            else:
-                alert_state = self._persist_alert(record_pk, active, severity, alert_class, attribute)
-                if alert_state:
-                    self._persist_alert_unpropagate(alert_state)
-                if (record_pk, alert_class) in self._active_alerts:
-                    del self._active_alerts[(record_pk, alert_class)]
+                else:
+                    alert_state = self._persist_alert(record_pk, active, severity, alert_class, attribute)
+                    if alert_state:
+                        self._persist_alert_unpropagate(alert_state)
+                    self._active_alerts.pop((record_pk, alert_class), None)
 
     def _get_descendents(self, record_global_pk):
-        def collect_children(resource_id):
-            result = set()
-            child_record_ids = self._edges.get_children(resource_id)
-            result = result | set(child_record_ids)
-            for c in child_record_ids:
-                result = result | collect_children(c)
-            return result
-
-        return list(collect_children(record_global_pk))
+        with self._indexes():
+            return self._edges.get_descendents([record_global_pk]).keys()
 
     # FIXME: the alert propagation and unpropagation should happen with the AlertState
     # raise/lower in a transaction.
@@ -943,120 +1093,157 @@ class ResourceManager(object):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert not transaction.get_autocommit()
 
-        reported_scoped_resources = []
-        reported_global_resources = []
+        started = time.time()
+
+        reported_scoped_resources = set()
+        reported_global_resources = set()
         for r in reported_resources:
             try:
                 if isinstance(r._meta.identifier, BaseScopedId):
-                    reported_scoped_resources.append(session.local_id_to_global_id[r._handle])
+                    reported_scoped_resources.add(session.local_id_to_global_id[r._handle])
                 else:
-                    reported_global_resources.append(session.local_id_to_global_id[r._handle])
+                    reported_global_resources.add(session.local_id_to_global_id[r._handle])
             except KeyError as e:
                 log.warning("attempting to access resource missing from local-global map {}".format(e))
 
-        # This generator re-runs the query on every loop iteration in order
-        # to handle situations where resources returned by the query are
-        # deleted as dependents of prior resources (HYD-3659).
-        def iterate_lost_resources(query):
-            loops_remaining = len(query())
-            while loops_remaining:
-                loops_remaining -= 1
-                rs = query()
-                if len(rs):
-                    yield rs[0]
-                else:
-                    raise StopIteration()
+        # Scoped resources which were at some point reported by this scannable_id,
+        # but are missing this time around.
+        lost_scoped_resources = self._scope_index.get_scoped(session.scannable_id) - reported_scoped_resources
 
-            # If the list of lost items grew, don't continue looping.
-            # Just bail out and the next scan will get them.
-            if loops_remaining <= 0:
-                raise StopIteration()
+        # Globalid resources which were at some point reported by this scannable_id,
+        # but are missing this time around: they are lost altogether if nothing else reports them.
+        lost_global_resources = self._scope_index.get_reported(session.scannable_id) - reported_global_resources
+        unreported_global_resources = set()
+        if lost_global_resources:
+            field = StorageResourceRecord.reported_by.field
+            StorageResourceRecord.reported_by.through._default_manager.filter(
+                **{
+                    "%s__in" % field.m2m_column_name(): lost_global_resources,
+                    field.m2m_reverse_name(): session.scannable_id,
+                }
+            ).delete()
+            for record_id in lost_global_resources:
+                self._scope_index.remove_reporter(record_id, session.scannable_id)
 
-        # Look for scoped resources which were at some point reported by
-        # this scannable_id, but are missing this time around.
-        lost_scoped_resources = lambda: StorageResourceRecord.objects.filter(
-            ~Q(pk__in=reported_scoped_resources), storage_id_scope=session.scannable_id
-        )
-        for r in iterate_lost_resources(lost_scoped_resources):
-            self._delete_resource(r)
+            unreported_global_resources = set(
+                StorageResourceRecord.objects.filter(id__in=lost_global_resources, reported_by=None).values_list(
+                    "id", flat=True
+                )
+            )
 
-        # Look for globalid resources which were at some point reported by
-        # this scannable_id, but are missing this time around.
-        lost_global_resources = lambda: StorageResourceRecord.objects.filter(
-            ~Q(pk__in=reported_global_resources), reported_by=session.scannable_id
-        )
-        for reportee in iterate_lost_resources(lost_global_resources):
-            reportee.reported_by.remove(session.scannable_id)
-            if not reportee.reported_by.count():
-                self._delete_resource(reportee)
+        # Delete everything together, so that resources which are dependents of
+        # others in the lost set are handled once and in order (HYD-3659).
+        lost_resources = lost_scoped_resources | unreported_global_resources
+        if lost_resources:
+            self._delete_resources(sorted(lost_resources))
+
+        elapsed = time.time() - started
+        session.culled_count += len(lost_resources)
+        session.cull_time += elapsed
+        if lost_resources or lost_global_resources:
+            log.info(
+                "Session %s: culled %s lost resources (%s scoped, %s global, %s no longer reported) in %.2fs"
+                % (
+                    session.scannable_id,
+                    len(lost_resources),
+                    len(lost_scoped_resources),
+                    len(unreported_global_resources),
+                    len(lost_global_resources),
+                    elapsed,
+                )
+            )
 
     def _delete_resource(self, resource_record):
-        log.info("ResourceManager._delete_resource '%s'" % resource_record.pk)
+        self._delete_resources([resource_record.id])
+
+    def _delete_resources(self, record_ids):
+        """
+        Delete the records `record_ids` along with everything that depends on them: resources
+        scoped to or only reported by them, and resources that refer to them.
+        """
+        log.info("ResourceManager._delete_resources %s" % record_ids)
 
         ordered_for_deletion = []
         phase1_ordered_dependencies = []
+        phase1_seen = set()
 
         def collect_phase1(record_id):
-            if not record_id in phase1_ordered_dependencies:
+            if not record_id in phase1_seen:
+                phase1_seen.add(record_id)
                 phase1_ordered_dependencies.append(record_id)
 
-        # If we are deleting one of the special top level resource classes, handle
-        # its dependents
-        record_id = resource_record.id
         from chroma_core.lib.storage_plugin.base_resource import BaseScannableResource, HostsideResource
 
-        resource_class = self._class_index.get(record_id)
-        if issubclass(resource_class, BaseScannableResource) or issubclass(resource_class, HostsideResource):
-            # Find resources scoped to this resource
-            for dependent in StorageResourceRecord.objects.filter(storage_id_scope=record_id):
-                collect_phase1(dependent.id)
-
-            # Delete any reported_by relations to this resource
-            StorageResourceRecord.reported_by.through._default_manager.filter(
-                **{"%s" % StorageResourceRecord.reported_by.field.m2m_reverse_field_name(): record_id}
-            ).delete()
-
-            # Delete any resources whose reported_by are now zero
-            for srr in StorageResourceRecord.objects.filter(storage_id_scope=None, reported_by=None).values("id"):
-                srr_class = self._class_index.get(srr["id"])
-                if (not issubclass(srr_class, HostsideResource)) and (not issubclass(srr_class, BaseScannableResource)):
-                    collect_phase1(srr["id"])
-
-        if issubclass(resource_class, BaseScannableResource):
-            # Delete any StorageResourceOffline alerts
-            for alert_state in StorageResourceOffline.objects.filter(alert_item_id=record_id):
-                alert_state.delete()
-
-        phase1_ordered_dependencies.append(resource_record.id)
-
-        reference_cache = dict([(r, []) for r in phase1_ordered_dependencies])
-        for attr in StorageResourceAttributeReference.objects.filter(value__in=phase1_ordered_dependencies):
-            reference_cache[attr.value_id].append(attr)
+        for record_id in record_ids:
+            # If we are deleting one of the special top level resource classes, handle
+            # its dependents
+            resource_class = self._class_index.get(record_id)
+            if issubclass(resource_class, BaseScannableResource) or issubclass(resource_class, HostsideResource):
+                # Find resources scoped to this resource
+                for dependent in StorageResourceRecord.objects.filter(storage_id_scope=record_id).values("id"):
+                    collect_phase1(dependent["id"])
+
+                # Delete any reported_by relations to this resource
+                StorageResourceRecord.reported_by.through._default_manager.filter(
+                    **{"%s" % StorageResourceRecord.reported_by.field.m2m_reverse_field_name(): record_id}
+                ).delete()
+
+                # Delete any resources whose reported_by are now zero
+                for srr in StorageResourceRecord.objects.filter(storage_id_scope=None, reported_by=None).values("id"):
+                    srr_class = self._class_index.get(srr["id"])
+                    if (not issubclass(srr_class, HostsideResource)) and (
+                        not issubclass(srr_class, BaseScannableResource)
+                    ):
+                        collect_phase1(srr["id"])
+
+            if issubclass(resource_class, BaseScannableResource):
+                # Delete any StorageResourceOffline alerts
+                for alert_state in StorageResourceOffline.objects.filter(alert_item_id=record_id):
+                    alert_state.delete()
+
+            collect_phase1(record_id)
+
+        # Find ResourceReference attributes on other objects that refer to the victims,
+        # and the ones that refer to those, a level at a time.
+        referrers = defaultdict(list)
+        frontier = set(phase1_ordered_dependencies)
+        seen = set(frontier)
+        while frontier:
+            next_frontier = set()
+            for resource_id, value_id in StorageResourceAttributeReference.objects.filter(
+                value__in=frontier
+            ).values_list("resource_id", "value_id"):
+                referrers[value_id].append(resource_id)
+                if resource_id not in seen:
+                    next_frontier.add(resource_id)
+            seen |= next_frontier
+            frontier = next_frontier
+
+        ordered_set = set()
 
         def collect_phase2(record_id):
-            if record_id in ordered_for_deletion:
+            if record_id in ordered_set:
                 # NB cycles aren't allowed individually in the parent graph,
                 # the resourcereference graph, the scoping graph, but
                 # we are traversing all 3 at once so we can see cycles here.
                 return
+            ordered_set.add(record_id)
 
-            # Find ResourceReference attributes on other objects
-            # that refer to this one
-            if record_id in reference_cache:
-                attrs = reference_cache[record_id]
-            else:
-                attrs = StorageResourceAttributeReference.objects.filter(value=record_id)
-            for attr in attrs:
-                collect_phase2(attr.resource_id)
+            for referrer_id in referrers[record_id]:
+                collect_phase2(referrer_id)
 
             ordered_for_deletion.append(record_id)
 
         for record_id in phase1_ordered_dependencies:
             collect_phase2(record_id)
 
-        for storage_resource_record in StorageResourceLearnEvent.objects.all():
-            if storage_resource_record.storage_resource.id in ordered_for_deletion:
-                storage_resource_record.delete()
+        StorageResourceLearnEvent._base_manager.filter(
+            id__in=[
+                learn_event.id
+                for learn_event in StorageResourceLearnEvent.objects.all()
+                if learn_event.get_variant("storage_resource_id", None, int) in ordered_set
+            ]
+        ).delete()
 
         # Delete any parent relations pointing to victim resources
         StorageResourceRecord.parents.through._default_manager.filter(
@@ -1093,20 +1280,40 @@ class ResourceManager(object):
         with DelayedContextFrom(StorageAlertPropagated) as sap_delayed:
             [sap_delayed.delete(int(x["id"])) for x in victim_saps]
 
-        for sra in victim_sras:
-            storage_resource_alert = StorageResourceAlert.objects.get(id=sra["id"])
-            if storage_resource_alert.active:
-                StorageResourceAlert.notify(
+        StorageResourceAlert.notify_many(
+            [
+                (
                     storage_resource_alert.alert_item,
                     False,
-                    alert_class=storage_resource_alert.alert_class,
-                    attribute=storage_resource_alert.attribute,
-                    alert_type=storage_resource_alert.alert_type,
+                    {
+                        "alert_class": storage_resource_alert.alert_class,
+                        "attribute": storage_resource_alert.attribute,
+                        "alert_type": storage_resource_alert.alert_type,
+                    },
                 )
+                for storage_resource_alert in StorageResourceAlert.objects.filter(
+                    id__in=victim_sras, active=True
+                ).prefetch_related("alert_item")
+            ]
+        )
+
+        # Load the resources the subscriber index needs to forget together
+        indexed_resources = StorageResourceRecord.to_resources(
+            StorageResourceRecord.objects.filter(
+                id__in=[
+                    record_id
+                    for record_id in ordered_for_deletion
+                    if self._subscriber_index.indexes(self._class_index.get(record_id))
+                ]
+            )
+        )
 
         for record_id in ordered_for_deletion:
-            self._subscriber_index.remove_resource(record_id, self._class_index.get(record_id))
+            self._subscriber_index.remove_resource(
+                record_id, self._class_index.get(record_id), indexed_resources.get(record_id)
+            )
             self._class_index.remove_record(record_id)
+            self._scope_index.remove_record(record_id)
             self._edges.remove_node(record_id)
 
             for session in self._sessions.values():
@@ -1130,7 +1337,7 @@ class ResourceManager(object):
                 deleter.delete(int(record_id))
 
     def global_remove_resource(self, resource_id):
-        with self._instance_lock:
+        with self._exclusive("global_remove_resource"):
             with transaction.atomic():
                 log.debug("global_remove_resource: %s" % resource_id)
                 try:
@@ -1144,46 +1351,30 @@ class ResourceManager(object):
                 self._delete_resource(record)
 
     def _record_find_ancestor(self, record_id, parent_klass):
-        """Find an ancestor of type parent_klass, search depth first"""
-        record_class = self._class_index.get(record_id)
-        if issubclass(record_class, parent_klass):
-            return record_id
-
-        for p in self._edges.get_parents(record_id):
-            found = self._record_find_ancestor(p, parent_klass)
-            if found:
-                return found
+        """Find the nearest ancestor of type parent_klass"""
+        ancestors = self._record_find_ancestors(record_id, parent_klass)
+        return ancestors[0] if ancestors else None
 
-        return None
-
-    def _record_find_descendent(self, record_id, descendent_klass, stop_at=None, depth=0):
-        """Find a descendent of class dependent_klass, where the trace
+    def _record_find_descendent(self, record_id, descendent_klass, stop_at=None):
+        """Find the nearest descendent of class dependent_klass, where the trace
         between the origin and the descendent contains no resources of
         class stop_at"""
-        record_class = self._class_index.get(record_id)
-        if issubclass(record_class, descendent_klass):
+        if issubclass(self._class_index.get(record_id), descendent_klass):
             return record_id
-        if depth != 0 and stop_at and issubclass(record_class, stop_at):
-            return None
 
-        for c in self._edges.get_children(record_id):
-            found = self._record_find_descendent(c, descendent_klass, stop_at, depth + 1)
-            if found:
-                return found
+        expand = None
+        if stop_at:
+            expand = lambda c: not issubclass(self._class_index.get(c), stop_at)
 
-        return None
+        depths = self._edges.get_descendents([record_id], expand)
+        found = [c for c in depths if issubclass(self._class_index.get(c), descendent_klass)]
+        return min(found, key=depths.get) if found else None
 
     def _record_find_ancestors(self, record_id, parent_klass):
-        """Find all ancestors of type parent_klass"""
-        result = []
-        record_class = self._class_index.get(record_id)
-        if issubclass(record_class, parent_klass):
-            result.append(record_id)
-
-        for p in self._edges.get_parents(record_id):
-            result.extend(self._record_find_ancestors(p, parent_klass))
-
-        return result
+        """Find all ancestors of type parent_klass, nearest first"""
+        depths = self._edges.get_ancestors([record_id])
+        depths[record_id] = 0
+        return sorted((p for p in depths if issubclass(self._class_index.get(p), parent_klass)), key=depths.get)
 
     def _persist_new_resources(self, session, resources):
         from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
@@ -1191,20 +1382,26 @@ class ResourceManager(object):
         # Must be run in a transaction to avoid leaving invalid things in the DB on failure.
         assert not transaction.get_autocommit()
 
-        # Sort the resources into an order based on ResourceReference
+        # Sort the resources into levels based on ResourceReference
         # attributes, such that the referenced resource is created
-        # before the referencing resource.
+        # in an earlier level than the referencing resource.
         ordered_for_creation = []
+        levels = {}
 
         def order_by_references(resource):
             if resource._handle_global:
                 # Bit of _a weird one: this covers the case where a plugin session
                 # was given a root resource that had some ResourceReference attributes
                 # that pointed to resources from a different plugin
-                return False
+                return -1
 
             if resource._handle in session.local_id_to_global_id:
-                return False
+                return -1
+
+            try:
+                return levels[resource]
+            except KeyError:
+                levels[resource] = 0
 
             resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
                 resource.__class__.__module__, resource.__class__.__name__
@@ -1212,57 +1409,35 @@ class ResourceManager(object):
 
             # Find any ResourceReference attributes ensure that the target
             # resource gets constructed before this one
+            level = 0
             for key, value in resource._storage_dict.items():
                 # Special case for ResourceReference attributes, because the resource
                 # object passed from the plugin won't have a global ID for the referenced
                 # resource -- we have to do the lookup inside ResourceManager
                 attribute_obj = resource_class.get_attribute_properties(key)
-                if isinstance(attribute_obj, attributes.ResourceReference):
-                    if value:
-                        referenced_resource = value
-                        if not referenced_resource._handle_global:
-                            if not referenced_resource._handle in session.local_id_to_global_id:
-                                order_by_references(referenced_resource)
+                if isinstance(attribute_obj, attributes.ResourceReference) and value:
+                    level = max(level, order_by_references(value) + 1)
 
-            if not resource in ordered_for_creation:
-                ordered_for_creation.append(resource)
+            levels[resource] = level
+            ordered_for_creation.append(resource)
+            return level
 
         for resource in resources:
-            if not resource in ordered_for_creation:
-                order_by_references(resource)
+            order_by_references(resource)
 
         # Create StorageResourceRecords for any resources which
         # do not already have one, and update the local_id_to_global_id
         # map with the DB ID for each resource.
         creations = {}
+        by_level = defaultdict(list)
         for resource in ordered_for_creation:
-            if isinstance(resource._meta.identifier, BaseScopedId):
-                scope_id = session.scannable_id
-            elif isinstance(resource._meta.identifier, BaseGlobalId):
-                scope_id = None
-            else:
-                raise NotImplementedError
-
-            resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
-                resource.__class__.__module__, resource.__class__.__name__
-            )
-
-            id_tuple = resource.id_tuple()
-            cleaned_id_items = []
-            for t in id_tuple:
-                if isinstance(t, BaseStorageResource):
-                    cleaned_id_items.append(session.local_id_to_global_id[t._handle])
-                else:
-                    cleaned_id_items.append(t)
+            by_level[levels[resource]].append(resource)
+        for level in sorted(by_level.keys()):
+            creations.update(self._get_or_create_records(session, by_level[level]))
 
-            id_str = json.dumps(tuple(cleaned_id_items))
-
-            record, created = StorageResourceRecord.objects.get_or_create(
-                resource_class_id=resource_class_id, storage_id_str=id_str, storage_id_scope_id=scope_id
-            )
+        for resource in ordered_for_creation:
+            record, created = creations[resource]
 
-            session.local_id_to_global_id[resource._handle] = record.pk
-            session.global_id_to_local_id[record.pk] = resource._handle
             self._label_cache[record.id] = resource.get_label()
 
             if created:
@@ -1272,31 +1447,35 @@ class ResourceManager(object):
                     % (session.scannable_id, created, record.pk, resource._handle)
                 )
 
-            creations[resource] = (record, created)
-
             # Add the new record to the index so that future records and resolve their
             # provide/subscribe relationships with respect to it
             self._subscriber_index.add_resource(record.pk, resource)
 
+            resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
             self._class_index.add_record(record.pk, resource_class)
+            if record.storage_id_scope_id is not None:
+                self._scope_index.add_scoped(record.pk, record.storage_id_scope_id)
 
-        # Update or create attribute records
-        attr_classes = set()
+        # Add the scannable to the reporters of any GlobalId resources
+        reported_by = []
         for resource in ordered_for_creation:
             record, created = creations[resource]
 
             if isinstance(resource._meta.identifier, BaseGlobalId) and session.scannable_id != record.id:
-                try:
-                    record.reported_by.get(pk=session.scannable_id)
-                except StorageResourceRecord.DoesNotExist:
-                    log.debug(
-                        "saw GlobalId resource %s from scope %s for the first time" % (record.id, session.scannable_id)
-                    )
-                    record.reported_by.add(session.scannable_id)
+                reported_by.append((record.id, session.scannable_id))
+
+        for record_id, scannable_id in self._bulk_m2m_add(StorageResourceRecord.reported_by, reported_by):
+            log.debug("saw GlobalId resource %s from scope %s for the first time" % (record_id, scannable_id))
+        for record_id, scannable_id in reported_by:
+            self._scope_index.add_reporter(record_id, scannable_id)
+
+        # Update or create attribute records
+        attr_values = defaultdict(dict)
+        for resource in ordered_for_creation:
+            record, created = creations[resource]
 
             resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
 
-            attrs = {}
             # Special case for ResourceReference attributes, because the resource
             # object passed from the plugin won't have a global ID for the referenced
             # resource -- we have to do the lookup inside ResourceManager
@@ -1304,41 +1483,42 @@ class ResourceManager(object):
                 attribute_obj = resource_class.get_attribute_properties(key)
                 if isinstance(attribute_obj, attributes.ResourceReference):
                     if value and not value._handle_global:
-                        attrs[key] = session.local_id_to_global_id[value._handle]
+                        value = session.local_id_to_global_id[value._handle]
                     elif value and value._handle_global:
-                        attrs[key] = value._handle
-                    else:
-                        attrs[key] = value
-                else:
-                    attrs[key] = value
+                        value = value._handle
 
-            for key, val in attrs.items():
-                resource_class = storage_plugin_manager.get_resource_class_by_id(record.resource_class_id)
-
-                # Try to update an existing record
                 attr_model_class = resource_class.attr_model_class(key)
+                attr_values[attr_model_class][(record.id, key)] = attr_model_class.encode(value)
 
-                updated = attr_model_class.objects.filter(resource=record, key=key).update(
-                    value=attr_model_class.encode(val)
-                )
-
-                # If there was no existing record, create one
-                if not updated:
-                    delayed_attr_model_class = DelayedContextFrom(attr_model_class)
+        existing_record_ids = [record.id for record, created in creations.values() if not created]
+        for attr_model_class, values in attr_values.items():
+            if issubclass(attr_model_class, StorageResourceAttributeSerialized):
+                value_field = "value"
+            else:
+                value_field = "value_id"
 
-                    attr_classes.add(delayed_attr_model_class)
+            current = {}
+            if existing_record_ids:
+                for attr_id, resource_id, key, value in attr_model_class.objects.filter(
+                    resource_id__in=existing_record_ids
+                ).values_list("id", "resource_id", "key", value_field):
+                    current[(resource_id, key)] = (attr_id, value)
 
-                    if issubclass(attr_model_class, StorageResourceAttributeSerialized):
-                        data = dict(resource_id=record.id, key=key, value=attr_model_class.encode(val))
+            with DelayedContextFrom(attr_model_class) as attrs:
+                for (resource_id, key), value in values.items():
+                    try:
+                        attr_id, current_value = current[(resource_id, key)]
+                    except KeyError:
+                        attrs.insert({"resource_id": resource_id, "key": key, value_field: value})
                     else:
-                        data = dict(resource_id=record.id, key=key, value_id=attr_model_class.encode(val))
-
-                    delayed_attr_model_class.insert(data)
-
-        [x.item_cache.flush() for x in attr_classes]
+                        if value != current_value:
+                            # Pass every column so that massiviu can batch the rows
+                            # with executemany instead of one UPDATE per row
+                            attrs.update({"id": attr_id, "resource_id": resource_id, "key": key, value_field: value})
 
         # Find out if new resources match anything in SubscriberIndex and create
         # relationships if so.
+        new_parents = []
         logicaldrives_with_new_descendents = []
         for resource in ordered_for_creation:
             record, created = creations[resource]
@@ -1352,8 +1532,7 @@ class ResourceManager(object):
                         continue
                     log.info("Linked up me %s as parent of %s" % (record.pk, s))
                     self._edges.add_parent(s, record.pk)
-                    s_record = StorageResourceRecord.objects.get(pk=s)
-                    s_record.parents.add(record.pk)
+                    new_parents.append((s, record.pk))
                     if isinstance(resource, LogicalDrive):
                         # A new LogicalDrive ancestor might affect the labelling
                         # of another LogicalDrive's Volume.
@@ -1368,22 +1547,19 @@ class ResourceManager(object):
                         continue
                     log.info("Linked up %s as parent of me, %s" % (p, record.pk))
                     self._edges.add_parent(record.pk, p)
-                    record.parents.add(p)
+                    new_parents.append((record.pk, p))
 
         # Update EdgeIndex and StorageResourceRecord.parents
         for resource in resources:
-            try:
-                record, created = creations[resource]
-            except KeyError:
-                record = StorageResourceRecord.objects.get(pk=session.local_id_to_global_id[resource._handle])
+            record_id = session.local_id_to_global_id[resource._handle]
 
             # Update self._edges
             for p in resource._parents:
                 parent_global_id = session.local_id_to_global_id[p._handle]
-                self._edges.add_parent(record.id, parent_global_id)
+                self._edges.add_parent(record_id, parent_global_id)
+                new_parents.append((record_id, parent_global_id))
 
-            new_parent_pks = [session.local_id_to_global_id[p._handle] for p in resource._parents]
-            record.parents.add(*new_parent_pks)
+        self._bulk_m2m_add(StorageResourceRecord.parents, new_parents)
 
         # For any LogicalDrives we created that have been hooked up via SubscriberIndex,
         # see if their presence should change the name of a Volume
@@ -1397,12 +1573,116 @@ class ResourceManager(object):
                         Volume.objects.filter(storage_resource=descendent_ld).update(label=self.get_label(ld_id))
 
         # Create StorageResourceLearnEvent for anything we found new
-        for resource in creations:
-            record, created = creations[resource]
+        if hasattr(session, "host_id"):
+            host = None
+            for resource in ordered_for_creation:
+                record, created = creations[resource]
+
+                if created:
+                    if host is None:
+                        host = ManagedHost.objects.get(id=getattr(session, "host_id"))
 
-            if created and hasattr(session, "host_id"):
-                StorageResourceLearnEvent.register_event(
-                    severity=logging.INFO,
-                    alert_item=ManagedHost.objects.get(id=getattr(session, "host_id")),
-                    storage_resource=record,
+                    StorageResourceLearnEvent.register_event(
+                        severity=logging.INFO, alert_item=host, storage_resource=record
+                    )
+
+    def _get_or_create_records(self, session, resources):
+        """
+        The equivalent of StorageResourceRecord.objects.get_or_create for each of `resources`, in a
+        constant number of queries.  The ID tuples of `resources` may only refer to resources which
+        already have a global ID.
+
+        :return: A dict of resource to (record, created), and local_id_to_global_id updated
+        """
+        from chroma_core.lib.storage_plugin.manager import storage_plugin_manager
+
+        resource_keys = []
+        for resource in resources:
+            if isinstance(resource._meta.identifier, BaseScopedId):
+                scope_id = session.scannable_id
+            elif isinstance(resource._meta.identifier, BaseGlobalId):
+                scope_id = None
+            else:
+                raise NotImplementedError
+
+            resource_class, resource_class_id = storage_plugin_manager.get_plugin_resource_class(
+                resource.__class__.__module__, resource.__class__.__name__
+            )
+
+            id_tuple = resource.id_tuple()
+            cleaned_id_items = []
+            for t in id_tuple:
+                if isinstance(t, BaseStorageResource):
+                    cleaned_id_items.append(session.local_id_to_global_id[t._handle])
+                else:
+                    cleaned_id_items.append(t)
+
+            id_str = json.dumps(tuple(cleaned_id_items))
+
+            resource_keys.append((resource, (resource_class_id, id_str, scope_id)))
+
+        records = {}
+        if resource_keys:
+            for record in StorageResourceRecord.objects.filter(
+                Q(storage_id_scope_id=session.scannable_id) | Q(storage_id_scope=None),
+                storage_id_str__in=set(key[1] for resource, key in resource_keys),
+            ):
+                records[(record.resource_class_id, record.storage_id_str, record.storage_id_scope_id)] = record
+
+        new_records = []
+        for resource, key in resource_keys:
+            if key not in records:
+                records[key] = StorageResourceRecord(
+                    resource_class_id=key[0], storage_id_str=key[1], storage_id_scope_id=key[2]
                 )
+                new_records.append(key)
+
+        # PostgreSQL gives us back the IDs of the created records
+        StorageResourceRecord.objects.bulk_create([records[key] for key in new_records])
+        new_records = set(new_records)
+
+        creations = {}
+        for resource, key in resource_keys:
+            record = records[key]
+
+            # As get_or_create, only the first of several resources with the same ID is created
+            created = key in new_records
+            new_records.discard(key)
+
+            session.local_id_to_global_id[resource._handle] = record.pk
+            session.global_id_to_local_id[record.pk] = resource._handle
+            creations[resource] = (record, created)
+
+        return creations
+
+    @staticmethod
+    def _bulk_m2m_add(m2m, pairs):
+        """
+        The equivalent of StorageResourceRecord.objects.get(pk=from_id).<m2m>.add(to_id) for each
+        (from_id, to_id) of `pairs`, in a constant number of queries.
+
+        :return: The pairs which were added
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return set()
+
+        through = m2m.through
+        from_column = m2m.field.m2m_column_name()
+        to_column = m2m.field.m2m_reverse_name()
+
+        existing = set(
+            through._default_manager.filter(
+                **{
+                    "%s__in" % from_column: set(from_id for from_id, to_id in pairs),
+                    "%s__in" % to_column: set(to_id for from_id, to_id in pairs),
+                }
+            ).values_list(from_column, to_column)
+        )
+
+        added = pairs - existing
+        through._default_manager.bulk_create(
+            [through(**{from_column: from_id, to_column: to_id}) for from_id, to_id in added]
+        )
+
+        return added
@@ -7,7 +7,14 @@
 around an AMQP queue."""
 
 
+import errno
+import socket
 import threading
+import uuid
+
+from kombu import Exchange, Queue
+from kombu.common import maybe_declare
+from kombu.pools import producers
 
 from chroma_core.services import _amqp_connection
 from chroma_core.services.log import log_register
@@ -37,12 +44,30 @@ class ServiceQueue(object):
 
     name = None
 
+    # Seconds between checks of the stop event while serving, in case the stop
+    # message sent by `stop` is lost.
+    STOP_CHECK_INTERVAL = 30
+
+    def _amqp_queue(self):
+        # Declared as kombu.simple.SimpleQueue would, so that we interoperate with any
+        # other users of the queue.
+        return Queue(self.name, Exchange(self.name, type="direct", durable=False), routing_key=self.name, durable=False)
+
     def put(self, body):
-        with _amqp_connection() as conn:
-            q = conn.SimpleQueue(
-                self.name, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
-            )
-            q.put(body)
+        self.put_many([body])
+
+    def put_many(self, bodies):
+        """Send several messages, using one pooled producer.
+
+        Producers and their connections are shared by all ServiceQueues in the process,
+        and each queue is declared only once per connection.
+        """
+        queue = self._amqp_queue()
+
+        with producers[_amqp_connection()].acquire(block=True) as producer:
+            maybe_declare(queue, producer.channel, retry=True)
+            for body in bodies:
+                producer.publish(body, serializer="json", exchange=queue.exchange, routing_key=self.name, retry=True)
 
     def purge(self):
         with _amqp_connection() as conn:
@@ -53,33 +78,59 @@ class ServiceQueue(object):
 
     def __init__(self):
         self._stopping = threading.Event()
+        self._stop_id = uuid.uuid4()
+
+    def _stop_queue(self):
+        # A private queue, to which `stop` sends a message in order to wake `serve`
+        return Queue("%s_stop_%s" % (self.name, self._stop_id), exclusive=True, auto_delete=True, durable=False)
 
     def stop(self):
         log.info("Stopping ServiceQueue %s" % self.name)
         self._stopping.set()
 
+        try:
+            with producers[_amqp_connection()].acquire(block=True) as producer:
+                producer.publish({}, serializer="json", routing_key=self._stop_queue().name)
+        except Exception as e:
+            # serve will notice the stop event within STOP_CHECK_INTERVAL
+            log.warning("Failed to wake ServiceQueue %s: %s" % (self.name, e))
+
     def serve(self, callback):
-        from Queue import Empty as QueueEmpty
+        """Invoke `callback` with each message body, until `stop` is called.
+
+        Sleeps until either a message arrives or `stop` is called, rather than polling.
+        """
+
+        def on_message(body, message):
+            message.ack()
+            callback(body)
+
+        def on_stop(body, message):
+            message.ack()
 
         with _amqp_connection() as conn:
-            q = conn.SimpleQueue(
-                self.name, serializer="json", exchange_opts={"durable": False}, queue_opts={"durable": False}
-            )
-            # FIXME: it would be preferable to avoid waking up so often: really what is wanted
-            # here is to sleep on messages or a stop event.
-            while not self._stopping.is_set():
-                try:
-                    message = q.get(timeout=1)
-                    message.ack()
-                    message = message.decode()
-                    callback(message)
-                except QueueEmpty:
-                    pass
+            with conn.Consumer([self._amqp_queue()], callbacks=[on_message]), conn.Consumer(
+                [self._stop_queue()], callbacks=[on_stop]
+            ):
+                while not self._stopping.is_set():
+                    try:
+                        conn.drain_events(timeout=self.STOP_CHECK_INTERVAL)
+                    except socket.timeout:
+                        pass
+                    except IOError as e:
+                        #  See HYD-2551
+                        if e.errno != errno.EINTR:
+                            # if not [Errno 4] Interrupted system call
+                            raise
 
 
 class AgentRxQueue(ServiceQueue):
     def __route_message(self, message):
-        if message["type"] == "DATA" and self.__data_callback:
+        if message["type"] == "DATA_BATCH":
+            # Several DATA messages from one agent POST, see HostQueueCollection.receive_many
+            for batched_message in message["messages"]:
+                self.__route_message(batched_message)
+        elif message["type"] == "DATA" and self.__data_callback:
             self.__data_callback(message["fqdn"], message["body"])
         elif self.__session_callback:
             self.__session_callback(message)
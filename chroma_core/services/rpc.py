@@ -20,9 +20,12 @@ import threading
 import uuid
 import django
 import errno
+import heapq
 import os
 import time
 import jsonschema
+from collections import defaultdict, deque
+from Queue import Queue as ThreadQueue
 
 import kombu
 import kombu.pools
@@ -57,6 +60,10 @@ RESPONSE_SCHEMA = {
     "required": ["exception", "result", "request_id"],
 }
 
+# Compile the schemas once, rather than on every jsonschema.validate call
+request_validator = jsonschema.Draft4Validator(REQUEST_SCHEMA)
+response_validator = jsonschema.Draft4Validator(RESPONSE_SCHEMA)
+
 RESPONSE_TIMEOUT = 300
 
 """
@@ -91,12 +98,11 @@ class RpcTimeout(Exception):
     pass
 
 
-class RunOneRpc(threading.Thread):
-    """Handle a single incoming RPC in a new thread, and send the
-    response (result or exception) from the execution thread."""
+class RunOneRpc(object):
+    """Handle a single incoming RPC, and send the response (result or
+    exception) from the executing RpcWorkerPool thread."""
 
     def __init__(self, rpc, body, response_conn_pool):
-        super(RunOneRpc, self).__init__()
         self.rpc = rpc
         self.body = body
         self._response_conn_pool = response_conn_pool
@@ -159,13 +165,123 @@ class RunOneRpc(threading.Thread):
                 )
 
 
+class RpcWorkerPool(object):
+    """A fixed set of threads running RunOneRpc instances in the order they are submitted.
+
+    `method_limits` caps the number of concurrent executions of particular methods: requests
+    beyond the cap are set aside (without occupying a worker) until an execution of the same
+    method completes, so that a flood of one kind of call can't starve the others.
+
+    Counters of queue wait and execution time are kept per method, see `stats`.
+    """
+
+    def __init__(self, name, size, queue_depth, method_limits=None):
+        self._name = name
+        self._queue = ThreadQueue(queue_depth)
+        self._method_limits = method_limits or {}
+        self._lock = threading.Lock()
+        self._running = defaultdict(int)
+        self._deferred = defaultdict(deque)
+        self._stats = defaultdict(lambda: defaultdict(float))
+
+        self._threads = []
+        for i in range(size):
+            thread = threading.Thread(target=self._work, name="%s-rpc-%s" % (name, i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, run_one_rpc):
+        """Queue an RPC for execution, blocking while the queue is full"""
+        self._queue.put((time.time(), run_one_rpc))
+
+    def _claim(self, item):
+        """Claim a slot for the method of `item`, or defer it if the method is at its cap"""
+        method = item[1].body["method"]
+        limit = self._method_limits.get(method)
+        with self._lock:
+            if limit and self._running[method] >= limit:
+                self._deferred[method].append(item)
+                return False
+            self._running[method] += 1
+            return True
+
+    def _release(self, method):
+        """Release the slot of `method`, returning the next deferred item to run in it if any"""
+        with self._lock:
+            if self._deferred[method]:
+                return self._deferred[method].popleft()
+            self._running[method] -= 1
+            return None
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if not self._claim(item):
+                continue
+
+            while item is not None:
+                enqueued_at, run_one_rpc = item
+                method = run_one_rpc.body["method"]
+                started_at = time.time()
+                try:
+                    run_one_rpc.run()
+                except Exception:
+                    log.exception("RpcWorkerPool: error running %s" % method)
+                finally:
+                    finished_at = time.time()
+                    self._record(method, started_at - enqueued_at, finished_at - started_at)
+                    item = self._release(method)
+
+    def _record(self, method, queue_wait, execution):
+        with self._lock:
+            stats = self._stats[method]
+            stats["count"] += 1
+            stats["queue_wait"] += queue_wait
+            stats["queue_wait_max"] = max(stats["queue_wait_max"], queue_wait)
+            stats["execution"] += execution
+            stats["execution_max"] = max(stats["execution_max"], execution)
+
+    def stats(self):
+        """
+        :return: Dict of method name to counters: `count` of calls completed, total and
+                 maximum `queue_wait` and `execution` time in seconds
+        """
+        with self._lock:
+            return dict((method, dict(counters)) for method, counters in self._stats.items())
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+        for method, counters in sorted(self.stats().items()):
+            log.debug(
+                "%s.%s: %d calls, queue wait %.3fs (max %.3fs), execution %.3fs (max %.3fs)"
+                % (
+                    self._name,
+                    method,
+                    counters["count"],
+                    counters["queue_wait"],
+                    counters["queue_wait_max"],
+                    counters["execution"],
+                    counters["execution_max"],
+                )
+            )
+
+
 class RpcServer(ConsumerMixin):
     def __init__(self, rpc, connection, service_name, serialize=False):
         """
         :param rpc: A ServiceRpcInterface instance
         :param serialize: If True, then process RPCs one after another in a single thread
-        rather than running a thread for each RPC.
+        rather than in a pool of settings.RPC_WORKER_THREADS threads.
         """
+        from django.conf import settings
+
         super(RpcServer, self).__init__()
         self.serialize = serialize
         self.rpc = rpc
@@ -173,6 +289,12 @@ class RpcServer(ConsumerMixin):
         self.queue_name = service_name
         self.request_routing_key = "%s.requests" % self.queue_name
         self._response_conn_pool = kombu.pools.Connections(limit=RESPONSE_CONN_LIMIT)
+        self._pool = RpcWorkerPool(
+            service_name,
+            1 if serialize else settings.RPC_WORKER_THREADS,
+            settings.RPC_QUEUE_DEPTH,
+            rpc.method_limits,
+        )
 
     def get_consumers(self, Consumer, channel):
         return [
@@ -190,130 +312,195 @@ class RpcServer(ConsumerMixin):
         message.ack()
 
         try:
-            jsonschema.validate(body, REQUEST_SCHEMA)
+            request_validator.validate(body)
         except jsonschema.ValidationError as e:
             # Don't even try to send an exception response, because validation failure
             # breaks our faith in request_id and response_routing_key
             log.error("Invalid RPC body: %s" % e)
         else:
-            RunOneRpc(self.rpc, body, self._response_conn_pool).start()
+            self._pool.submit(RunOneRpc(self.rpc, body, self._response_conn_pool))
+
+    def run(self, *args, **kwargs):
+        try:
+            super(RpcServer, self).run(*args, **kwargs)
+        finally:
+            self._pool.stop()
+
+    def stats(self):
+        return self._pool.stats()
 
     def stop(self):
         self.should_stop = True
 
 
-class ResponseWaitState(object):
-    """State kept by for each outstanding RPC -- the response handler
-    must first populate result, then set the `complete` event."""
+class RpcFuture(object):
+    """The pending response to an RPC sent with RpcClient.call_async -- the response
+    handler populates `body`, then sets the `complete` event."""
 
-    def __init__(self, rpc_timeout):
+    def __init__(self, request_id, rpc_timeout, unwrap=None):
+        self.request_id = request_id
         self.complete = threading.Event()
         self.timeout = False
-        self.result = None
+        self.body = None
         self.timeout_at = time.time() + rpc_timeout
+        self._unwrap = unwrap
+
+    def set_response(self, body):
+        self.body = body
+        self.complete.set()
+
+    def set_timeout(self):
+        self.timeout = True
+        self.complete.set()
+
+    def done(self):
+        return self.complete.is_set()
+
+    def result(self):
+        """Wait for the response to arrive.
+
+        :return: The response body, or the result of `unwrap(body)` if an unwrap function was given
+        :raises: RpcTimeout if no response arrived within the RPC's timeout
+        """
+        if not self.complete.wait(max(self.timeout_at - time.time(), 0)):
+            self.timeout = True
+
+        if self.timeout:
+            raise RpcTimeout()
+        elif self._unwrap:
+            return self._unwrap(self.body)
+        else:
+            return self.body
 
 
 class RpcClientResponseHandler(threading.Thread):
-    """Handle responses for a particular named RPC service."""
+    """Handle responses to all the RPCs issued by this process, correlating them
+    with their RpcFuture by request_id.
 
-    def __init__(self, response_routing_key):
+    If the connection to the broker is lost, the RPCs in flight are failed (their responses
+    are lost with the response queue) and the handler reconnects and redeclares its queue."""
+
+    RECONNECT_INTERVAL = 1.0
+
+    def __init__(self, response_routing_key, connections):
         super(RpcClientResponseHandler, self).__init__()
         self._stopping = False
+        self._lock = threading.Lock()
         self._response_states = {}
-        self._response_routing_key = response_routing_key
+        # Heap of (timeout_at, request_id), so that aging doesn't need to visit every outstanding RPC
+        self._timeouts = []
+        self._connections = connections
+        self.response_routing_key = response_routing_key
 
         self._started = threading.Event()
 
-    def wait_for_start(self):
+    def wait_for_start(self, timeout):
         """During initialization, caller needs to be able to block
         on the handler thread starting up, to avoid attempting to issue
         RPCs before the response handler is available
 
+        :return: False if the handler did not start within `timeout` seconds
         """
-        self._started.wait()
+        return self._started.wait(timeout)
 
-    def start_wait(self, request_id, rpc_timeout):
+    def start_wait(self, request_id, rpc_timeout, unwrap=None):
         log.debug("start_wait %s" % request_id)
-        self._response_states[request_id] = ResponseWaitState(rpc_timeout)
+        future = RpcFuture(request_id, rpc_timeout, unwrap)
+        with self._lock:
+            self._response_states[request_id] = future
+            heapq.heappush(self._timeouts, (future.timeout_at, request_id))
+        return future
 
-    def complete_wait(self, request_id):
-        log.debug("complete_wait %s" % request_id)
-        state = self._response_states[request_id]
-        state.complete.wait()
-        log.debug("complete_wait %s triggered" % request_id)
-
-        del self._response_states[request_id]
-
-        if state.timeout:
-            raise RpcTimeout()
-        else:
-            return state.result
+    def discard(self, request_id):
+        with self._lock:
+            self._response_states.pop(request_id, None)
 
     def _age_response_states(self):
-        # FIXME: keep a sorted list by insertion time to avoid
-        # the need to check all the timeouts
         t = time.time()
-        for request_id, state in self._response_states.items():
-            if not state.complete.is_set() and t > state.timeout_at:
-                log.debug("Aged out RPC %s" % request_id)
-                state.timeout = True
-                state.complete.set()
+        with self._lock:
+            while self._timeouts and self._timeouts[0][0] < t:
+                _, request_id = heapq.heappop(self._timeouts)
+                state = self._response_states.pop(request_id, None)
+                if state is not None:
+                    log.debug("Aged out RPC %s" % request_id)
+                    state.set_timeout()
 
     def timeout_all(self):
-        for request_id, state in self._response_states.items():
-            state.timeout = True
-            state.complete.set()
+        with self._lock:
+            states = self._response_states.values()
+            self._response_states = {}
+            self._timeouts = []
+
+        for state in states:
+            state.set_timeout()
 
     def run(self):
         log.debug("ResponseThread.run")
 
+        while not self._stopping:
+            try:
+                self._consume()
+            except Exception as e:
+                if self._stopping:
+                    break
+
+                log.error("Response handler lost its connection, reconnecting: %s" % e)
+                self.timeout_all()
+                time.sleep(self.RECONNECT_INTERVAL)
+
+        log.debug("%s stopped" % self.__class__.__name__)
+
+    def _consume(self):
         def callback(body, message):
             # log.debug(body)
             try:
-                jsonschema.validate(body, RESPONSE_SCHEMA)
+                response_validator.validate(body)
             except jsonschema.ValidationError as e:
                 log.error("Malformed response: %s" % e)
             else:
-                try:
-                    state = self._response_states[body["request_id"]]
-                except KeyError:
+                with self._lock:
+                    state = self._response_states.pop(body["request_id"], None)
+
+                if state is None:
                     log.debug("Unknown request ID %s" % body["request_id"])
                 else:
-                    state.result = body
-                    state.complete.set()
+                    state.set_response(body)
             finally:
                 message.ack()
 
-        with rx_connections[_amqp_connection()].acquire(block=True) as connection:
-            # Prepare the response queue
-            with connection.Consumer(
-                queues=[
-                    kombu.messaging.Queue(
-                        self._response_routing_key,
-                        _amqp_exchange(),
-                        routing_key=self._response_routing_key,
-                        auto_delete=True,
-                        durable=False,
-                    )
-                ],
-                callbacks=[callback],
-            ):
-
-                self._started.set()
-                while not self._stopping:
-                    try:
-                        connection.drain_events(timeout=1)
-                    except socket.timeout:
-                        pass
-                    except IOError as e:
-                        #  See HYD-2551
-                        if e.errno != errno.EINTR:
-                            # if not [Errno 4] Interrupted system call
-                            raise
-
-                    self._age_response_states()
+        with self._connections[_amqp_connection()].acquire(block=True) as connection:
+            try:
+                # Prepare the response queue
+                with connection.Consumer(
+                    queues=[
+                        kombu.messaging.Queue(
+                            self.response_routing_key,
+                            _amqp_exchange(),
+                            routing_key=self.response_routing_key,
+                            auto_delete=True,
+                            durable=False,
+                        )
+                    ],
+                    callbacks=[callback],
+                ):
 
-        log.debug("%s stopped" % self.__class__.__name__)
+                    self._started.set()
+                    while not self._stopping:
+                        try:
+                            connection.drain_events(timeout=1)
+                        except socket.timeout:
+                            pass
+                        except IOError as e:
+                            #  See HYD-2551
+                            if e.errno != errno.EINTR:
+                                # if not [Errno 4] Interrupted system call
+                                raise
+
+                        self._age_response_states()
+            except Exception:
+                # Don't hand a broken connection back to the pool: closed, it reconnects when next used
+                connection.close()
+                raise
 
     def stop(self):
         log.debug("%s stopping" % self.__class__.__name__)
@@ -323,31 +510,17 @@ class RpcClientResponseHandler(threading.Thread):
 class RpcClient(object):
     """
     One instance of this is created for each named RPC service
-    that this process calls into.
+    that this process calls into.  Responses are received by the
+    process-wide RpcClientResponseHandler, so any number of calls
+    may be in flight at once.
 
     """
 
-    def __init__(self, service_name, lightweight=False):
+    def __init__(self, service_name, response_handler, connections):
         self._service_name = service_name
         self._request_routing_key = "%s.requests" % self._service_name
-        self._lightweight = lightweight
-        if not self._lightweight:
-            self._response_routing_key = "%s.responses_%s_%s" % (self._service_name, os.uname()[1], os.getpid())
-            self.response_thread = RpcClientResponseHandler(self._response_routing_key)
-            self.response_thread.start()
-            self.response_thread.wait_for_start()
-
-    def stop(self):
-        if not self._lightweight:
-            self.response_thread.stop()
-
-    def join(self):
-        if not self._lightweight:
-            self.response_thread.join()
-
-    def timeout_all(self):
-        if not self._lightweight:
-            self.response_thread.timeout_all()
+        self._response_handler = response_handler
+        self._connections = connections
 
     def _send(self, connection, request):
         """
@@ -356,7 +529,7 @@ class RpcClient(object):
         """
         dbutils.exit_if_in_transaction(log)
         log.debug("send %s" % request["request_id"])
-        request["response_routing_key"] = self._response_routing_key
+        request["response_routing_key"] = self._response_handler.response_routing_key
 
         def errback(exc, _):
             log.info("RabbitMQ rpc got a temporary error. May retry. Error: %r", exc, exc_info=1)
@@ -374,66 +547,25 @@ class RpcClient(object):
                 retry_policy=retry_policy,
             )
 
-    def call(self, request, rpc_timeout=RESPONSE_TIMEOUT):
+    def call_async(self, request, rpc_timeout=RESPONSE_TIMEOUT, unwrap=None):
+        """Send a request without waiting for the response.
+
+        :return: An RpcFuture for the response
+        """
         request_id = request["request_id"]
 
-        if not self._lightweight:
-            self.response_thread.start_wait(request_id, rpc_timeout)
-            with tx_connections[_amqp_connection()].acquire(block=True) as connection:
+        future = self._response_handler.start_wait(request_id, rpc_timeout, unwrap)
+        try:
+            with self._connections[_amqp_connection()].acquire(block=True) as connection:
                 self._send(connection, request)
-            return self.response_thread.complete_wait(request_id)
-        else:
-            self._response_routing_key = "%s.responses_%s_%s_%s" % (
-                self._service_name,
-                os.uname()[1],
-                os.getpid(),
-                request_id,
-            )
-            self._complete = False
-
-            def callback(body, message):
-                # log.debug(body)
-                try:
-                    jsonschema.validate(body, RESPONSE_SCHEMA)
-                except jsonschema.ValidationError as e:
-                    log.debug("Malformed response: %s" % e)
-                else:
-                    self._result = body
-                    self._complete = True
-                finally:
-                    message.ack()
+        except Exception:
+            self._response_handler.discard(request_id)
+            raise
 
-            with lw_connections[_amqp_connection()].acquire(block=True) as connection:
-                with connection.Consumer(
-                    queues=[
-                        kombu.messaging.Queue(
-                            self._response_routing_key,
-                            _amqp_exchange(),
-                            routing_key=self._response_routing_key,
-                            auto_delete=True,
-                            durable=False,
-                        )
-                    ],
-                    callbacks=[callback],
-                ):
-
-                    self._send(connection, request)
+        return future
 
-                    timeout_at = time.time() + rpc_timeout
-                    while not self._complete:
-                        try:
-                            connection.drain_events(timeout=1)
-                        except socket.timeout:
-                            pass
-                        except IOError as e:
-                            #  See HYD-2551
-                            if e.errno != errno.EINTR:
-                                # if not [Errno 4] Interrupted system call
-                                raise
-                        if time.time() > timeout_at:
-                            raise RpcTimeout()
-
-                    return self._result
+    def call(self, request, rpc_timeout=RESPONSE_TIMEOUT):
+        return self.call_async(request, rpc_timeout).result()
 
 
 class RpcClientFactory(object):
@@ -441,24 +573,22 @@ class RpcClientFactory(object):
     Provide sending and receiving AMQP RPC messages on behalf of
     all concurrent operations within a process.
 
-    This class creates and destroys RpcClient instances
-    for each RPC service that this process makes calls to.
+    This class creates RpcClient instances for each RPC service that this
+    process makes calls to.  Responses to all of them arrive on a single
+    per-process queue, consumed by one RpcClientResponseHandler thread which
+    is started on first use, so no queues are declared per call and any
+    number of RPCs may be in flight at once.
 
     This class operates either in a 'lightweight' mode or
     in a multi-threaded mode depending on whether `initialize_threads`
     is called.
 
-    Lightweight mode does not spawn any additional threads to handle
-    RPC responses, but has the overhead of creating separate AMQP connections
-    for each concurrent RPC, and creating a separate response queue for each
-    call.  This is for use in WSGI handlers performing comparatively rare
-    operations (things that happen when a user clicks a button).
-
-    Threaded mode spawns a response handler thread for each named RPC
-    service that the calling process interacts with.  This reduces the number
-    of queues and connections to one per service rather than one per call.  This
-    is for use when issuing large numbers of concurrent RPCs, such as when
-    performing a 1-per-server set of calls between backend processes.
+    Lightweight mode is for use in WSGI handlers: the response handler
+    runs as a daemon thread (a greenlet under gevent) which doesn't need
+    shutting down, and is restarted in the child if the process forks.
+
+    Threaded mode is for backend processes, which call `shutdown_threads`
+    to stop the response handler and fail any outstanding RPCs.
     """
 
     _instances = {}
@@ -468,12 +598,14 @@ class RpcClientFactory(object):
     _lightweight = True
     _lightweight_initialized = False
 
+    _response_handler = None
+    _response_handler_pid = None
+
     @classmethod
     def initialize_threads(cls):
         """Set up for multi-threaded operation.  Calling this turns off
-        'lightweight' mode, and causes the rpc module to use multiple
-        threads when issuing RPCs.  If this is not called, then no
-        extra threads are started when issuing RPCs
+        'lightweight' mode, so that the response handler thread must be
+        stopped with `shutdown_threads`.
 
         """
 
@@ -496,37 +628,68 @@ class RpcClientFactory(object):
         """Join any threads created.  Only necessary if `initialize` was called"""
         assert not cls._lightweight
         with cls._factory_lock:
-            for instance in cls._instances.values():
-                instance.stop()
-            for instance in cls._instances.values():
-                instance.join()
-            for instance in cls._instances.values():
-                instance.timeout_all()
+            if cls._response_handler is not None:
+                cls._response_handler.stop()
+                cls._response_handler.join()
+                cls._response_handler.timeout_all()
 
             cls._available = False
 
     @classmethod
-    def get_client(cls, queue_name):
+    def _get_response_handler(cls, connections, start_timeout):
+        # Caller holds _factory_lock
+        if (
+            cls._response_handler is None
+            or cls._response_handler_pid != os.getpid()
+            or not cls._response_handler.is_alive()
+        ):
+            response_routing_key = "rpc.responses_%s_%s" % (os.uname()[1], os.getpid())
+            log.debug("Starting response handler on %s" % response_routing_key)
+
+            handler = RpcClientResponseHandler(response_routing_key, connections)
+            handler.daemon = cls._lightweight
+            handler.start()
+            if not handler.wait_for_start(start_timeout):
+                # Don't hold up every caller while the broker is unreachable: give up, and let
+                # the next call start a new handler
+                handler.stop()
+                raise RpcTimeout("Response handler did not start within %ss" % start_timeout)
+
+            cls._response_handler = handler
+            cls._response_handler_pid = os.getpid()
+            cls._instances = {}
+
+        return cls._response_handler
+
+    @classmethod
+    def get_client(cls, queue_name, rpc_timeout=RESPONSE_TIMEOUT):
         if cls._lightweight:
             if not cls._lightweight_initialized:
                 # connections.limit = LIGHTWEIGHT_CONNECTIONS_LIMIT
                 global lw_connections
                 lw_connections = kombu.pools.Connections(limit=LIGHTWEIGHT_CONNECTIONS_LIMIT)
+                cls._factory_lock = threading.Lock()
                 cls._lightweight_initialized = True
-            return RpcClient(queue_name, lightweight=True)
+            connections = lw_connections
         else:
-            with cls._factory_lock:
-                if not cls._available:
-                    raise RuntimeError("Attempted to acquire %s instance after shutdown" % cls.__name__)
+            connections = tx_connections
 
-                try:
-                    instance = cls._instances[queue_name]
-                except KeyError:
-                    log.debug("Instantiating RpcWaiter for %s" % queue_name)
-                    instance = RpcClient(queue_name)
-                    cls._instances[queue_name] = instance
+        with cls._factory_lock:
+            if not cls._available:
+                raise RuntimeError("Attempted to acquire %s instance after shutdown" % cls.__name__)
+
+            response_handler = cls._get_response_handler(
+                connections if cls._lightweight else rx_connections, rpc_timeout
+            )
 
-            return instance
+            try:
+                instance = cls._instances[queue_name]
+            except KeyError:
+                log.debug("Instantiating RpcClient for %s" % queue_name)
+                instance = RpcClient(queue_name, response_handler, connections)
+                cls._instances[queue_name] = instance
+
+        return instance
 
 
 class ServiceRpcInterface(object):
@@ -548,14 +711,37 @@ class ServiceRpcInterface(object):
         server = FooRpc(Foo())
         server.run()
 
+    Incoming calls are run by a pool of worker threads.  To stop one method from
+    occupying the whole pool, cap its concurrency with the `method_limits` class
+    attribute, e.g. `method_limits = {'functionality': 2}`.
+
     To invoke this method from another process:
 
     ::
 
         FooRpc().functionality()
 
+    Calls may also be issued without waiting for the response: `call_async`
+    returns a future, and `call_many` issues several calls at once and waits
+    for them all:
+
+    ::
+
+        future = FooRpc().call_async('functionality')
+        result = future.result()
+
+        results = FooRpc().call_many([('functionality', [], {}), ('functionality', [], {})])
+
+    Every interface also has a `get_rpc_stats` method, served by its RpcServer rather
+    than the wrapped object, returning the worker pool's counters (see RpcWorkerPool.stats).
+
     """
 
+    method_limits = {}
+
+    # Methods served by the RpcServer itself, on every interface
+    builtin_methods = ["get_rpc_stats"]
+
     def __init__(self, wrapped=None):
         self.worker = None
         self.wrapped = wrapped
@@ -567,12 +753,23 @@ class ServiceRpcInterface(object):
                 getattr(wrapped, method)
 
     def __getattr__(self, name):
-        if name in self.methods:
+        if name in self.methods or name in self.builtin_methods:
             return lambda *args, **kwargs: self._call(name, *args, **kwargs)
         else:
             raise AttributeError(name)
 
     def _call(self, fn_name, *args, **kwargs):
+        return self.call_async(fn_name, *args, **kwargs).result()
+
+    def call_async(self, fn_name, *args, **kwargs):
+        """Start an RPC without waiting for its response.
+
+        :return: An RpcFuture, whose result() returns the return value of the
+                 call or raises RpcError if the call raised an exception.
+        """
+        if fn_name not in self.methods and fn_name not in self.builtin_methods:
+            raise AttributeError(fn_name)
+
         # If the caller specified rcp_timeout then fetch it from the args and remove.
         rpc_timeout = kwargs.pop("rpc_timeout", RESPONSE_TIMEOUT)
 
@@ -582,10 +779,22 @@ class ServiceRpcInterface(object):
         log.debug("Starting rpc: %s, id: %s " % (fn_name, request_id))
         log.debug("_call: %s %s %s %s" % (request_id, fn_name, args, kwargs))
 
-        rpc_client = RpcClientFactory.get_client(self.__class__.__name__)
+        rpc_client = RpcClientFactory.get_client(self.__class__.__name__, rpc_timeout)
+
+        return rpc_client.call_async(request, rpc_timeout, lambda result: self._unwrap(fn_name, request_id, result))
 
-        result = rpc_client.call(request, rpc_timeout)
+    def call_many(self, calls, rpc_timeout=RESPONSE_TIMEOUT):
+        """Issue several RPCs at once and wait for all their responses.
 
+        :param calls: List of (method name, args, kwargs) tuples
+        :return: List of the calls' return values, in the same order
+        """
+        futures = [
+            self.call_async(fn_name, *args, rpc_timeout=rpc_timeout, **kwargs) for fn_name, args, kwargs in calls
+        ]
+        return [future.result() for future in futures]
+
+    def _unwrap(self, fn_name, request_id, result):
         if result["exception"]:
             log.error(
                 "ServiceRpcInterface._call: exception %s: %s \ttraceback: %s"
@@ -613,6 +822,9 @@ class ServiceRpcInterface(object):
 
     def _local_call(self, fn_name, *args, **kwargs):
         log.debug("_local_call: %s %s %s" % (fn_name, args, kwargs))
+        if fn_name == "get_rpc_stats":
+            return self.worker.stats()
+
         assert fn_name in self.methods
         fn = getattr(self.wrapped, fn_name)
         return fn(*args, **kwargs)
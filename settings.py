@@ -249,6 +249,15 @@ PLUGIN_DEFAULT_UPDATE_PERIOD = 5
 
 SQL_RETRY_PERIOD = 10
 
+# Notifications to the job_scheduler arriving within this window are coalesced
+# per object and applied together.  Set to 0 to apply each one as it arrives.
+NOTIFICATION_BATCH_WINDOW = float(os.getenv("NOTIFICATION_BATCH_WINDOW", 0.25))
+
+# Incoming RPCs to each service are run by a pool of this many worker threads, with
+# up to RPC_QUEUE_DEPTH requests waiting for a worker before the consumer blocks.
+RPC_WORKER_THREADS = int(os.getenv("RPC_WORKER_THREADS", 8))
+RPC_QUEUE_DEPTH = int(os.getenv("RPC_QUEUE_DEPTH", 64))
+
 # Note: overriding the LUSTRE_MKFS_* settings will squash
 # our own use of -I and -J for inode/journal size, so you
 # must specify *all* the options you want, not just the ones
@@ -333,6 +342,11 @@ NTP_SERVER_HOSTNAME = os.getenv("NTP_SERVER_HOSTNAME", None)
 # check if clocks are 'reasonably' in sync
 AGENT_CLOCK_TOLERANCE = 20
 
+# Limits on the messages sent to an agent in one long-poll response: any
+# further messages stay queued for the agent's next GET.
+AGENT_MESSAGES_PER_RESPONSE = int(os.getenv("AGENT_MESSAGES_PER_RESPONSE", 1000))
+AGENT_BYTES_PER_RESPONSE = int(os.getenv("AGENT_BYTES_PER_RESPONSE", 1024 * 1024))
+
 # Set to False to require logins even for read-only access
 # to chroma_api
 ALLOW_ANONYMOUS_READ = True
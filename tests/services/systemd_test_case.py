@@ -60,6 +60,7 @@ class SystemdTestCase(TestCase):
             RpcClientFactory._lightweight = True
             RpcClientFactory._available = True
             RpcClientFactory._instances = {}
+            RpcClientFactory._response_handler = None
 
         for service in self.SERVICES:
             log.info("Stopping service '%s'" % service)
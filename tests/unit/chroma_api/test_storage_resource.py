@@ -1,3 +1,6 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from tests.unit.chroma_api.chroma_api_test_case import ChromaApiTestCase
 from tests.unit.chroma_core.lib.storage_plugin.helper import load_plugins
 
@@ -20,7 +23,7 @@ class TestStorageResourceResource(ChromaApiTestCase):
 
         StorageResourceResource._meta.queryset = StorageResourceRecord.objects.filter(
             resource_class__id__in=filter_class_ids()
-        )
+        ).select_related("resource_class__storage_plugin")
 
     def tearDown(self):
         import chroma_core
@@ -62,3 +65,33 @@ class TestStorageResourceResource(ChromaApiTestCase):
             # Check that the alias is still the last valid one we set
             response = self.api_client.get(resource["resource_uri"])
             self.assertEqual(self.deserialize(response)["alias"], valid_alias)
+
+    def _create_resources(self, count):
+        for i in range(count):
+            response = self.api_client.post(
+                "/api/storage_resource/",
+                data={
+                    "plugin_name": "loadable_plugin",
+                    "class_name": "TestScannableResource",
+                    "attrs": {"name": "foobar%s" % i},
+                },
+            )
+            self.assertHttpCreated(response)
+
+    def _list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.get("/api/storage_resource/", data={"limit": 0})
+        self.assertHttpOK(response)
+        return len(self.deserialize(response)["objects"]), len(queries)
+
+    def test_list_query_count(self):
+        """Check that the resources of a page of records are hydrated together, not once per field"""
+        self._create_resources(5)
+        small_count, small_queries = self._list_query_count()
+        self._create_resources(5)
+        large_count, large_queries = self._list_query_count()
+
+        self.assertEqual((small_count, large_count), (5, 10))
+
+        # What remains per resource are its alerts and propagated alerts
+        self.assertLessEqual(large_queries - small_queries, 5 * 2)
@@ -1,5 +1,6 @@
 from django.db.models.query_utils import Q
 
+from chroma_core.lib.storage_plugin.base_resource import BaseStorageResource
 from chroma_core.models.storage_plugin import StorageResourceRecord
 from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
 
@@ -53,3 +54,52 @@ class TestEdgeIndex(ResourceManagerTestCase):
         index.populate()
         self.assertEqual(index.get_parents(controller_record.pk), [resource_record.pk])
         self.assertEqual(index.get_children(resource_record.pk), [controller_record.pk])
+
+    def test_ancestry(self):
+        from chroma_core.services.plugin_runner.resource_manager import EdgeIndex
+
+        # A diamond: 1 has parents 2 and 3, which both have parent 4, which has parent 5
+        index = EdgeIndex()
+        for child, parent in [(1, 2), (1, 3), (2, 4), (3, 4), (4, 5)]:
+            index.add_parent(child, parent)
+
+        self.assertEqual(index.get_ancestors([1]), {2: 1, 3: 1, 4: 2, 5: 3})
+        self.assertEqual(index.get_ancestors([1, 4]), {2: 1, 3: 1, 4: 2, 5: 1})
+        self.assertEqual(index.get_descendents([5]), {4: 1, 2: 2, 3: 2, 1: 3})
+        self.assertEqual(index.get_descendents([1]), {})
+        self.assertEqual(index.get_descendents([5], expand=lambda n: n != 4), {4: 1})
+
+    def test_record_ancestry(self):
+        resource_record, couplet_resource = self._make_global_resource(
+            "example_plugin", "Couplet", {"address_1": "foo", "address_2": "bar"}
+        )
+        controller_resource = self._make_local_resource(
+            "example_plugin", "Controller", index=0, parents=[couplet_resource]
+        )
+        drive_resource = self._make_local_resource(
+            "example_plugin", "HardDrive", serial_number="foo", capacity=1024, parents=[controller_resource]
+        )
+
+        self.resource_manager.session_open(
+            self.plugin, resource_record.pk, [couplet_resource, controller_resource, drive_resource], 60
+        )
+        session = self.resource_manager._sessions[resource_record.pk]
+        controller_pk = session.local_id_to_global_id[controller_resource._handle]
+        drive_pk = session.local_id_to_global_id[drive_resource._handle]
+
+        self.assertEqual(StorageResourceRecord.ancestry([drive_pk]), {controller_pk: 1, resource_record.pk: 2})
+        self.assertEqual(
+            StorageResourceRecord.ancestry([drive_pk]), self.resource_manager._edges.get_ancestors([drive_pk])
+        )
+
+        class_index = self.resource_manager._class_index
+        controller_class, drive_class = class_index.get(controller_pk), class_index.get(drive_pk)
+        self.assertEqual(self.resource_manager._record_find_ancestor(drive_pk, controller_class), controller_pk)
+        self.assertEqual(
+            self.resource_manager._record_find_ancestors(drive_pk, BaseStorageResource),
+            [drive_pk, controller_pk, resource_record.pk],
+        )
+        self.assertEqual(self.resource_manager._record_find_descendent(resource_record.pk, drive_class), drive_pk)
+        self.assertEqual(
+            self.resource_manager._record_find_descendent(resource_record.pk, drive_class, controller_class), None
+        )
@@ -0,0 +1,89 @@
+import threading
+
+import mock
+
+from chroma_core.lib.util import LatencyHistogram
+from tests.unit.chroma_core.lib.storage_plugin.resource_manager.test_resource_manager import ResourceManagerTestCase
+
+
+class TestLocking(ResourceManagerTestCase):
+    def _in_thread(self, fn):
+        thread = threading.Thread(target=fn)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_scopes_concurrent(self):
+        entered = threading.Event()
+
+        def other_scope():
+            with self.resource_manager._scope("session_update_resource", 2):
+                entered.set()
+
+        with self.resource_manager._scope("session_update_resource", 1):
+            self._in_thread(other_scope).join(5)
+            self.assertTrue(entered.is_set())
+
+    def test_exclusive_waits_for_scopes(self):
+        entered = threading.Event()
+
+        def exclusive():
+            with self.resource_manager._exclusive("session_open"):
+                entered.set()
+
+        with self.resource_manager._scope("session_update_resource", 1):
+            thread = self._in_thread(exclusive)
+            self.assertFalse(entered.wait(0.2))
+
+        thread.join(5)
+        self.assertTrue(entered.is_set())
+
+        stats = self.resource_manager.lock_wait_stats()
+        self.assertEqual(stats["session_open"]["count"], 1)
+        self.assertGreaterEqual(stats["session_open"]["max_ms"], 200)
+        self.assertEqual(stats["session_update_resource"]["count"], 1)
+
+    def test_alert_raised_once(self):
+        """A GlobalId resource reported by two scannables raises its alert once, however the
+        notifications from the two sessions interleave"""
+        for scannable_id in [1, 2]:
+            self.resource_manager._sessions[scannable_id] = mock.Mock(local_id_to_global_id={10: 5})
+
+        persisting = threading.Event()
+        release = threading.Event()
+
+        def persist_alert(record_pk, active, severity, alert_class, attribute):
+            persisting.set()
+            release.wait(5)
+            return mock.Mock(pk=1)
+
+        with mock.patch.object(self.resource_manager, "_persist_alert", side_effect=persist_alert) as persist:
+            with mock.patch.object(self.resource_manager, "_persist_alert_propagate"):
+                threads = [
+                    self._in_thread(
+                        lambda scannable_id=scannable_id: self.resource_manager.session_notify_alert(
+                            scannable_id, 10, True, 40, "TestAlert", None
+                        )
+                    )
+                    for scannable_id in [1, 2]
+                ]
+                self.assertTrue(persisting.wait(5))
+                release.set()
+                for thread in threads:
+                    thread.join(5)
+
+        self.assertEqual(persist.call_count, 1)
+        self.assertEqual(self.resource_manager._active_alerts, {(5, "TestAlert"): 1})
+
+    def test_histogram(self):
+        histogram = LatencyHistogram()
+        for seconds in [0, 0.0005, 0.003, 0.003, 100]:
+            histogram.record(seconds)
+
+        stats = histogram.to_dict()
+        self.assertEqual(stats["count"], 5)
+        self.assertEqual(stats["max_ms"], 100000)
+        buckets = dict(stats["buckets"])
+        self.assertEqual(buckets["1"], 2)
+        self.assertEqual(buckets["4"], 2)
+        self.assertEqual(buckets["+Inf"], 1)
@@ -1,4 +1,7 @@
+import os
+
 from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from chroma_core.lib.util import dbperf
 from chroma_core.models.host import Volume, VolumeNode
 from chroma_core.models.storage_plugin import StorageResourceRecord
@@ -85,3 +88,70 @@ class TestManyObjects(ResourceManagerTestCase):
         finally:
             dbperf.enabled = False
             connection.use_debug_cursor = False
+
+
+class TestManyDrives(ResourceManagerTestCase):
+    """
+    Benchmark a controller reporting many drives at session open, which should take a
+    number of queries independent of the number of drives.
+    """
+
+    DRIVE_COUNT = int(os.getenv("RESOURCE_MANAGER_BENCHMARK_DRIVES", 2000))
+
+    def setUp(self):
+        super(TestManyDrives, self).setUp("example_plugin")
+
+    def _make_resources(self, drive_count):
+        couplet_record, couplet_resource = self._make_global_resource(
+            "example_plugin", "Couplet", {"address_1": "foo%s" % drive_count, "address_2": "bar"}
+        )
+        resources = [couplet_resource] + [
+            self._make_local_resource("example_plugin", "HardDrive", serial_number="drive_%s" % n, capacity=1024)
+            for n in range(drive_count)
+        ]
+
+        return couplet_record, resources
+
+    def _session_open_queries(self, scannable_id, resources):
+        with CaptureQueriesContext(connection) as queries:
+            self.resource_manager.session_open(self.plugin, scannable_id, resources, 60)
+
+        return len(queries)
+
+    def _session_open(self, drive_count):
+        couplet_record, resources = self._make_resources(drive_count)
+
+        queries = self._session_open_queries(couplet_record.pk, resources)
+
+        self.assertEqual(StorageResourceRecord.objects.filter(storage_id_scope=couplet_record.pk).count(), drive_count)
+
+        return queries
+
+    def _cull(self, drive_count):
+        couplet_record, resources = self._make_resources(drive_count)
+        self.resource_manager.session_open(self.plugin, couplet_record.pk, resources, 60)
+
+        # Reopen the session with half of the drives gone
+        kept = resources[: drive_count / 2 + 1]
+        queries = self._session_open_queries(couplet_record.pk, kept)
+
+        self.assertEqual(
+            StorageResourceRecord.objects.filter(storage_id_scope=couplet_record.pk).count(), len(kept) - 1
+        )
+        self.assertEqual(self.resource_manager._sessions[couplet_record.pk].culled_count, drive_count - len(kept) + 1)
+
+        return queries
+
+    def test_session_open(self):
+        small_queries = self._session_open(10)
+        large_queries = self._session_open(self.DRIVE_COUNT)
+
+        # Allowing for bulk inserts being split into batches, rather than queries per drive
+        self.assertLess(large_queries, small_queries + self.DRIVE_COUNT / 100)
+
+    def test_cull(self):
+        small_queries = self._cull(10)
+        large_queries = self._cull(self.DRIVE_COUNT)
+
+        # Rather than queries per lost drive
+        self.assertLess(large_queries, small_queries + self.DRIVE_COUNT / 100)
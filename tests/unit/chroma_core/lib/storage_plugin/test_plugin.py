@@ -2,6 +2,7 @@ import types
 import sys
 
 import mock
+from unittest import TestCase
 
 from chroma_core.services.plugin_runner.resource_manager import PluginSession
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
@@ -9,6 +10,7 @@ from chroma_core.lib.storage_plugin.api import attributes
 from chroma_core.lib.storage_plugin.api import identifiers
 from chroma_core.lib.storage_plugin.api import resources
 from chroma_core.lib.storage_plugin.api.plugin import Plugin
+from chroma_core.lib.storage_plugin.base_plugin import report_section_digests, diff_report_digests, ResourceIndex
 
 
 class TestLocalResource(resources.ScannableResource):
@@ -41,6 +43,15 @@ class TestResourceStatistic(resources.ScannableResource):
     extra_info = attributes.String()
 
 
+class TestDeviceResource(resources.Resource):
+    class Meta:
+        identifier = identifiers.ScopedId("host_id", "path")
+
+    host_id = attributes.Integer()
+    path = attributes.PosixPath()
+    size = attributes.Bytes(optional=True)
+
+
 class TestPlugin(Plugin):
     _resource_classes = [TestGlobalResource, TestLocalResource, TestResourceExtraInfo, TestResourceStatistic]
 
@@ -112,6 +123,38 @@ class TestCallbacks(IMLUnitTestCase):
         self.plugin.do_periodic_update()
         self.plugin.update_scan.assert_called_once()
 
+    def test_agent_session_continue_skips_unchanged(self):
+        self.plugin.skip_unchanged_agent_reports = True
+        self.plugin.do_initial_scan()
+
+        self.plugin._root_resource = mock.Mock(host_id=1)
+        self.plugin.agent_session_continue = mock.Mock()
+
+        self.plugin.do_agent_session_continue({"devs": {"1:0": {"size": 1}, "1:1": {"size": 2}}})
+        self.plugin.do_agent_session_continue({"devs": {"1:1": {"size": 2}, "1:0": {"size": 1}}})
+        self.assertEqual(self.plugin.agent_session_continue.call_count, 1)
+
+        self.plugin.do_agent_session_continue({"devs": {"1:0": {"size": 1}, "1:1": {"size": 3}}})
+        self.assertEqual(self.plugin.agent_session_continue.call_count, 2)
+
+        self.assertEqual(self.plugin.agent_updates_applied, 2)
+        self.assertEqual(self.plugin.agent_updates_skipped, 1)
+
+    def test_agent_session_continue_never_skips_by_default(self):
+        self.plugin.do_initial_scan()
+
+        self.plugin._root_resource = mock.Mock(host_id=1)
+        self.plugin.agent_session_continue = mock.Mock()
+
+        # Plugins such as LinuxNetwork also depend on state outside the report, so must see every one
+        report = {"devs": {"1:0": {"size": 1}}}
+        self.plugin.do_agent_session_continue(report)
+        self.plugin.do_agent_session_continue(report)
+        self.assertEqual(self.plugin.agent_session_continue.call_count, 2)
+
+        self.assertEqual(self.plugin.agent_updates_applied, 2)
+        self.assertEqual(self.plugin.agent_updates_skipped, 0)
+
     def test_teardown(self):
         self.plugin.do_initial_scan()
 
@@ -310,3 +353,61 @@ class TestAddRemove(IMLUnitTestCase):
         self.resource_manager.session_update_resource.assert_called_once_with(
             self.plugin._scannable_id, self.plugin.resource._handle, {"extra_info": "bar"}
         )
+
+
+class TestReportDiff(TestCase):
+    def test_diff_report_digests(self):
+        old = report_section_digests({"devs": {"a": {"size": 1}, "b": {"size": 2}}, "vgs": {}, "local_fs": []})
+        new = report_section_digests({"devs": {"b": {"size": 3}, "c": {"size": 4}}, "vgs": {}, "local_fs": [1]})
+
+        self.assertEqual(diff_report_digests(old, old), {})
+        self.assertEqual(
+            diff_report_digests(old, new),
+            {"devs": (set(["c"]), set(["a"]), set(["b"])), "local_fs": (set(), set(), set())},
+        )
+
+
+class TestResourceIndex(TestCase):
+    def _index(self, count, host_count=4):
+        index = ResourceIndex()
+        for i in range(count):
+            resource = TestDeviceResource(host_id=i % host_count, path="/dev/disk/by-id/%s" % i)
+            resource._handle = i + 1
+            index.add(resource)
+        return index
+
+    def test_find_by_attr(self):
+        index = self._index(100)
+
+        self.assertEqual(len(list(index.find_by_attr(TestDeviceResource))), 100)
+        self.assertEqual(len(list(index.find_by_attr(TestDeviceResource, host_id=1))), 25)
+        self.assertEqual(
+            [r.path for r in index.find_by_attr(TestDeviceResource, host_id=1, path="/dev/disk/by-id/5")],
+            ["/dev/disk/by-id/5"],
+        )
+        self.assertEqual(list(index.find_by_attr(TestDeviceResource, host_id=2, path="/dev/disk/by-id/5")), [])
+        self.assertEqual(list(index.find_by_attr(TestLocalResource)), [])
+
+        # Indexes built by the searches above are maintained on add and remove
+        resource = index.get(TestDeviceResource, host_id=1, path="/dev/disk/by-id/5")
+        index.remove(resource)
+        self.assertEqual(len(list(index.find_by_attr(TestDeviceResource, host_id=1))), 24)
+        self.assertEqual(list(index.find_by_attr(TestDeviceResource, host_id=1, path="/dev/disk/by-id/5")), [])
+
+        index.add(resource)
+        self.assertEqual(len(list(index.find_by_attr(TestDeviceResource, host_id=1))), 25)
+
+    def test_find_by_attr_scaling(self):
+        """Look up every resource of an index by attribute, as plugins do on each update: each
+        lookup should only compare the resources matching it, rather than every resource indexed"""
+        RESOURCE_COUNT = 1000
+
+        index = self._index(RESOURCE_COUNT)
+        with mock.patch.object(
+            TestDeviceResource, "compare_id_tuple", wraps=TestDeviceResource.compare_id_tuple
+        ) as compare_id_tuple:
+            for i in range(RESOURCE_COUNT):
+                found = list(index.find_by_attr(TestDeviceResource, path="/dev/disk/by-id/%s" % i))
+                self.assertEqual(len(found), 1)
+
+        self.assertEqual(compare_id_tuple.call_count, RESOURCE_COUNT)
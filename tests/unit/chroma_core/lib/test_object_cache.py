@@ -0,0 +1,100 @@
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+from tests.unit.chroma_core.helpers.helper import load_default_profile
+from tests.unit.chroma_core.helpers.synthentic_objects import synthetic_host
+
+from chroma_core.lib.cache import ObjectCache
+from chroma_core.models import Corosync2Configuration, CorosyncConfiguration, LNetConfiguration, ManagedHost
+
+
+class TestObjectCacheIndex(IMLUnitTestCase):
+    def setUp(self):
+        super(TestObjectCacheIndex, self).setUp()
+
+        ObjectCache.clear()
+        self.addCleanup(ObjectCache.clear)
+
+        load_default_profile()
+        self.hosts = [synthetic_host("myserver%d" % i) for i in range(3)]
+
+    def test_index_lookup(self):
+        for host in self.hosts:
+            lnet_configuration = ObjectCache.get_one_by_index(LNetConfiguration, "host_id", host.id)
+            self.assertEqual(lnet_configuration.host_id, host.id)
+
+        self.assertEqual(ObjectCache.get_by_index(LNetConfiguration, "host_id", -1), [])
+        self.assertRaises(
+            LNetConfiguration.DoesNotExist, ObjectCache.get_one_by_index, LNetConfiguration, "host_id", -1
+        )
+
+    def test_index_follows_update_and_purge(self):
+        lnet_configuration = ObjectCache.get_one_by_index(LNetConfiguration, "host_id", self.hosts[0].id)
+
+        LNetConfiguration.objects.filter(host=self.hosts[1]).delete()
+        LNetConfiguration.objects.filter(id=lnet_configuration.id).update(host=self.hosts[1])
+        ObjectCache.update(lnet_configuration)
+
+        self.assertEqual(ObjectCache.get_by_index(LNetConfiguration, "host_id", self.hosts[0].id), [])
+        self.assertEqual(
+            [lc.id for lc in ObjectCache.get_by_index(LNetConfiguration, "host_id", self.hosts[1].id)],
+            [lnet_configuration.id],
+        )
+
+        ObjectCache.purge(LNetConfiguration, lambda lc: lc.id == lnet_configuration.id)
+        self.assertEqual(ObjectCache.get_by_index(LNetConfiguration, "host_id", self.hosts[1].id), [])
+
+    def test_get_by_id_fill_on_miss(self):
+        host = ManagedHost.objects.create(address="late", fqdn="late", nodename="late")
+
+        self.assertRaises(ManagedHost.DoesNotExist, ObjectCache.get_by_id, ManagedHost, host.id)
+        self.assertEqual(ObjectCache.get_by_id(ManagedHost, host.id, fill_on_miss=True).id, host.id)
+
+
+class TestObjectCacheRefresh(IMLUnitTestCase):
+    def setUp(self):
+        super(TestObjectCacheRefresh, self).setUp()
+
+        ObjectCache.clear()
+        self.addCleanup(ObjectCache.clear)
+
+        load_default_profile()
+        self.hosts = [synthetic_host("myserver%d" % i) for i in range(3)]
+
+        # Instances added by synthetic_host carry no version, so bring everything up to date first
+        ObjectCache.refresh()
+
+    def test_refresh_only_changed(self):
+        self.assertEqual(ObjectCache.refresh(ManagedHost), 0)
+
+        unchanged = ObjectCache.get_by_id(ManagedHost, self.hosts[0].id)
+        ManagedHost.objects.filter(id=self.hosts[1].id).update(state="lnet_up")
+        ManagedHost.objects.filter(id=self.hosts[2].id).update(not_deleted=None)
+        new = ManagedHost.objects.create(address="late", fqdn="late", nodename="late")
+
+        self.assertEqual(ObjectCache.refresh(ManagedHost), 3)
+
+        self.assertIs(ObjectCache.get_by_id(ManagedHost, self.hosts[0].id), unchanged)
+        self.assertEqual(ObjectCache.get_by_id(ManagedHost, self.hosts[1].id).state, "lnet_up")
+        self.assertRaises(ManagedHost.DoesNotExist, ObjectCache.get_by_id, ManagedHost, self.hosts[2].id)
+        self.assertEqual(ObjectCache.get_by_id(ManagedHost, new.id).id, new.id)
+
+    def test_refresh_inherited_fields(self):
+        """Updating only fields stored in the parent table of a multi-table-inheritance model is a change"""
+        host = ManagedHost.objects.create(address="corosync2", fqdn="corosync2", nodename="corosync2")
+        corosync_configuration = Corosync2Configuration.objects.create(host=host)
+        ObjectCache.refresh(Corosync2Configuration)
+        self.assertEqual(ObjectCache.refresh(Corosync2Configuration), 0)
+
+        CorosyncConfiguration.objects.filter(id=corosync_configuration.id).update(state="started")
+
+        self.assertEqual(ObjectCache.refresh(Corosync2Configuration), 1)
+        self.assertEqual(ObjectCache.get_by_id(Corosync2Configuration, corosync_configuration.id).state, "started")
+
+    def test_stats(self):
+        ObjectCache.get_by_id(ManagedHost, self.hosts[0].id)
+        self.assertRaises(ManagedHost.DoesNotExist, ObjectCache.get_by_id, ManagedHost, -1)
+        ObjectCache.update(ObjectCache.get_by_id(ManagedHost, self.hosts[1].id))
+
+        stats = ObjectCache.stats()["ManagedHost"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["refreshed"], len(self.hosts) + 1)
@@ -0,0 +1,84 @@
+import threading
+
+from unittest import TestCase
+
+from chroma_core.lib.partition_lock import PartitionLock
+
+
+class TestPartitionLock(TestCase):
+    def setUp(self):
+        super(TestPartitionLock, self).setUp()
+        self.lock = PartitionLock()
+
+    def _in_thread(self, fn):
+        thread = threading.Thread(target=fn)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_disjoint_partitions_run_concurrently(self):
+        entered_b = threading.Event()
+
+        def hold_b():
+            with self.lock.partition(lambda: "b"):
+                entered_b.set()
+
+        with self.lock.partition(lambda: "a") as key:
+            self.assertEqual(key, "a")
+            self._in_thread(hold_b).join(5)
+            self.assertTrue(entered_b.is_set())
+
+    def test_same_partition_excludes(self):
+        entered = threading.Event()
+
+        def hold_a():
+            with self.lock.partition(lambda: "a"):
+                entered.set()
+
+        with self.lock.partition(lambda: "a"):
+            thread = self._in_thread(hold_a)
+            self.assertFalse(entered.wait(0.2))
+
+        thread.join(5)
+        self.assertTrue(entered.is_set())
+
+    def test_global_excludes_partitions(self):
+        entered = threading.Event()
+
+        def hold_global():
+            with self.lock:
+                entered.set()
+
+        with self.lock.partition(lambda: "a"):
+            thread = self._in_thread(hold_global)
+            self.assertFalse(entered.wait(0.2))
+
+        thread.join(5)
+        self.assertTrue(entered.is_set())
+
+    def test_no_key_falls_back_to_global(self):
+        entered = threading.Event()
+
+        def hold_a():
+            with self.lock.partition(lambda: "a"):
+                entered.set()
+
+        with self.lock.partition(lambda: None) as key:
+            self.assertEqual(key, None)
+            thread = self._in_thread(hold_a)
+            self.assertFalse(entered.wait(0.2))
+
+        thread.join(5)
+        self.assertTrue(entered.is_set())
+
+    def test_reentrant(self):
+        with self.lock:
+            with self.lock.partition(lambda: "a") as key:
+                self.assertEqual(key, None)
+                with self.lock:
+                    pass
+
+        with self.lock.partition(lambda: "a"):
+            with self.lock.partition(lambda: "a") as key:
+                self.assertEqual(key, "a")
+            self.assertRaises(RuntimeError, self.lock.acquire)
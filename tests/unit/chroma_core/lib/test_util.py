@@ -1,40 +1,37 @@
+from chroma_core.lib.util import action_latency_stats
 from chroma_core.lib.util import invoke_rust_agent
+from chroma_core.lib.util import ObservableEvent
 from chroma_core.lib.util import RustAgentCancellation
 from chroma_core.lib.util import runningInDocker
+from chroma_core.lib.util import wait_for_event
 from django.test import TestCase
 import mock
 import threading
 
 
 @mock.patch("chroma_core.lib.util.uuid.uuid4", return_value="1-2-3-4")
-@mock.patch("chroma_core.lib.util.requests_unixsocket.post")
-@mock.patch("chroma_core.lib.util.requests.post")
+@mock.patch("chroma_core.lib.util._action_runner_session.post")
 class TestInvokeRustAgent(TestCase):
-    def test_send_action(self, post, socket_post, uuid):
+    def test_send_action(self, post, uuid):
         invoke_rust_agent("mds1.local", "ls")
 
         if runningInDocker():
-            post.assert_called_once_with(
-                "http://127.0.0.1:8009",
-                json={"REMOTE": ("mds1.local", {"action": "ls", "args": {}, "type": "ACTION_START", "id": "1-2-3-4"})},
-            )
+            url = "http://127.0.0.1:8009"
         else:
-            socket_post.assert_called_once_with(
-                "http+unix://%2Fvar%2Frun%2Fiml-action-runner.sock/",
-                json={"REMOTE": ("mds1.local", {"action": "ls", "args": {}, "type": "ACTION_START", "id": "1-2-3-4"})},
-            )
+            url = "http+unix://%2Fvar%2Frun%2Fiml-action-runner.sock/"
 
-    def test_get_data(self, post, socket_post, uuid):
-        if runningInDocker():
-            post.return_value.content = "{}"
-        else:
-            socket_post.return_value.content = "{}"
+        post.assert_called_once_with(
+            url, json={"REMOTE": ("mds1.local", {"action": "ls", "args": {}, "type": "ACTION_START", "id": "1-2-3-4"})}
+        )
+
+    def test_get_data(self, post, uuid):
+        post.return_value.content = "{}"
 
         r = invoke_rust_agent("mds1.local", "ls")
 
         self.assertEqual(r, "{}")
 
-    def test_cancel(self, post, socket_post, uuid):
+    def test_cancel(self, post, uuid):
         trigger = threading.Event()
 
         trigger.set()
@@ -42,11 +39,87 @@ class TestInvokeRustAgent(TestCase):
         with self.assertRaises(RustAgentCancellation):
             invoke_rust_agent("mds1.local", "ls", {}, trigger)
 
-    def test_error_raises(self, post, socket_post, uuid):
-        if runningInDocker():
-            post.side_effect = Exception("ruh-roh")
-        else:
-            socket_post.side_effect = Exception("ruh-roh")
+    def test_error_raises(self, post, uuid):
+        post.side_effect = Exception("ruh-roh")
 
         with self.assertRaises(Exception):
             invoke_rust_agent("mds1.local", "ls")
+
+    def test_observable_cancel(self, post, uuid):
+        """A cancellation sends ACTION_CANCEL, which completes the ACTION_START request"""
+        started = threading.Event()
+        completed = threading.Event()
+
+        def fake_post(url, json):
+            action = json["REMOTE"][1]
+            if action["type"] == "ACTION_START":
+                started.set()
+                completed.wait(5)
+            else:
+                completed.set()
+            return mock.Mock(content="null")
+
+        post.side_effect = fake_post
+        cancel_event = ObservableEvent()
+        cancel_timer = threading.Timer(0.1, cancel_event.set)
+        cancel_timer.start()
+
+        with self.assertRaises(RustAgentCancellation):
+            invoke_rust_agent("mds1.local", "ls", {}, cancel_event)
+
+        cancel_timer.join()
+        self.assertTrue(started.is_set())
+        self.assertTrue(completed.is_set())
+        self.assertEqual(
+            [call[1]["json"]["REMOTE"][1]["type"] for call in post.call_args_list], ["ACTION_START", "ACTION_CANCEL"]
+        )
+
+    def test_observable_already_cancelled(self, post, uuid):
+        cancel_event = ObservableEvent()
+        cancel_event.set()
+
+        with self.assertRaises(RustAgentCancellation):
+            invoke_rust_agent("mds1.local", "ls", {}, cancel_event)
+
+        self.assertFalse(post.called)
+
+    def test_latency_stats(self, post, uuid):
+        post.return_value.content = "{}"
+
+        invoke_rust_agent("mds1.local", "latency_test", {}, ObservableEvent())
+
+        self.assertEqual(action_latency_stats()["latency_test"]["count"], 1)
+
+
+class TestWaitForEvent(TestCase):
+    def test_event_set(self):
+        event = ObservableEvent()
+        cancel_event = ObservableEvent()
+        threading.Timer(0.1, event.set).start()
+
+        self.assertTrue(wait_for_event(event, cancel_event))
+        self.assertEqual(event._subscribers, [])
+        self.assertEqual(cancel_event._subscribers, [])
+
+    def test_cancel_event_set(self):
+        event = ObservableEvent()
+        cancel_event = ObservableEvent()
+        threading.Timer(0.1, cancel_event.set).start()
+
+        self.assertFalse(wait_for_event(event, cancel_event))
+
+    def test_plain_events(self):
+        event = threading.Event()
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        self.assertFalse(wait_for_event(event, cancel_event))
+
+    def test_subscribe_when_set(self):
+        event = ObservableEvent()
+        event.set()
+        called = []
+
+        event.subscribe(lambda: called.append(True))
+
+        self.assertEqual(called, [True])
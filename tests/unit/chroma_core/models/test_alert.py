@@ -1,8 +1,15 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
 from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
 
 from chroma_core.models import CommandRunningAlert
 from chroma_core.models import CommandCancelledAlert
 from chroma_core.models import AlertState
+from chroma_core.models import AlertEvent
+from chroma_core.models import HostContactAlert
 
 
 class TestAlert(IMLUnitTestCase):
@@ -24,3 +31,58 @@ class TestAlert(IMLUnitTestCase):
         alerts = AlertState.objects.all()
         self.assertEqual(len(alerts), 1)
         self.assertEqual(alerts[0].message(), "Command Houston we have a problem cancelled")
+
+
+class TestNotifyMany(IMLUnitTestCase):
+    HOST_COUNT = 20
+
+    def setUp(self):
+        super(TestNotifyMany, self).setUp()
+
+        load_default_profile()
+        self.hosts = [synthetic_host() for _ in range(self.HOST_COUNT)]
+
+    def _active_host_ids(self):
+        return set(HostContactAlert.objects.filter(active=True).values_list("alert_item_id", flat=True))
+
+    def test_raise_and_lower(self):
+        # An alert already raised individually is found rather than raised again
+        existing = HostContactAlert.notify(self.hosts[0], True)
+
+        with CaptureQueriesContext(connection) as queries:
+            alerts = HostContactAlert.notify_many([(host, True, {}) for host in self.hosts])
+
+        # Independent of the number of hosts: finding the active alerts and one insert
+        self.assertLessEqual(len(queries), 5)
+        self.assertEqual(alerts[0], existing)
+        self.assertEqual(self._active_host_ids(), set(host.id for host in self.hosts))
+        self.assertEqual(alerts[1].message(), "Lost contact with host %s" % self.hosts[1])
+
+        # Raising again is a no-op
+        HostContactAlert.notify_many([(host, True, {}) for host in self.hosts])
+        self.assertEqual(HostContactAlert.objects.count(), self.HOST_COUNT)
+
+        lowered = HostContactAlert.notify_many([(host, False, {}) for host in self.hosts[: self.HOST_COUNT // 2]])
+        self.assertEqual(set(alert.id for alert in lowered), set(alert.id for alert in alerts[: self.HOST_COUNT // 2]))
+        self.assertEqual(self._active_host_ids(), set(host.id for host in self.hosts[self.HOST_COUNT // 2 :]))
+        for alert in HostContactAlert.objects.filter(active=None):
+            self.assertIsNotNone(alert.end)
+
+        # End events, as low() would emit
+        events = AlertEvent.objects.all()
+        self.assertEqual(len(events), self.HOST_COUNT // 2)
+        for event in events:
+            self.assertEqual(event.active, None)
+            self.assertEqual(event.end, event.begin)
+            self.assertIn(event.alert.id, [alert.id for alert in lowered])
+
+        # Lowering an alert which isn't raised does nothing
+        self.assertEqual(HostContactAlert.notify_many([(self.hosts[0], False, {})]), [None])
+
+    def test_raise_then_lower(self):
+        alerts = HostContactAlert.notify_many([(self.hosts[0], True, {}), (self.hosts[0], False, {})])
+
+        self.assertEqual(alerts[0], alerts[1])
+        self.assertEqual(self._active_host_ids(), set())
+        self.assertEqual(HostContactAlert.objects.get().id, alerts[0].id)
+        self.assertEqual(AlertEvent.objects.get().alert.id, alerts[0].id)
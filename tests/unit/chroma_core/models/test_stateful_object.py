@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from chroma_core.lib.util import all_subclasses
+from chroma_core.models import StatefulObject, LNetConfiguration
+
+
+class TestStatefulObjectMaps(TestCase):
+    def _stateful_classes(self):
+        StatefulObject.build_all_maps()
+        return [
+            StatefulObject.so_root(klass)
+            for klass in all_subclasses(StatefulObject)
+            if klass.states is not None and not klass._meta.abstract
+        ]
+
+    def test_routes_are_shortest(self):
+        for klass in set(self._stateful_classes()):
+            # Distances between states from the transitions alone
+            distance = dict(((a, b), 1) for (a, b) in klass.job_class_map.keys())
+            states = set(state for pair in klass.job_class_map.keys() for state in pair)
+            for via in states:
+                for a in states:
+                    for b in states:
+                        if (a, via) in distance and (via, b) in distance:
+                            through = distance[(a, via)] + distance[(via, b)]
+                            if through < distance.get((a, b), through + 1):
+                                distance[(a, b)] = through
+
+            for (begin_state, end_state), route in klass.route_map.items():
+                self.assertEqual(route[0], begin_state)
+                self.assertEqual(route[-1], end_state)
+                for step in zip(route, route[1:]):
+                    self.assertIn(step, klass.job_class_map)
+                if begin_state != end_state:
+                    self.assertEqual(len(route) - 1, distance[(begin_state, end_state)], (klass, route))
+
+            for begin_state in klass.states:
+                reachable = set(
+                    b for (a, b) in distance.keys() if a == begin_state and (b != a or (a, a) in klass.job_class_map)
+                )
+                self.assertEqual(set(klass.transition_map[begin_state]), reachable, (klass, begin_state))
+
+    def test_multi_step_route(self):
+        self.assertEqual(
+            LNetConfiguration.get_route("unconfigured", "lnet_up"),
+            ("unconfigured", "lnet_unloaded", "lnet_down", "lnet_up"),
+        )
@@ -128,6 +128,23 @@ class TestAvailableTransitions(IMLUnitTestCase):
         received_transitions = [t["state"] for t in self._get_transition_states(self.host)]
         self.assertEqual(set(received_transitions), set(expected_transitions))
 
+    def test_many_objects(self):
+        """Test that objects of several types and missing objects are reported together"""
+
+        mgs = ManagedMgs.objects.create()
+        fs = ManagedFilesystem.objects.create(name="mgsfs", mgs=mgs)
+        fs_ct_id = ContentType.objects.get_for_model(fs).id
+        host_ct_id = ContentType.objects.get_for_model(self.host).id
+
+        object_list = [(fs_ct_id, fs.id), (host_ct_id, self.host.id), (host_ct_id, self.host.id + 1000)]
+        received = self.js.available_transitions(object_list)
+
+        self.assertEqual(
+            set(t["state"] for t in received["{}:{}".format(fs_ct_id, fs.id)]), set(["available", "forgotten"])
+        )
+        self.assertEqual(set(t["state"] for t in received["{}:{}".format(host_ct_id, self.host.id)]), set(["removed"]))
+        self.assertEqual(received["{}:{}".format(host_ct_id, self.host.id + 1000)], [])
+
     def test_lnet_configuration(self):
         """Test the lnet_configuration possible states are correct."""
 
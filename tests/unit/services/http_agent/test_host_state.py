@@ -0,0 +1,78 @@
+import mock
+from unittest import TestCase
+
+from chroma_core.services.http_agent.host_state import HostStateCollection, HostStatePoller
+
+
+class TestHostStateCollection(TestCase):
+    def setUp(self):
+        super(TestHostStateCollection, self).setUp()
+
+        mock.patch("chroma_core.services.http_agent.host_state.ManagedHost").start()
+        self.alert = mock.patch("chroma_core.services.http_agent.host_state.HostContactAlert").start()
+        mock.patch("chroma_core.services.http_agent.host_state.transaction").start()
+        self.time = mock.patch("chroma_core.services.http_agent.host_state.time").start()
+        self.time.time.return_value = 1000.0
+        self.addCleanup(mock.patch.stopall)
+
+        self.hosts = HostStateCollection()
+        self.timeout = 60
+        mock.patch("chroma_core.services.http_agent.host_state.HostState.CONTACT_TIMEOUT", self.timeout).start()
+
+    def _expired_fqdns(self):
+        return sorted(state.fqdn for state in self.hosts.pop_expired())
+
+    def test_expiry_order(self):
+        self.hosts.update("a")
+        self.time.time.return_value += 10
+        self.hosts.update("b")
+
+        self.assertEqual(self.hosts.time_to_next_deadline(), self.timeout - 10)
+
+        self.time.time.return_value += self.timeout - 10
+        self.assertEqual(self._expired_fqdns(), ["a"])
+        self.time.time.return_value += 10
+        self.assertEqual(self._expired_fqdns(), ["b"])
+        self.assertEqual(self.hosts.time_to_next_deadline(), None)
+
+    def test_contact_postpones_expiry(self):
+        self.hosts.update("a")
+        self.time.time.return_value += self.timeout - 1
+        self.hosts.update("a")
+
+        # Still a single entry for the host, rescheduled when its first deadline passes
+        self.assertEqual(len(self.hosts._deadlines), 1)
+        self.time.time.return_value += 1
+        self.assertEqual(self._expired_fqdns(), [])
+        self.assertEqual(len(self.hosts._deadlines), 1)
+
+        self.time.time.return_value += self.timeout
+        self.assertEqual(self._expired_fqdns(), ["a"])
+
+    def test_removed_host_not_expired(self):
+        self.hosts.update("a")
+        self.hosts.remove_host("a")
+
+        self.time.time.return_value += self.timeout
+        self.assertEqual(self._expired_fqdns(), [])
+
+    def test_poller_expires_once(self):
+        sessions = mock.Mock()
+        poller = HostStatePoller(self.hosts, sessions)
+        self.hosts.update("a")
+        self.hosts.update("b")
+        self.alert.notify.reset_mock()
+
+        self.time.time.return_value += self.timeout
+        poller._expire(self.hosts.pop_expired())
+
+        # Both alerts raised together
+        self.assertEqual(self.alert.notify.call_count, 0)
+        self.assertEqual(self.alert.notify_many.call_count, 1)
+        self.assertEqual(len(self.alert.notify_many.call_args[0][0]), 2)
+        self.assertEqual(sorted(c[0][0] for c in sessions.reset_fqdn_sessions.call_args_list), ["a", "b"])
+
+        # Nothing further until the hosts are heard from again
+        self.time.time.return_value += self.timeout
+        poller._expire(self.hosts.pop_expired())
+        self.assertEqual(self.alert.notify_many.call_count, 1)
@@ -0,0 +1,146 @@
+import json
+
+import mock
+from django.test import RequestFactory
+from unittest import TestCase
+
+from chroma_agent_comms.views import MessageView
+from chroma_core.services.http_agent.queues import HostQueueCollection
+
+
+class TestMessageViewGet(TestCase):
+    FQDN = "myserver.mycompany.com"
+    SERIAL = "0123456789"
+    CLIENT_START_TIME = "2020-01-01T00:00:00+00:00"
+
+    def setUp(self):
+        super(TestMessageViewGet, self).setUp()
+
+        self.queues = HostQueueCollection()
+        sessions = mock.Mock()
+        sessions.get.return_value.id = "session"
+        hosts = mock.Mock()
+        hosts.update.return_value = False
+
+        for name, value in [
+            ("queues", self.queues),
+            ("sessions", sessions),
+            ("hosts", hosts),
+            ("valid_certs", {self.SERIAL: self.FQDN}),
+        ]:
+            patcher = mock.patch.object(MessageView, name, value, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self):
+        request = RequestFactory().get(
+            "/agent/message/",
+            {"server_boot_time": self.CLIENT_START_TIME, "client_start_time": self.CLIENT_START_TIME},
+            HTTP_X_SSL_CLIENT_SERIAL=self.SERIAL,
+            HTTP_X_SSL_CLIENT_NAME=self.FQDN,
+        )
+        response = MessageView().get(request)
+        self.assertEqual(response.status_code, 200)
+        return [m["session_seq"] for m in json.loads(response.content)["messages"]]
+
+    def _send(self, count, body=None):
+        for i in range(count):
+            self.queues.send(
+                {
+                    "fqdn": self.FQDN,
+                    "type": "DATA",
+                    "plugin": "linux",
+                    "session_id": "session",
+                    "session_seq": i,
+                    "body": body,
+                }
+            )
+
+    def test_message_limit(self):
+        self._send(5)
+
+        with mock.patch("settings.AGENT_MESSAGES_PER_RESPONSE", 2):
+            self.assertEqual(self._get(), [0, 1])
+            self.assertEqual(self._get(), [2, 3])
+            self.assertEqual(self._get(), [4])
+
+        stats = self.queues.stats()[self.FQDN]
+        self.assertEqual(stats["tx_depth"], 0)
+        self.assertEqual(stats["tx_sent"], 5)
+        self.assertEqual(stats["tx_truncated"], 2)
+
+    def test_byte_limit(self):
+        self._send(3, body="x" * 1000)
+
+        with mock.patch("settings.AGENT_BYTES_PER_RESPONSE", 2500):
+            self.assertEqual(self._get(), [0, 1])
+            self.assertEqual(self.queues.stats()[self.FQDN]["tx_depth"], 1)
+            self.assertEqual(self._get(), [2])
+
+        # A message larger than the limit is still sent, on its own
+        self._send(2, body="x" * 1000)
+        with mock.patch("settings.AGENT_BYTES_PER_RESPONSE", 10):
+            self.assertEqual(self._get(), [0])
+            self.assertEqual(self._get(), [1])
+
+
+class TestMessageViewPost(TestCase):
+    FQDN = "myserver.mycompany.com"
+    SERIAL = "0123456789"
+
+    def setUp(self):
+        super(TestMessageViewPost, self).setUp()
+
+        self.queues = mock.Mock()
+        self.sessions = mock.Mock()
+
+        for name, value in [
+            ("queues", self.queues),
+            ("sessions", self.sessions),
+            ("valid_certs", {self.SERIAL: self.FQDN}),
+        ]:
+            patcher = mock.patch.object(MessageView, name, value, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _post(self, messages):
+        request = RequestFactory().post(
+            "/agent/message/",
+            json.dumps({"messages": messages}),
+            content_type="application/json",
+            HTTP_X_SSL_CLIENT_SERIAL=self.SERIAL,
+            HTTP_X_SSL_CLIENT_NAME=self.FQDN,
+        )
+        response = MessageView().post(request)
+        self.assertEqual(response.status_code, 200)
+
+    def _message(self, plugin, seq):
+        return {
+            "fqdn": self.FQDN,
+            "type": "DATA",
+            "plugin": plugin,
+            "session_id": "session",
+            "session_seq": seq,
+            "body": None,
+        }
+
+    def test_batch_per_plugin(self):
+        messages = [self._message(plugin, seq) for seq in range(3) for plugin in ["linux", "lustre"]]
+        self._post(messages)
+
+        self.assertEqual(self.sessions.get.call_count, 2)
+        self.assertEqual(
+            self.queues.receive_many.call_args_list,
+            [
+                mock.call("linux", [m for m in messages if m["plugin"] == "linux"]),
+                mock.call("lustre", [m for m in messages if m["plugin"] == "lustre"]),
+            ],
+        )
+
+    def test_unknown_session(self):
+        self.sessions.get.side_effect = KeyError
+        self._post([self._message("linux", seq) for seq in range(3)])
+
+        self.assertEqual(self.sessions.get.call_count, 1)
+        self.assertEqual(self.queues.send.call_count, 1)
+        self.assertFalse(self.queues.receive_many.called)
@@ -0,0 +1,79 @@
+import threading
+
+import mock
+from unittest import TestCase
+
+from chroma_core.services.http_agent.queues import AmqpRxForwarder, HostQueueCollection
+from chroma_core.services.queue import AgentRxQueue
+
+
+class TestHostQueueCollection(TestCase):
+    def test_stats(self):
+        queues = HostQueueCollection()
+        for n in range(3):
+            queues.send({"fqdn": "myserver", "n": n})
+
+        host_queues = queues.get("myserver")
+        host_queues.unget_tx(host_queues.get_tx())
+
+        self.assertEqual(queues.stats(), {"myserver": {"tx_depth": 3, "tx_sent": 0, "tx_truncated": 0}})
+
+
+class TestAmqpRxForwarder(TestCase):
+    def setUp(self):
+        super(TestAmqpRxForwarder, self).setUp()
+
+        self.put_many = mock.patch("chroma_core.services.queue.ServiceQueue.put_many").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.queues = HostQueueCollection()
+        self.forwarder = AmqpRxForwarder(self.queues)
+
+    def test_batches_per_plugin(self):
+        messages = [{"plugin": plugin, "n": n} for n in range(3) for plugin in ["linux", "lustre"]]
+        for message in messages:
+            self.queues.receive(message)
+
+        thread = threading.Thread(target=self.forwarder.run)
+        thread.start()
+        self.forwarder.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+        sent = sorted(call[0][0] for call in self.put_many.call_args_list)
+        self.assertEqual(
+            sent,
+            sorted(
+                [
+                    [m for m in messages if m["plugin"] == "linux"],
+                    [m for m in messages if m["plugin"] == "lustre"],
+                ]
+            ),
+        )
+
+    def test_stop_when_idle(self):
+        thread = threading.Thread(target=self.forwarder.run)
+        thread.start()
+        self.forwarder.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(self.put_many.called)
+
+
+class TestAgentRxQueue(TestCase):
+    def test_unpack_batch(self):
+        received = []
+        messages = [{"type": "DATA", "fqdn": "myserver", "plugin": "linux", "body": n} for n in range(3)]
+
+        queues = HostQueueCollection()
+        queues.receive_many("linux", messages)
+        envelope = queues.plugin_rx_queue.get_nowait()
+
+        def serve(queue, callback):
+            callback(envelope)
+
+        with mock.patch("chroma_core.services.queue.ServiceQueue.serve", serve):
+            AgentRxQueue("linux").serve(data_callback=lambda fqdn, body: received.append(body))
+
+        self.assertEqual(received, [0, 1, 2])
@@ -126,6 +126,7 @@ class JobTestCase(IMLUnitTestCase):
         # from trying to do network comms during unit tests
         ServiceRpcInterface._call = mock.Mock(side_effect=NotImplementedError)
         ServiceQueue.put = mock.Mock()
+        ServiceQueue.put_many = mock.Mock()
         ServiceQueue.purge = mock.Mock()
 
         # Create an instance for the purposes of the test
@@ -187,7 +188,7 @@ class JobTestCase(IMLUnitTestCase):
 
         self.job_scheduler._spawn_job = mock.Mock(side_effect=_spawn_job)
 
-        def run_next():
+        def run_next(partition=None):
             while True:
                 runnable_jobs = self.job_scheduler._job_collection.ready_jobs
 
@@ -0,0 +1,78 @@
+import json
+
+import mock
+from unittest import TestCase
+
+from chroma_core.services.job_scheduler.job_scheduler import JobCollection
+
+
+class FakeJob(object):
+    def __init__(self, job_id, wait_for):
+        self.id = job_id
+        self.state = "pending"
+        self.wait_for_json = json.dumps(wait_for)
+
+
+class TestJobCollection(TestCase):
+    def setUp(self):
+        super(TestJobCollection, self).setUp()
+
+        # JobCollection writes state changes through to the DB, which we don't need here
+        mock.patch("chroma_core.services.job_scheduler.job_scheduler.Job").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.collection = JobCollection()
+
+    def test_ready_after_dependencies_complete(self):
+        a = FakeJob(1, [])
+        b = FakeJob(2, [1])
+        c = FakeJob(3, [1, 2])
+        for job in [a, b, c]:
+            self.collection.add(job)
+
+        self.assertEqual(self.collection.ready_jobs, [a])
+
+        self.collection.update_many([a], "tasked")
+        self.assertEqual(self.collection.ready_jobs, [])
+
+        self.collection.update(a, "complete")
+        self.assertEqual(self.collection.ready_jobs, [b])
+
+        self.collection.update_many([b], "tasked")
+        self.collection.update(b, "complete")
+        self.assertEqual(self.collection.ready_jobs, [c])
+
+    def test_wait_for_already_complete(self):
+        a = FakeJob(1, [])
+        self.collection.add(a)
+        self.collection.update(a, "complete")
+
+        b = FakeJob(2, [1])
+        self.collection.add(b)
+        self.assertEqual(self.collection.ready_jobs, [b])
+
+    def test_cancelled_pending_job_not_ready(self):
+        a = FakeJob(1, [])
+        b = FakeJob(2, [])
+        self.collection.add(a)
+        self.collection.add(b)
+
+        self.collection.update(b, "complete", cancelled=True)
+        self.assertEqual(self.collection.ready_jobs, [a])
+
+    def test_chained_scaling(self):
+        """Schedule a long chain of jobs, each waiting on its predecessor: each job's wait_for_json
+        should be parsed once, rather than those of all the pending jobs on every scheduling pass"""
+        JOB_COUNT = 1000
+
+        with mock.patch("json.loads", wraps=json.loads) as loads:
+            for i in range(JOB_COUNT):
+                self.collection.add(FakeJob(i, [i - 1] if i else []))
+
+            for i in range(JOB_COUNT):
+                ready = self.collection.ready_jobs
+                self.assertEqual([job.id for job in ready], [i])
+                self.collection.update_many(ready, "tasked")
+                self.collection.update(ready[0], "complete")
+
+        self.assertEqual(loads.call_count, JOB_COUNT)
@@ -0,0 +1,71 @@
+import time
+
+import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.unit.chroma_core.helpers import synthetic_host
+from tests.unit.chroma_core.helpers import load_default_profile
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+
+from chroma_core.models import StepResult
+from chroma_core.models import StopLNetJob
+from chroma_core.services.job_scheduler.job_scheduler import JobProgress
+
+
+class TestJobProgress(IMLUnitTestCase):
+    def setUp(self):
+        super(TestJobProgress, self).setUp()
+
+        load_default_profile()
+        host = synthetic_host("myserver")
+        self.job = StopLNetJob.objects.create(lnet_configuration=host.lnet_configuration)
+        step_klass, args = self.job.get_steps()[0]
+
+        self.job_scheduler = mock.Mock()
+        self.job_progress = JobProgress(self.job_scheduler)
+        self.job_progress._start_step(self.job.id, step_klass=step_klass, args=args, step_index=0, step_count=1)
+
+    def _result(self):
+        return StepResult.objects.get(job=self.job)
+
+    def test_output_flushed_before_completion(self):
+        self.job_progress._log(self.job.id, "Starting\n")
+        self.job_progress._console(self.job.id, "some output\n")
+        self.job_progress._console(self.job.id, "more output\n")
+
+        # Buffered until a threshold is reached
+        self.assertEqual(self._result().console, "")
+
+        self.job_progress._step_success(self.job.id, {"ok": True})
+        self.job_progress._complete_job(self.job.id, False)
+
+        result = self._result()
+        self.assertEqual(result.log, "Starting\n")
+        self.assertEqual(result.console, "some output\nmore output\n")
+        self.assertEqual(result.state, "success")
+        self.job_scheduler.complete_job.assert_called_once_with(self.job.id, errored=False)
+
+    def test_flush_interval(self):
+        self.job_progress._console(self.job.id, "some output\n")
+
+        self.job_progress._flush_output(expired_only=True)
+        self.assertEqual(self._result().console, "")
+
+        with mock.patch("time.time", return_value=time.time() + JobProgress.FLUSH_INTERVAL):
+            self.job_progress._flush_output(expired_only=True)
+        self.assertEqual(self._result().console, "some output\n")
+
+    def test_console_10mb(self):
+        """Write 10 MB of console output in 1 KB chunks, as a chatty step would: each chunk
+        should not rewrite the output already stored"""
+        CHUNK = "x" * 1023 + "\n"
+        CHUNK_COUNT = 10 * 1024
+
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(CHUNK_COUNT):
+                self.job_progress._console(self.job.id, CHUNK)
+            self.job_progress._step_success(self.job.id, None)
+
+        self.assertEqual(len(self._result().console), len(CHUNK) * CHUNK_COUNT)
+        self.assertLessEqual(len(queries), (len(CHUNK) * CHUNK_COUNT) / JobProgress.FLUSH_SIZE + 5)
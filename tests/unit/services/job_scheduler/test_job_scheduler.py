@@ -137,6 +137,24 @@ class TestStateManager(JobTestCaseWithHost):
         job_scheduler_notify.notify(freshen(self.lnet_configuration), awhile_ago, {"state": "lnet_down"}, ["lnet_up"])
         self.assertEqual(freshen(self.lnet_configuration).state, "lnet_up")
 
+    def test_notify_many_failure(self):
+        """Test that a failing notification does not lose the others applied with it"""
+        self.lnet_configuration = self.assertState(self.lnet_configuration, "lnet_up")
+        now = django.utils.timezone.now()
+        notifications = [
+            (tuple(self.host.content_type.natural_key()), self.host.pk, now, {"no_such_attribute": True}, []),
+            (
+                tuple(self.lnet_configuration.content_type.natural_key()),
+                self.lnet_configuration.pk,
+                now,
+                {"state": "lnet_down"},
+                ["lnet_up"],
+            ),
+        ]
+
+        self.assertEqual(self.job_scheduler.notify_many(notifications), 1)
+        self.assertEqual(freshen(self.lnet_configuration).state, "lnet_down")
+
     def test_buffered_notification(self):
         """Test that notifications for locked items are buffered and
         replayed when the locking Job has completed."""
@@ -0,0 +1,97 @@
+import mock
+from unittest import TestCase
+
+from chroma_core.models import StateLock
+from chroma_core.services.job_scheduler.lock_cache import LockCache
+
+
+class FakeJob(object):
+    def __init__(self, job_id):
+        self.id = job_id
+
+
+class TestLockCache(TestCase):
+    def setUp(self):
+        super(TestLockCache, self).setUp()
+
+        # LockCache loads the locks of incomplete jobs at construction
+        mock.patch("chroma_core.models.Job.objects").start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.lock_cache = LockCache()
+
+    def _lock(self, job, item, write):
+        lock = StateLock(job=job, locked_item=item, write=write)
+        self.lock_cache.add(lock)
+        return lock
+
+    def test_latest_write(self):
+        jobs = [FakeJob(i) for i in range(4)]
+
+        # Added out of job order
+        w2 = self._lock(jobs[2], "a", True)
+        w1 = self._lock(jobs[1], "a", True)
+        self._lock(jobs[3], "a", False)
+
+        self.assertIs(self.lock_cache.get_latest_write("a"), w2)
+        self.assertIs(self.lock_cache.get_latest_write("a", not_job=jobs[2]), w1)
+        self.assertEqual(self.lock_cache.get_latest_write("b"), None)
+        self.assertEqual(self.lock_cache.get_write_by_locked_item(), {"a": w2})
+
+        self.lock_cache.remove_job(jobs[2])
+        self.assertIs(self.lock_cache.get_latest_write("a"), w1)
+
+    def test_read_locks_after(self):
+        jobs = [FakeJob(i) for i in range(5)]
+        reads = [self._lock(job, "a", False) for job in reversed(jobs)]
+        reads.reverse()
+
+        self.assertEqual(self.lock_cache.get_read_locks("a", after=2, not_job=jobs[3]), [reads[2], reads[4]])
+        self.assertEqual(self.lock_cache.get_read_locks("b", after=0, not_job=None), [])
+
+    def test_remove_job(self):
+        job_a, job_b = FakeJob(1), FakeJob(2)
+        a_locks = [self._lock(job_a, "x", True), self._lock(job_a, "y", False)]
+        b_lock = self._lock(job_b, "x", False)
+
+        self.assertEqual(self.lock_cache.remove_job(job_a), 2)
+
+        self.assertEqual(self.lock_cache.get_by_job(job_a), [])
+        self.assertEqual(list(self.lock_cache.get_by_locked_item("x")), [b_lock])
+        self.assertEqual(list(self.lock_cache.get_by_locked_item("y")), [])
+        self.assertEqual(self.lock_cache.write_locks, [])
+        self.assertEqual(self.lock_cache.read_locks, [b_lock])
+        self.assertNotIn("y", self.lock_cache.all_by_item)
+        self.assertNotIn(a_locks[0], self.lock_cache.read_locks + self.lock_cache.write_locks)
+
+    def test_scaling(self):
+        """Add, query and remove 10k locks over 1k items: each operation should find its locks
+        through the indexes, rather than by comparing against every lock held"""
+        LOCK_COUNT = 10000
+        ITEM_COUNT = 1000
+        LOCKS_PER_JOB = 5
+
+        comparisons = []
+
+        def lock_eq(lock, other):
+            comparisons.append(lock)
+            return lock is other
+
+        jobs = [FakeJob(i) for i in range(LOCK_COUNT / LOCKS_PER_JOB)]
+        with mock.patch.object(StateLock, "__eq__", lock_eq, create=True):
+            for i in range(LOCK_COUNT):
+                job = jobs[i / LOCKS_PER_JOB]
+                self.lock_cache.add(StateLock(job=job, locked_item=i % ITEM_COUNT, write=bool(i % 2)))
+
+            for job in jobs:
+                for item in range(job.id, job.id + LOCKS_PER_JOB):
+                    latest_write = self.lock_cache.get_latest_write(item % ITEM_COUNT, not_job=job)
+                    after = latest_write.job.id if latest_write else 0
+                    self.lock_cache.get_read_locks(item % ITEM_COUNT, after=after, not_job=job)
+
+            for job in jobs:
+                self.lock_cache.remove_job(job)
+
+        self.assertEqual(self.lock_cache.read_locks + self.lock_cache.write_locks, [])
+        # Removing locks from flat lists compared each against the locks before it
+        self.assertLessEqual(len(comparisons), LOCK_COUNT)
@@ -0,0 +1,87 @@
+import datetime
+
+from unittest import TestCase
+
+from chroma_core.services.job_scheduler.job_scheduler import NotificationBatch
+
+
+class TestNotificationBatch(TestCase):
+    def setUp(self):
+        super(TestNotificationBatch, self).setUp()
+        self.batch = NotificationBatch()
+        self.t0 = datetime.datetime(2020, 1, 1)
+        self.t1 = self.t0 + datetime.timedelta(seconds=1)
+
+    def test_coalesce_per_object(self):
+        host_ct = ("chroma_core", "managedhost")
+        self.batch.add(host_ct, 1, self.t0, {"state": "lnet_down", "needs_update": True}, ["lnet_up"])
+        self.batch.add(host_ct, 2, self.t0, {"state": "lnet_up"}, [])
+        self.batch.add(host_ct, 1, self.t1, {"state": "lnet_unloaded"}, ["lnet_up"])
+
+        self.assertEqual(
+            self.batch.drain(),
+            [
+                (host_ct, 1, self.t1, {"state": "lnet_unloaded", "needs_update": True}, ["lnet_up"]),
+                (host_ct, 2, self.t0, {"state": "lnet_up"}, []),
+            ],
+        )
+        self.assertEqual(self.batch.received, 3)
+        self.assertEqual(self.batch.coalesced, 1)
+
+        self.assertEqual(self.batch.drain(), [])
+
+    def test_different_from_states_not_coalesced(self):
+        host_ct = ("chroma_core", "managedhost")
+        self.batch.add(host_ct, 1, self.t0, {"state": "lnet_down"}, ["lnet_up"])
+        self.batch.add(host_ct, 1, self.t1, {"state": "lnet_unloaded", "needs_update": True}, [])
+
+        # Each notification is checked against its own from_states
+        self.assertEqual(
+            self.batch.drain(),
+            [
+                (host_ct, 1, self.t0, {"state": "lnet_down"}, ["lnet_up"]),
+                (host_ct, 1, self.t1, {"state": "lnet_unloaded", "needs_update": True}, []),
+            ],
+        )
+        self.assertEqual(self.batch.coalesced, 0)
+
+    def test_late_notification_not_superseded_by_guarded(self):
+        host_ct = ("chroma_core", "managedhost")
+        self.batch.add(host_ct, 1, self.t1, {"state": "lnet_down"}, ["lnet_up"])
+        self.batch.add(host_ct, 1, self.t0, {"state": "lnet_up"}, [])
+
+        # The newer notification may not be applied, so the late one's state is kept
+        self.assertEqual(
+            self.batch.drain(),
+            [
+                (host_ct, 1, self.t0, {"state": "lnet_up"}, []),
+                (host_ct, 1, self.t1, {"state": "lnet_down"}, ["lnet_up"]),
+            ],
+        )
+        self.assertEqual(self.batch.coalesced, 0)
+
+    def test_keeps_latest_time(self):
+        host_ct = ("chroma_core", "managedhost")
+        self.batch.add(host_ct, 1, self.t1, {"needs_update": True}, [])
+        self.batch.add(host_ct, 1, self.t0, {"needs_update": False}, [])
+
+        # The older notification arrived late: its attrs must not be stamped with the newer time
+        self.assertEqual(self.batch.drain(), [(host_ct, 1, self.t1, {"needs_update": True}, [])])
+        self.assertEqual(self.batch.coalesced, 1)
+
+    def test_late_notification_keeps_own_time(self):
+        host_ct = ("chroma_core", "managedhost")
+        t2 = self.t1 + datetime.timedelta(seconds=1)
+        self.batch.add(host_ct, 1, self.t1, {"state": "lnet_up"}, [])
+        self.batch.add(host_ct, 1, self.t0, {"state": "lnet_down", "needs_update": True}, ["lnet_unloaded"])
+        self.batch.add(host_ct, 1, t2, {"needs_update": False}, [])
+
+        # Only the attrs of the late notification which nothing newer sets survive, with their own time,
+        # and they are applied first
+        self.assertEqual(
+            self.batch.drain(),
+            [
+                (host_ct, 1, self.t0, {"needs_update": True}, ["lnet_unloaded"]),
+                (host_ct, 1, t2, {"state": "lnet_up", "needs_update": False}, []),
+            ],
+        )
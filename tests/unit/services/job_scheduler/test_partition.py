@@ -0,0 +1,51 @@
+from tests.unit.lib.iml_unit_test_case import IMLUnitTestCase
+from tests.unit.chroma_core.helpers.helper import load_default_profile
+from tests.unit.chroma_core.helpers.synthentic_objects import synthetic_host
+
+from chroma_core.lib.cache import ObjectCache
+from chroma_core.services.job_scheduler.partition import PartitionMap
+
+
+class TestPartitionMap(IMLUnitTestCase):
+    def setUp(self):
+        super(TestPartitionMap, self).setUp()
+
+        ObjectCache.clear()
+        self.addCleanup(ObjectCache.clear)
+
+        load_default_profile()
+        self.hosts = [synthetic_host("myserver%d" % i) for i in range(2)]
+        self.partitions = PartitionMap()
+
+    def test_not_built_without_targets(self):
+        self.partitions.rebuild()
+
+        self.assertFalse(self.partitions.valid)
+        self.assertEqual(self.partitions.key_for([self.hosts[0]]), None)
+
+    def test_rebuild_uses_fetched_targets(self):
+        self.partitions.refresh_targets()
+        self.get_targets_mock.reset_mock()
+
+        self.partitions.rebuild()
+
+        # Rebuilding happens under the scheduler lock, so must not go to the API
+        self.assertFalse(self.get_targets_mock.called)
+        self.assertTrue(self.partitions.valid)
+
+        # The targets are served by both hosts, joining them in one partition
+        key = self.partitions.key_for([self.hosts[0]])
+        self.assertNotEqual(key, None)
+        self.assertEqual(self.partitions.key_for([self.hosts[1]]), key)
+
+    def test_refresh_targets_invalidates_on_change(self):
+        self.partitions.refresh_targets()
+        self.partitions.rebuild()
+
+        self.partitions.refresh_targets()
+        self.assertTrue(self.partitions.valid)
+
+        self.get_targets_mock.side_effect = None
+        self.get_targets_mock.return_value = []
+        self.partitions.refresh_targets()
+        self.assertFalse(self.partitions.valid)
@@ -0,0 +1,151 @@
+import threading
+
+from unittest import TestCase
+
+from chroma_core.services.job_scheduler.step_executor import StepExecutor, step_host
+
+
+class DeployStep(object):
+    pass
+
+
+class MountStep(object):
+    pass
+
+
+class FakeRun(object):
+    """Stands in for RunJobThread: its steps block until it is released"""
+
+    def __init__(self, name, steps, log):
+        self.name = name
+        self.steps = steps
+        self.command_id = None
+        self._log = log
+        self._index = 0
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.cancelled = False
+        self.complete = threading.Event()
+
+    @property
+    def next_step(self):
+        if self._index < len(self.steps) and not self.cancelled:
+            return self.steps[self._index]
+        return None
+
+    def run_next_step(self):
+        if self.next_step is None:
+            self.complete.set()
+            return False
+
+        self._log.append((self.name, self._index))
+        self.started.set()
+        self.release.wait()
+        self._index += 1
+
+        if self._index == len(self.steps):
+            self.complete.set()
+            return False
+        return True
+
+    def discard(self):
+        self.complete.set()
+
+
+class TestStepExecutor(TestCase):
+    def setUp(self):
+        super(TestStepExecutor, self).setUp()
+        self.log = []
+
+    def _executor(self, size=8, host_limit=2, action_limit=8, action_limits=None):
+        executor = StepExecutor(size, host_limit, action_limit, action_limits)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    def _run(self, name, host, count=1, klass=DeployStep):
+        return FakeRun(name, [(klass, {"fqdn": host})] * count, self.log)
+
+    def _finish(self, *runs):
+        for run in runs:
+            run.release.set()
+        for run in runs:
+            self.assertTrue(run.complete.wait(5))
+
+    def test_step_host(self):
+        host = type("Host", (object,), {"fqdn": "oss1"})()
+        self.assertEqual(step_host({"host": host}), "oss1")
+        self.assertEqual(step_host({"fqdn": "oss2"}), "oss2")
+        self.assertEqual(step_host({"filesystem": "fs"}), None)
+
+    def test_host_limit(self):
+        executor = self._executor(host_limit=2)
+        runs = [self._run(i, "oss1") for i in range(3)]
+        other = self._run("other", "oss2")
+
+        for run in runs + [other]:
+            executor.submit(run, 1)
+
+        # Two steps against oss1 start, the third waits while oss2 is not held up
+        for run in runs[:2] + [other]:
+            self.assertTrue(run.started.wait(5))
+        self.assertFalse(runs[2].started.wait(0.2))
+
+        stats = executor.stats()
+        self.assertEqual(stats["hosts"]["oss1"]["running"], 2)
+        self.assertEqual(stats["hosts"]["oss1"]["queued"], 1)
+        self.assertEqual(stats["hosts"]["oss2"]["running"], 1)
+
+        runs[0].release.set()
+        self.assertTrue(runs[2].started.wait(5))
+
+        self._finish(*(runs + [other]))
+        self.assertEqual(executor.stats()["hosts"]["oss1"]["steps"], 3)
+
+    def test_action_limit(self):
+        executor = self._executor(action_limits={"MountStep": 1})
+        mounts = [self._run(i, "oss%s" % i, klass=MountStep) for i in range(2)]
+
+        for run in mounts:
+            executor.submit(run, 1)
+
+        self.assertTrue(mounts[0].started.wait(5))
+        self.assertFalse(mounts[1].started.wait(0.2))
+
+        self._finish(mounts[0])
+        self.assertTrue(mounts[1].started.wait(5))
+        self._finish(mounts[1])
+
+    def test_fair_between_commands(self):
+        executor = self._executor(size=1)
+        blocker = self._run("blocker", "oss0")
+        big = [self._run("big%s" % i, "oss%s" % i, count=2) for i in range(3)]
+        small = self._run("small", "mds")
+
+        # Queue everything up behind a step occupying the only worker
+        executor.submit(blocker, 0)
+        self.assertTrue(blocker.started.wait(5))
+        for run in big:
+            executor.submit(run, 1)
+        executor.submit(small, 2)
+
+        self._finish(*([blocker, small] + big))
+
+        # The second command's step runs after one step of the first, not after all six
+        self.assertEqual(self.log[:3], [("blocker", 0), ("big0", 0), ("small", 0)])
+        self.assertEqual(len(self.log), 8)
+
+    def test_discard_cancelled(self):
+        executor = self._executor(size=1)
+        running = self._run("running", "oss1")
+        waiting = self._run("waiting", "oss2")
+
+        executor.submit(running, 1)
+        self.assertTrue(running.started.wait(5))
+        executor.submit(waiting, 2)
+
+        waiting.cancelled = True
+        executor.discard(waiting)
+        self.assertTrue(waiting.complete.is_set())
+        self.assertEqual(executor.stats()["queued"], 0)
+
+        self._finish(running)
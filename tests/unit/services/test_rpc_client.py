@@ -0,0 +1,97 @@
+import errno
+import socket
+import threading
+
+import mock
+from unittest import TestCase
+
+from chroma_core.services.rpc import RpcClientFactory, RpcClientResponseHandler, RpcTimeout
+
+
+class TestRpcClientResponseHandler(TestCase):
+    def setUp(self):
+        super(TestRpcClientResponseHandler, self).setUp()
+        self.handler = RpcClientResponseHandler("responses", None)
+
+    def test_futures_complete_independently(self):
+        futures = [self.handler.start_wait("request_%s" % i, 10, lambda body: body["result"]) for i in range(3)]
+
+        for i in reversed(range(3)):
+            futures[i].set_response({"result": i})
+
+        self.assertEqual([future.result() for future in futures], [0, 1, 2])
+
+    def test_result_waits_for_response(self):
+        future = self.handler.start_wait("request", 10)
+        threading.Timer(0.1, future.set_response, [{"result": "done"}]).start()
+
+        self.assertEqual(future.result(), {"result": "done"})
+
+    def test_timeout(self):
+        future = self.handler.start_wait("request", 0.1)
+        self.assertRaises(RpcTimeout, future.result)
+
+    def test_age_response_states(self):
+        expired = self.handler.start_wait("expired", -1)
+        pending = self.handler.start_wait("pending", 10)
+
+        self.handler._age_response_states()
+
+        self.assertTrue(expired.done())
+        self.assertRaises(RpcTimeout, expired.result)
+        self.assertFalse(pending.done())
+
+        self.handler.timeout_all()
+        self.assertRaises(RpcTimeout, pending.result)
+
+    @mock.patch("chroma_core.services.rpc.kombu.messaging.Queue")
+    @mock.patch("chroma_core.services.rpc._amqp_exchange")
+    @mock.patch("chroma_core.services.rpc._amqp_connection")
+    def test_reconnect(self, amqp_connection, amqp_exchange, queue):
+        """A lost connection fails the RPCs in flight, and the handler reconnects rather than exiting"""
+        reconnected = threading.Event()
+        drains = []
+
+        def drain_events(timeout):
+            drains.append(timeout)
+            if len(drains) == 1:
+                raise IOError(errno.ECONNRESET, "Connection reset by peer")
+            reconnected.set()
+            raise socket.timeout()
+
+        connection = mock.MagicMock()
+        connection.drain_events.side_effect = drain_events
+        connections = mock.MagicMock()
+        connections.__getitem__.return_value.acquire.return_value.__enter__.return_value = connection
+
+        handler = RpcClientResponseHandler("responses", connections)
+        handler.RECONNECT_INTERVAL = 0
+        pending = handler.start_wait("pending", 10)
+
+        handler.start()
+        self.assertTrue(reconnected.wait(5))
+        self.assertTrue(handler.is_alive())
+        handler.stop()
+        handler.join(5)
+
+        self.assertTrue(pending.done())
+        self.assertRaises(RpcTimeout, pending.result)
+        connection.close.assert_called_once_with()
+        self.assertEqual(connection.Consumer.call_count, 2)
+
+
+class TestRpcClientFactory(TestCase):
+    @mock.patch.object(RpcClientResponseHandler, "RECONNECT_INTERVAL", 0.01)
+    @mock.patch.object(
+        RpcClientResponseHandler, "_consume", side_effect=IOError(errno.ECONNREFUSED, "Connection refused")
+    )
+    def test_start_timeout(self, consume):
+        """An unreachable broker fails the call rather than blocking it, and the next call tries again"""
+        self.addCleanup(setattr, RpcClientFactory, "_response_handler", RpcClientFactory._response_handler)
+        RpcClientFactory._response_handler = None
+
+        self.assertRaises(RpcTimeout, RpcClientFactory._get_response_handler, None, 0.1)
+        self.assertEqual(RpcClientFactory._response_handler, None)
+
+        self.assertRaises(RpcTimeout, RpcClientFactory._get_response_handler, None, 0.1)
+        self.assertEqual(RpcClientFactory._response_handler, None)
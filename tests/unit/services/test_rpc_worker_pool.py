@@ -0,0 +1,78 @@
+import threading
+
+import mock
+from unittest import TestCase
+
+from chroma_core.services.rpc import RpcWorkerPool, ServiceRpcInterface
+
+
+class FakeRpc(object):
+    def __init__(self, method, fn=None):
+        self.body = {"method": method}
+        self.fn = fn
+
+    def run(self):
+        if self.fn:
+            self.fn()
+
+
+class TestRpcWorkerPool(TestCase):
+    def setUp(self):
+        super(TestRpcWorkerPool, self).setUp()
+        self.pool = RpcWorkerPool("test", 4, 16, {"slow": 1})
+
+    def tearDown(self):
+        self.pool.stop()
+        super(TestRpcWorkerPool, self).tearDown()
+
+    def test_method_limit(self):
+        release = threading.Event()
+        lock = threading.Lock()
+        concurrency = {"now": 0, "max": 0}
+        fast_done = threading.Event()
+
+        def slow():
+            with lock:
+                concurrency["now"] += 1
+                concurrency["max"] = max(concurrency["max"], concurrency["now"])
+            release.wait(5)
+            with lock:
+                concurrency["now"] -= 1
+
+        for _ in range(3):
+            self.pool.submit(FakeRpc("slow", slow))
+
+        # Deferred calls to a capped method don't hold up other methods
+        self.pool.submit(FakeRpc("fast", fast_done.set))
+        self.assertTrue(fast_done.wait(5))
+
+        release.set()
+        self.pool.stop()
+
+        self.assertEqual(concurrency["max"], 1)
+        self.assertEqual(self.pool.stats()["slow"]["count"], 3)
+
+    def test_stats(self):
+        for _ in range(10):
+            self.pool.submit(FakeRpc("noop"))
+        self.pool.stop()
+
+        stats = self.pool.stats()["noop"]
+        self.assertEqual(stats["count"], 10)
+        self.assertGreaterEqual(stats["queue_wait_max"], 0)
+        self.assertGreaterEqual(stats["execution"], 0)
+
+
+class TestRpc(ServiceRpcInterface):
+    methods = ["noop"]
+
+
+class TestRpcStats(TestCase):
+    def test_get_rpc_stats(self):
+        rpc = TestRpc(mock.Mock(spec=["noop"]))
+        rpc.worker = mock.Mock()
+        rpc.worker.stats.return_value = {"noop": {"count": 1}}
+
+        # Served from the RpcServer's pool, not the wrapped object
+        self.assertEqual(rpc._local_call("get_rpc_stats"), {"noop": {"count": 1}})
+        self.assertTrue(callable(TestRpc().get_rpc_stats))